@@ -1,57 +1,74 @@
-import psycopg2
+import csv
+import json
+import sys
+import time
 import uuid 
-from psycopg2.extras import execute_values 
-from app.config import SERVERS, ALL_SERVERS
-
-def connect_to_db(servidor_id):
-    """Conecta ao banco de dados específico."""
-    config = SERVERS.get(servidor_id)
-    if not config:
-        print(f"❌ Configuração do servidor {servidor_id} não encontrada.")
-        return None
-
-    connect_args = {k: v for k, v in config.items() if k != 'tipo'}
-    connect_args['connect_timeout'] = 5
+from app.config import ALL_SERVERS, LOCAL_SERVERS
+from app.conexao import connect_to_db, liberar_conexao
+from app.replicacao import Operacao, gravar_e_replicar, nivel_consistencia
+from app.catalogo import invalidar_catalogo
+from app.relogio import agora
+from app.metricas import cronometrado
+
+# MERGE (INSERT ... ON CONFLICT) com LWW, no formato do execute_values
+QUERY_UPSERT_DISCIPLINAS = """
+    INSERT INTO disciplinas (id, nome, vagas_totais, is_deleted, data_ultima_modificacao)
+    VALUES %s 
+    ON CONFLICT (id) DO UPDATE SET 
+        nome = EXCLUDED.nome, 
+        vagas_totais = EXCLUDED.vagas_totais, 
+        is_deleted = EXCLUDED.is_deleted, 
+        data_ultima_modificacao = EXCLUDED.data_ultima_modificacao
+    WHERE disciplinas.data_ultima_modificacao < EXCLUDED.data_ultima_modificacao;
+"""
 
-    try:
-        conn = psycopg2.connect(**connect_args)
-        return conn
-    except psycopg2.OperationalError as e:
-        return None
+def _gravar_disciplinas(linhas, nivel=None):
+    """
+    Grava as linhas (id, nome, vagas, is_deleted, timestamp) no líder local com a outbox e
+    entrega aos demais ao mesmo tempo: um único execute_values por nó.
+    Com 'nivel' ONE/QUORUM, retorna ao atingir as confirmações (o resto segue em segundo plano).
+    """
+    if len(linhas) == 1:
+        alvo, adicionada = f"Disciplina '{linhas[0][1]}'", "foi adicionada"
+    else:
+        alvo, adicionada = f"{len(linhas)} disciplinas", "foram adicionadas"
 
+    total_servers = len(ALL_SERVERS)
+    resultado = gravar_e_replicar(LOCAL_SERVERS[0], [Operacao(QUERY_UPSERT_DISCIPLINAS, linhas, em_lote=True)], nivel)
+    invalidar_catalogo()
+    for servidor_id, r in resultado.pares.items():
+        if not r.sucesso:
+            print(f"❌ Falha ao adicionar em {servidor_id}: {r.mensagem}")
+    success_count = len(resultado.sucessos)
+
+    if resultado.em_andamento and success_count > 0:
+        print(f"\n✅ Sucesso: {alvo} {adicionada} em {success_count} de {total_servers} líderes "
+              f"(consistência {resultado.nivel}); {', '.join(resultado.em_andamento)} em segundo plano.")
+    elif success_count == total_servers:
+        print(f"\n✅ Sucesso: {alvo} {adicionada} e replicada{'s' if len(linhas) > 1 else ''} em TODOS os líderes.")
+    elif success_count > 0:
+        print(f"\n⚠ Aviso: {alvo} {adicionada} em {success_count} de {total_servers} líderes.")
+        print("   (A outbox entrega aos nós offline quando voltarem; a Opção 10 'Heal' também sincroniza)")
+    else:
+        print(f"\n❌ Falha: {alvo} não {adicionada} em nenhum líder.")
+    return resultado
 
-def _adicionar_disciplina_core(disciplina_nome: str, vagas: int):
+@cronometrado('adicionar_disciplina', relatar_lenta=True)
+def _adicionar_disciplina_core(disciplina_nome: str, vagas: int, consistencia: str = None):
     """
     [FUNÇÃO INTERNA] Contém a nova lógica de replicação Multi-Líder.
+    'consistencia': ONE, QUORUM ou ALL (None = config.py).
+    Retorna um dict com 'sucesso', o id gerado e o resultado da replicação por líder.
     """
+    nivel = nivel_consistencia('adicionar_disciplina', consistencia)
 
     print(f"--- Tentando adicionar disciplina: {disciplina_nome} ({vagas} vagas) ---")
 
     # 1. Gerar os dados UNIVERSAIS para esta disciplina
     disciplina_uuid = str(uuid.uuid4())
     
-    # --- CORREÇÃO APLICADA AQUI ---
-    # Tenta conectar a QUALQUER líder disponível para gerar um timestamp
-    timestamp_agora = None
-    for servidor_id in ALL_SERVERS:
-        conn_check = connect_to_db(servidor_id)
-        if conn_check:
-            try:
-                cursor_check = conn_check.cursor()
-                cursor_check.execute("SELECT (NOW() AT TIME ZONE 'UTC')")
-                timestamp_agora = cursor_check.fetchone()[0]
-                cursor_check.close()
-                conn_check.close()
-                print(f"✅ Timestamp gerado via Líder {servidor_id}.")
-                break # Sai do loop assim que conseguir um timestamp
-            except Exception:
-                if conn_check: conn_check.close()
-                continue
-    
-    if timestamp_agora is None:
-         print("❌ Falha: Não foi possível conectar a NENHUM líder para gerar timestamp. (Ambos estão offline?)")
-         return
-    # --- FIM DA CORREÇÃO ---
+    # Timestamp do relógio híbrido local (sem ida a nenhum líder)
+    timestamp_agora = agora()
 
     # Dados completos a serem replicados (de acordo com o init.sql)
     dados_disciplina = (
@@ -62,59 +79,119 @@ def _adicionar_disciplina_core(disciplina_nome: str, vagas: int):
         timestamp_agora # data_ultima_modificacao
     )
 
-    # 2. Preparar a consulta de MERGE (INSERT ... ON CONFLICT)
-    colunas_query = "(id, nome, vagas_totais, is_deleted, data_ultima_modificacao)"
-    update_set = """
-        nome = EXCLUDED.nome, 
-        vagas_totais = EXCLUDED.vagas_totais, 
-        is_deleted = EXCLUDED.is_deleted, 
-        data_ultima_modificacao = EXCLUDED.data_ultima_modificacao
-    """
-    update_where = "disciplinas.data_ultima_modificacao < EXCLUDED.data_ultima_modificacao"
+    # 2. Aplicar no líder local (com a outbox) e entregar aos demais ao mesmo tempo
+    resultado = _gravar_disciplinas([dados_disciplina], nivel)
+    if not resultado.sucessos:
+        return {'sucesso': False, 'motivo': 'erro', 'mensagem': "Disciplina não foi gravada em nenhum líder.",
+                'replicacao': {s: r.sucesso for s, r in resultado.pares.items()}}
+    return {'sucesso': True, 'disciplina_id': disciplina_uuid, 'nome': disciplina_nome, 'vagas_totais': vagas,
+            'replicacao': {s: r.sucesso for s, r in resultado.pares.items()},
+            'consistencia': resultado.resumo_consistencia()}
+
+# --- CARGA DE CATÁLOGO EM LOTE ---
+
+def _ler_registros(arquivo, caminho):
+    """(linha, registro) do CSV ou do JSONL. Linhas do JSONL que não são um objeto JSON vêm com registro None."""
+    if not caminho.endswith(('.jsonl', '.json')):
+        yield from enumerate(csv.DictReader(arquivo), start=2)
+        return
+    for linha, texto in enumerate(arquivo, start=1):
+        if not texto.strip():
+            continue
+        try:
+            registro = json.loads(texto)
+        except ValueError:
+            registro = None
+        yield linha, registro if isinstance(registro, dict) else None
 
-    query = f"""
-        INSERT INTO disciplinas {colunas_query}
-        VALUES %s 
-        ON CONFLICT (id) DO UPDATE SET {update_set}
-        WHERE {update_where};
+def ler_catalogo(caminho):
     """
-
-    success_count = 0
-    total_servers = len(ALL_SERVERS)
-
-    # 3. Tentar aplicar em TODOS os líderes
-    for servidor_id in ALL_SERVERS:
-        conn = connect_to_db(servidor_id)
-
-        if not conn:
-            print(f"❌ Falha de Conexão: O servidor {servidor_id} está inacessível. (Sincronização manual será necessária)")
+    Lê um catálogo CSV (colunas nome,vagas) ou JSONL ({"nome": ..., "vagas": ...}).
+    Retorna [(nome, vagas)]; linhas inválidas são ignoradas com aviso.
+    """
+    disciplinas = []
+    with open(caminho, encoding='utf-8', newline='') as arquivo:
+        for linha, registro in _ler_registros(arquivo, caminho):
+            if registro is None:
+                print(f"⚠️ Linha {linha} ignorada: não é um objeto JSON válido.")
+                continue
+            nome, vagas = registro.get('nome'), registro.get('vagas')
+            # 'vagas': inteiro (JSON) ou texto com um inteiro (CSV); true/false e 2.5 não valem
+            if not isinstance(vagas, (int, str)) or isinstance(vagas, bool):
+                vagas = None
+            try:
+                vagas = int(vagas)
+            except (TypeError, ValueError):
+                vagas = 0
+            if not isinstance(nome, str) or not nome.strip() or vagas <= 0:
+                print(f"⚠️ Linha {linha} ignorada: 'nome' (texto) obrigatório e 'vagas' inteiro positivo.")
+                continue
+            disciplinas.append((nome.strip(), vagas))
+    return disciplinas
+
+def _nomes_ativos(nomes):
+    """Nomes do catálogo que já existem (ativos) no líder local, para a carga poder ser repetida."""
+    conn = connect_to_db(LOCAL_SERVERS[0])
+    if not conn:
+        return set()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT DISTINCT nome FROM disciplinas
+            WHERE nome = ANY(%s) AND (is_deleted IS NULL OR is_deleted = false)
+        """, (list(nomes),))
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+        liberar_conexao(conn)
+
+def adicionar_disciplinas_em_lote(disciplinas):
+    """
+    Adiciona o catálogo [(nome, vagas)] de uma vez: ids e UM timestamp gerados uma única vez,
+    e o lote inteiro gravado com um execute_values por líder, em paralelo.
+    Nomes repetidos no arquivo ou já ativos no líder local são ignorados.
+    Retorna o número de disciplinas enviadas.
+    """
+    inicio = time.perf_counter()
+    existentes = _nomes_ativos({nome for nome, _ in disciplinas})
+    novas = {}
+    ignoradas = []
+    for nome, vagas in disciplinas:
+        if nome in existentes or nome in novas:
+            ignoradas.append(nome)
             continue
-
-        cursor = conn.cursor()
-
-        try:
-            execute_values(cursor, query, [dados_disciplina])
-            conn.commit()
-            success_count += 1
-
-        except psycopg2.Error as e:
-            conn.rollback()
-            print(f"❌ Erro PostgreSQL ao adicionar em {servidor_id}: {e}")
-        except Exception as e:
-            print(f"❌ Erro inesperado em {servidor_id}: {e}")
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
-    if success_count == total_servers:
-        print(f"\n✅ Sucesso: Disciplina '{disciplina_nome}' foi adicionada e replicada em TODOS os líderes.")
-    elif success_count > 0:
-        print(f"\n⚠ Aviso: Disciplina '{disciplina_nome}' adicionada em {success_count} de {total_servers} líderes.")
-        print("   (Rode a Opção 10 'Heal' para forçar a sincronização nos nós offline)")
-    else:
-        print(f"\n❌ Falha: Disciplina '{disciplina_nome}' não foi adicionada em nenhum líder.")
+        novas[nome] = vagas
+    if ignoradas:
+        exemplos = ", ".join(ignoradas[:5]) + (", ..." if len(ignoradas) > 5 else "")
+        print(f"⚠️ {len(ignoradas)} disciplina(s) ignorada(s) (já existem ou repetidas no arquivo): {exemplos}")
+    if not novas:
+        print("Nenhuma disciplina nova para adicionar.")
+        return 0
+
+    timestamp_agora = agora()
+    linhas = [(str(uuid.uuid4()), nome, vagas, False, timestamp_agora) for nome, vagas in novas.items()]
+    _gravar_disciplinas(linhas)
+    print(f"⏱ Catálogo carregado em {time.perf_counter() - inicio:.2f}s.")
+    return len(linhas)
+
+def importar_catalogo(caminho):
+    try:
+        disciplinas = ler_catalogo(caminho)
+    except (OSError, ValueError) as e:
+        print(f"❌ Não foi possível ler o arquivo '{caminho}': {e}")
+        return
+    if not disciplinas:
+        print("❌ Nenhuma disciplina válida no arquivo.")
+        return
+    print(f"\n⏳ Carregando {len(disciplinas)} disciplinas via Líder {LOCAL_SERVERS[0]}...")
+    adicionar_disciplinas_em_lote(disciplinas)
+
+def importar_catalogo_menu():
+    caminho = input("Caminho do catálogo (CSV com colunas nome,vagas ou JSONL): ").strip()
+    if not caminho:
+        print("❌ Operação cancelada. O caminho do arquivo não pode ser vazio.")
+        return
+    importar_catalogo(caminho)
         
 
 def adicionar_disciplina():
@@ -140,4 +217,10 @@ def adicionar_disciplina():
     except ValueError:
         print("❌ Entrada inválida. O número de vagas deve ser um número inteiro positivo.")
     except Exception as e:
-        print(f"❌ Ocorreu um erro: {e}")
\ No newline at end of file
+        print(f"❌ Ocorreu um erro: {e}")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python -m app.adicionar_disciplina catalogo.csv|catalogo.jsonl")
+        sys.exit(1)
+    importar_catalogo(sys.argv[1])
@@ -0,0 +1,108 @@
+import psycopg2
+from prettytable import PrettyTable
+from app.config import LOCAL_SERVERS, ALL_SERVERS, MERKLE_NIVEIS
+from app.conexao import connect_to_db, liberar_conexao
+
+# Coluna de LWW de cada tabela verificada (a mesma usada pelo merge)
+TABELAS_MERKLE = {
+    'disciplinas': 'data_ultima_modificacao',
+    'matriculas': 'data_ultima_modificacao',
+    'deleted_disciplinas': 'timestamp',
+    'deleted_matriculas': 'timestamp',
+}
+
+# Tamanho aproximado de uma linha (prefixo, quantidade, md5) trafegada
+BYTES_POR_DIGEST = 48
+
+
+def calcular_digests(conn, tabela, tamanho_prefixo, prefixos_pai=None):
+    """
+    Calcula NO SERVIDOR o hash de cada bucket da árvore: os registros são agrupados pelo prefixo
+    (em hexadecimal) do id, e cada bucket vira md5 de 'id:epoch(timestamp)' ordenado por id.
+    Com 'prefixos_pai', só desce dentro das subárvores indicadas.
+    Retorna {prefixo: (quantidade, md5)}.
+    """
+    coluna_ts = TABELAS_MERKLE[tabela]
+    filtro = ""
+    params = [tamanho_prefixo]
+    if prefixos_pai is not None:
+        tamanho_pai = len(next(iter(prefixos_pai)))
+        filtro = "WHERE substr(id::text, 1, %s) = ANY(%s)"
+        params += [tamanho_pai, list(prefixos_pai)]
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT substr(id::text, 1, %s) AS bucket, count(*),
+                   md5(string_agg(id::text || ':' || extract(epoch FROM {coluna_ts})::text, ',' ORDER BY id))
+            FROM {tabela}
+            {filtro}
+            GROUP BY 1
+        """, params)
+        return {bucket: (qtd, digest) for bucket, qtd, digest in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def buckets_divergentes(conn_a, conn_b, tabela):
+    """
+    Compara as árvores de hash dos dois nós nível a nível, descendo só nos ramos diferentes.
+    Retorna (prefixos_folha_divergentes, bytes_trafegados_aprox). Lista vazia = tabelas idênticas.
+    """
+    prefixos = None
+    digests_trocados = 0
+    for tamanho in MERKLE_NIVEIS:
+        digests_a = calcular_digests(conn_a, tabela, tamanho, prefixos)
+        digests_b = calcular_digests(conn_b, tabela, tamanho, prefixos)
+        digests_trocados += len(digests_a) + len(digests_b)
+        prefixos = {p for p in digests_a.keys() | digests_b.keys() if digests_a.get(p) != digests_b.get(p)}
+        if not prefixos:
+            return [], digests_trocados * BYTES_POR_DIGEST
+    return sorted(prefixos), digests_trocados * BYTES_POR_DIGEST
+
+
+def fetch_data_dos_buckets(conn, tabela, prefixos):
+    """Como fetch_all_data_from_server, mas só para os ids dos buckets indicados."""
+    if not prefixos:
+        return {}
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT id, {TABELAS_MERKLE[tabela]} FROM {tabela}
+            WHERE substr(id::text, 1, %s) = ANY(%s)
+        """, (len(prefixos[0]), list(prefixos)))
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def verificar_divergencias():
+    """Compara o líder local com cada par (somente leitura) e mostra os buckets divergentes por tabela."""
+    lider_local_id = LOCAL_SERVERS[0]
+    conn_local = connect_to_db(lider_local_id)
+    if not conn_local:
+        print(f"❌ Não foi possível conectar ao líder local ({lider_local_id}).")
+        return
+    try:
+        table = PrettyTable()
+        table.field_names = ["Par", "Tabela", "Buckets Divergentes", "Tráfego (aprox.)", "Status"]
+        table.align = "l"
+        for remoto_id in ALL_SERVERS:
+            if remoto_id == lider_local_id:
+                continue
+            conn_remoto = connect_to_db(remoto_id)
+            if not conn_remoto:
+                table.add_row([remoto_id, "-", "-", "-", "⚠️ OFFLINE"])
+                continue
+            try:
+                for tabela in TABELAS_MERKLE:
+                    prefixos, trafego = buckets_divergentes(conn_local, conn_remoto, tabela)
+                    status = "✅ Idêntica" if not prefixos else "❌ Divergente"
+                    table.add_row([remoto_id, tabela, len(prefixos), f"{trafego / 1024:.1f} KB", status])
+            except psycopg2.Error as e:
+                table.add_row([remoto_id, "-", "-", "-", f"❌ Erro: {e}"])
+            finally:
+                liberar_conexao(conn_remoto)
+        print(f"\n--- Anti-Entropia (Merkle): Líder {lider_local_id} x Pares ---")
+        print(table)
+    finally:
+        liberar_conexao(conn_local)
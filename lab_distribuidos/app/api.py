@@ -0,0 +1,325 @@
+"""
+Serviço HTTP/JSON do líder local: as mesmas operações do menu, atendidas em paralelo.
+
+    POST   /matriculas            {"aluno": ..., "disciplina": ...}
+    DELETE /matriculas?aluno=..&disciplina=..
+    GET    /matriculas?disciplina=..&aluno=..&limite=..&apos=..   (página por keyset; 'proxima' no retorno)
+    POST   /disciplinas           {"nome": ..., "vagas": ...}
+    DELETE /disciplinas?nome=..
+    GET    /disciplinas
+    GET    /relatorio              (ocupação vista por cada líder)
+    GET    /saude
+
+POST e DELETE aceitam "consistencia" (ONE, QUORUM ou ALL; no corpo ou na query string):
+a resposta sai quando esse número de líderes gravou, e a entrega aos demais continua depois.
+Se a escrita foi gravada no líder local mas não chegou a esse número de confirmações (pares
+offline), a resposta é 202 com "consistencia": {"atingida": false, ...}: a outbox ainda entrega.
+Com RAJADA_ATIVA, matrículas simultâneas na mesma disciplina são gravadas juntas (app/rajada.py).
+
+As requisições são atendidas por API_TRABALHADORES threads; até API_FILA_MAX esperam na fila
+e, acima disso, a resposta é 503 imediato (o cliente tenta de novo) em vez de acumular sem limite.
+
+Uso: python -m app.api [porta]
+"""
+import json
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit, parse_qs
+import psycopg2
+from app.config import (ALL_SERVERS, LOCAL_SERVERS, REPLICACAO_LOGICA_ATIVA, METRICAS_PORTA,
+                        API_HOST, API_PORTA, API_TRABALHADORES, API_FILA_MAX, RAJADA_ATIVA)
+from app.conexao import connect_to_db, liberar_conexao, fechar_pools, estatisticas_pool
+from app.replicacao import (executar_em_paralelo, iniciar_drenador, parar_drenador, aguardar_entregas,
+                            NIVEIS_CONSISTENCIA)
+from app.replicacao_logica import iniciar_daemon_replicacao, parar_daemon_replicacao
+from app.metricas import iniciar_servidor_metricas, parar_servidor_metricas, span
+from app.saude import estado_circuitos, iniciar_sonda, parar_sonda
+from app.migracoes import aplicar_migracoes
+from app.sincronizacao import sincronizar_ao_iniciar
+from app.relogio import semear_relogio
+from app.matricular import _processar_matricula
+from app.rajada import matricular_em_rajada
+from app.remover import remover_aluno
+from app.adicionar_disciplina import _adicionar_disciplina_core
+from app.remover_disciplina import _remover_disciplina_core
+from app.visualizar_disciplinas import listar_disciplinas
+from app.visualizar import _consulta_matriculas, TAMANHO_PAGINA
+from app.relatorio_consolidado import _ocupacao_no_servidor
+
+# Código HTTP para cada 'motivo' de falha devolvido pelas funções do app/
+CODIGO_POR_MOTIVO = {'nao_encontrada': 404, 'duplicada': 409, 'offline': 503, 'erro': 500}
+CODIGO_CONSISTENCIA_NAO_ATINGIDA = 202   # gravada no líder local, mas sem as confirmações pedidas
+LIMITE_MAXIMO_PAGINA = 1000
+
+
+class ErroRequisicao(Exception):
+    def __init__(self, codigo, mensagem):
+        super().__init__(mensagem)
+        self.codigo = codigo
+
+
+def _texto(dados, campo):
+    valor = dados.get(campo)
+    if valor is not None and not isinstance(valor, str):
+        raise ErroRequisicao(400, f"Campo '{campo}' deve ser um texto.")
+    valor = valor.strip() if valor else valor
+    if not valor:
+        raise ErroRequisicao(400, f"Campo '{campo}' é obrigatório.")
+    return valor
+
+
+def _inteiro(valor, campo, minimo=1, maximo=None):
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        raise ErroRequisicao(400, f"Campo '{campo}' deve ser um número inteiro.")
+    if numero < minimo or (maximo is not None and numero > maximo):
+        raise ErroRequisicao(400, f"Campo '{campo}' fora do intervalo permitido.")
+    return numero
+
+
+def _consistencia(valor):
+    """Nível de consistência opcional da requisição (None = o do config.py)."""
+    if valor is None or valor == "":
+        return None
+    nivel = str(valor).strip().upper()
+    if nivel not in NIVEIS_CONSISTENCIA:
+        raise ErroRequisicao(400, f"Campo 'consistencia' deve ser {', '.join(NIVEIS_CONSISTENCIA)}.")
+    return nivel
+
+
+def _resposta_operacao(resultado, codigo_sucesso=200):
+    if resultado.get('sucesso'):
+        if resultado.get('consistencia', {}).get('atingida') is False:
+            return CODIGO_CONSISTENCIA_NAO_ATINGIDA, resultado
+        return codigo_sucesso, resultado
+    return CODIGO_POR_MOTIVO.get(resultado.get('motivo'), 500), resultado
+
+
+# --- OPERAÇÕES ---
+
+def matricular(lider, dados, _):
+    processar = matricular_em_rajada if RAJADA_ATIVA else _processar_matricula
+    return _resposta_operacao(processar(lider, _texto(dados, 'aluno'), _texto(dados, 'disciplina'),
+                                        _consistencia(dados.get('consistencia'))), 201)
+
+
+def remover_matricula(lider, _, parametros):
+    return _resposta_operacao(remover_aluno(lider, _texto(parametros, 'aluno'), _texto(parametros, 'disciplina'),
+                                            _consistencia(parametros.get('consistencia'))))
+
+
+def adicionar_disciplina(lider, dados, _):
+    return _resposta_operacao(_adicionar_disciplina_core(_texto(dados, 'nome'), _inteiro(dados.get('vagas'), 'vagas'),
+                                                         _consistencia(dados.get('consistencia'))), 201)
+
+
+def remover_disciplina(lider, _, parametros):
+    return _resposta_operacao(_remover_disciplina_core(_texto(parametros, 'nome')))
+
+
+def consultar_disciplinas(lider, _, parametros):
+    conn = connect_to_db(lider)
+    if not conn:
+        raise ErroRequisicao(503, f"Líder {lider} está offline.")
+    try:
+        linhas = listar_disciplinas(conn)
+    finally:
+        liberar_conexao(conn)
+    return 200, {'lider': lider, 'disciplinas': [{'id': d_id, 'nome': nome, 'vagas_totais': vagas}
+                                                 for d_id, nome, vagas in linhas]}
+
+
+def consultar_matriculas(lider, _, parametros):
+    limite = _inteiro(parametros.get('limite', TAMANHO_PAGINA), 'limite', maximo=LIMITE_MAXIMO_PAGINA)
+    apos = None
+    if parametros.get('apos'):
+        try:
+            apos = json.loads(parametros['apos'])
+            if not isinstance(apos, list) or len(apos) != 4:
+                raise ValueError
+            apos = tuple(apos)
+        except (TypeError, ValueError):
+            raise ErroRequisicao(400, "Parâmetro 'apos' inválido (use o valor de 'proxima').")
+    query, params = _consulta_matriculas(parametros.get('disciplina'), parametros.get('aluno'), apos, limite)
+    conn = connect_to_db(lider)
+    if not conn:
+        raise ErroRequisicao(503, f"Líder {lider} está offline.")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        linhas = cursor.fetchall()
+    finally:
+        cursor.close()
+        liberar_conexao(conn)
+    matriculas = [{'id': m_id, 'disciplina_id': d_id, 'disciplina': nome, 'vagas_totais': vagas, 'aluno': aluno,
+                   'timestamp_matricula': ts.isoformat(), 'status': status}
+                  for m_id, d_id, nome, vagas, aluno, ts, status in linhas]
+    proxima = None
+    if len(linhas) == limite:
+        ultima = linhas[-1]
+        proxima = json.dumps([ultima[2], ultima[1], ultima[5].isoformat(), ultima[0]])
+    return 200, {'lider': lider, 'matriculas': matriculas, 'proxima': proxima}
+
+
+def relatorio(lider, _, parametros):
+    visoes = executar_em_paralelo(ALL_SERVERS, _ocupacao_no_servidor)
+    return 200, {'lideres': {
+        servidor_id: None if visao is None else [
+            {'id': d_id, 'nome': nome, 'vagas_totais': vagas, 'ocupadas': aceitas, 'em_espera': em_espera}
+            for d_id, nome, vagas, aceitas, em_espera in visao]
+        for servidor_id, visao in visoes.items()}}
+
+
+def saude(lider, _, parametros):
+    return 200, {'lider': lider, 'circuitos': estado_circuitos(), 'pools': estatisticas_pool()}
+
+
+ROTAS = {
+    ('POST', '/matriculas'): matricular,
+    ('DELETE', '/matriculas'): remover_matricula,
+    ('GET', '/matriculas'): consultar_matriculas,
+    ('POST', '/disciplinas'): adicionar_disciplina,
+    ('DELETE', '/disciplinas'): remover_disciplina,
+    ('GET', '/disciplinas'): consultar_disciplinas,
+    ('GET', '/relatorio'): relatorio,
+    ('GET', '/saude'): saude,
+}
+
+
+# --- SERVIDOR ---
+
+class _HandlerAPI(BaseHTTPRequestHandler):
+    timeout = 30  # um cliente parado não segura um trabalhador para sempre
+
+    def _responder(self, codigo, corpo):
+        dados = json.dumps(corpo, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _atender(self, metodo):
+        url = urlsplit(self.path)
+        rota = url.path.rstrip('/') or '/'
+        funcao = ROTAS.get((metodo, rota))
+        if funcao is None:
+            caminhos = {caminho for _, caminho in ROTAS}
+            self._responder(405 if rota in caminhos else 404, {'erro': f"Rota não encontrada: {metodo} {rota}"})
+            return
+        parametros = {chave: valores[-1] for chave, valores in parse_qs(url.query).items()}
+        try:
+            dados = {}
+            tamanho = int(self.headers.get('Content-Length') or 0)
+            if tamanho:
+                dados = json.loads(self.rfile.read(tamanho))
+                if not isinstance(dados, dict):
+                    raise ErroRequisicao(400, "O corpo deve ser um objeto JSON.")
+            with span('api', rota=f"{metodo} {rota}"):
+                codigo, corpo = funcao(self.server.lider, dados, parametros)
+        except ErroRequisicao as e:
+            codigo, corpo = e.codigo, {'erro': str(e)}
+        except ValueError as e:
+            codigo, corpo = 400, {'erro': f"JSON inválido: {e}"}
+        except psycopg2.Error as e:
+            codigo, corpo = 500, {'erro': f"Erro PostgreSQL: {str(e).strip()}"}
+        except Exception as e:
+            # Qualquer outra falha vira um 500 em JSON (sem isso, a conexão cairia sem resposta)
+            print(f"❌ API: erro inesperado em {metodo} {rota}:")
+            traceback.print_exc()
+            codigo, corpo = 500, {'erro': f"Erro interno: {type(e).__name__}"}
+        self._responder(codigo, corpo)
+
+    def do_GET(self):
+        self._atender('GET')
+
+    def do_POST(self):
+        self._atender('POST')
+
+    def do_DELETE(self):
+        self._atender('DELETE')
+
+    def log_message(self, formato, *args):
+        pass  # as próprias operações já imprimem o que fazem
+
+
+RESPOSTA_SOBRECARGA = json.dumps({'erro': "Servidor sobrecarregado, tente novamente."}).encode('utf-8')
+
+
+class ServidorAPI(HTTPServer):
+    """
+    HTTPServer cujas conexões são atendidas por um pool fixo de threads. Um semáforo limita
+    trabalhadores + fila: quando ele se esgota a conexão recebe 503 na hora.
+    """
+
+    def __init__(self, endereco, lider, trabalhadores=API_TRABALHADORES, fila_max=API_FILA_MAX):
+        super().__init__(endereco, _HandlerAPI)
+        self.lider = lider
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='api')
+        self._vagas = threading.BoundedSemaphore(trabalhadores + fila_max)
+
+    def process_request(self, request, client_address):
+        if not self._vagas.acquire(blocking=False):
+            try:
+                # Consome o pedido (curto) antes de responder: fechar com dados não lidos
+                # faria o cliente receber um reset em vez do 503
+                request.settimeout(0.1)
+                request.recv(65536)
+                request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nContent-Type: application/json\r\n"
+                                b"Retry-After: 1\r\nConnection: close\r\n"
+                                + f"Content-Length: {len(RESPOSTA_SOBRECARGA)}\r\n\r\n".encode() + RESPOSTA_SOBRECARGA)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._executor.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._vagas.release()
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def servir(porta=API_PORTA, host=API_HOST):
+    """Prepara o líder local (migrações, heal, drenador) e atende a API até Ctrl+C."""
+    lider = LOCAL_SERVERS[0]
+    aplicar_migracoes()
+    sincronizar_ao_iniciar()
+    semear_relogio(lider)
+    iniciar_sonda()
+    iniciar_drenador(lider)
+    if REPLICACAO_LOGICA_ATIVA:
+        iniciar_daemon_replicacao()
+    if METRICAS_PORTA:
+        iniciar_servidor_metricas(METRICAS_PORTA)
+
+    servidor = ServidorAPI((host, porta), lider)
+    print(f"🌐 API do Líder {lider} em http://{host}:{porta} ({API_TRABALHADORES} trabalhadores, fila de {API_FILA_MAX}).")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEncerrando a API...")
+    finally:
+        servidor.server_close()
+        parar_drenador()
+        parar_sonda()
+        parar_daemon_replicacao()
+        parar_servidor_metricas()
+        aguardar_entregas()
+        fechar_pools()
+
+
+if __name__ == "__main__":
+    servir(int(sys.argv[1]) if len(sys.argv) > 1 else API_PORTA)
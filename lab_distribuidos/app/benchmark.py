@@ -0,0 +1,293 @@
+"""
+Benchmark de carga: vários clientes simulados (threads) chamando as MESMAS funções do menu
+(_processar_matricula, remover_aluno e _adicionar_disciplina_core) via os líderes de SERVERS.
+
+Antes da carga é criado um conjunto de disciplinas 'bench_<execucao>_<n>' cujo número de
+vagas segue a taxa de disputa pedida (alunos por vaga). Líderes podem ser marcados como
+offline (--offline B,C): os clientes não entram por eles e as conexões a eles falham na hora,
+exatamente como com o nó fora do ar (a outbox acumula as pendências).
+
+Ao fim são mostrados vazão e latências p50/p95/p99 por operação, e o resultado completo é
+salvo em JSON para comparar execuções entre versões.
+
+Com --consistencia ONE/QUORUM as operações voltam ao atingir W confirmações, e a carga mede a
+latência dos líderes mais rápidos em vez da do mais lento.
+
+Com --rajada as matrículas simultâneas na mesma disciplina são gravadas em lote (app/rajada.py):
+compare a vazão de matricular com e sem o modo rajada com muitos clientes e poucas disciplinas.
+
+Uso: python -m app.benchmark --clientes 16 --operacoes 2000 --disciplinas 20 --disputa 3 --offline D
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from prettytable import PrettyTable
+from app.config import SERVERS, ALL_SERVERS, POOL_MAX_CONEXOES
+from app.conexao import fechar_pools
+from app.replicacao import aguardar_entregas, NIVEIS_CONSISTENCIA
+from app.adicionar_disciplina import _adicionar_disciplina_core, adicionar_disciplinas_em_lote
+from app.matricular import _processar_matricula
+from app.rajada import matricular_em_rajada
+from app.remover import remover_aluno
+
+OPERACOES = ['matricular', 'remover', 'adicionar']
+MISTURA_PADRAO = "matricular=80,remover=15,adicionar=5"
+
+
+class _Silencio:
+    """Destino de sys.stdout durante a carga: as funções do menu imprimem a cada operação."""
+
+    def write(self, texto):
+        return len(texto)
+
+    def flush(self):
+        pass
+
+
+def _percentil(ordenadas, p):
+    """Percentil p (0-100) por posição mais próxima, sobre uma lista já ordenada."""
+    if not ordenadas:
+        return None
+    indice = max(0, math.ceil(p / 100 * len(ordenadas)) - 1)
+    return ordenadas[indice]
+
+
+def _resumir(latencias, erros, duracao):
+    """
+    Estatísticas de UMA operação a partir das latências (s) das execuções bem-sucedidas e
+    das falhas contadas por motivo ('erros').
+    """
+    ordenadas = sorted(latencias)
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        'total': len(ordenadas),
+        'erros': sum(erros.values()),
+        'erros_por_motivo': dict(sorted(erros.items())),
+        'vazao_por_segundo': round(len(ordenadas) / duracao, 2) if duracao else 0,
+        'media_ms': ms(statistics.fmean(ordenadas)) if ordenadas else None,
+        'p50_ms': ms(_percentil(ordenadas, 50)),
+        'p95_ms': ms(_percentil(ordenadas, 95)),
+        'p99_ms': ms(_percentil(ordenadas, 99)),
+        'max_ms': ms(ordenadas[-1]) if ordenadas else None,
+    }
+
+
+def _ler_mistura(texto):
+    """'matricular=80,remover=15,adicionar=5' -> {'matricular': 80, ...}"""
+    mistura = {}
+    for parte in texto.split(','):
+        nome, _, peso = parte.partition('=')
+        nome = nome.strip()
+        if nome not in OPERACOES:
+            raise ValueError(f"operação desconhecida '{nome}' (use {', '.join(OPERACOES)})")
+        mistura[nome] = int(peso)
+    if not any(mistura.values()):
+        raise ValueError("a mistura precisa de ao menos uma operação com peso > 0")
+    return mistura
+
+
+def _versao_codigo():
+    """Commit atual do repositório (para identificar a versão medida), se disponível."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def desligar_lideres(offline):
+    """Faz os líderes em 'offline' ficarem inacessíveis para este processo (porta recusada)."""
+    for servidor_id in offline:
+        SERVERS[servidor_id] = dict(SERVERS[servidor_id], host='127.0.0.1', port=1)
+
+
+class Carga:
+    """Estado compartilhado entre os clientes: disciplinas, alunos matriculados e medições."""
+
+    def __init__(self, execucao, disciplinas, mistura, semente, consistencia=None, rajada=False):
+        self.execucao = execucao
+        self.disciplinas = disciplinas
+        self.mistura = mistura
+        self.semente = semente
+        self.consistencia = consistencia
+        self.matricular = matricular_em_rajada if rajada else _processar_matricula
+        self.matriculados = []      # (aluno, disciplina) que podem ser removidos
+        self.latencias = {op: [] for op in OPERACOES}
+        self.erros = {op: Counter() for op in OPERACOES}   # op -> {motivo: falhas}
+        self._contador = 0
+        self._lock = threading.Lock()
+
+    def _proximo_numero(self):
+        with self._lock:
+            self._contador += 1
+            return self._contador
+
+    def _sortear_operacao(self, rng):
+        op = rng.choices(list(self.mistura), weights=list(self.mistura.values()))[0]
+        if op == 'remover':
+            with self._lock:
+                if not self.matriculados:
+                    return 'matricular', None
+                indice = rng.randrange(len(self.matriculados))
+                self.matriculados[indice], self.matriculados[-1] = self.matriculados[-1], self.matriculados[indice]
+                return op, self.matriculados.pop()
+        return op, None
+
+    def executar_operacao(self, rng, lider):
+        op, alvo = self._sortear_operacao(rng)
+        numero = self._proximo_numero()
+        inicio = time.perf_counter()
+        try:
+            if op == 'matricular':
+                aluno, disciplina = f"aluno_{self.execucao}_{numero}", rng.choice(self.disciplinas)
+                resultado = self.matricular(lider, aluno, disciplina, self.consistencia)
+            elif op == 'remover':
+                resultado = remover_aluno(lider, *alvo, self.consistencia)
+            else:
+                resultado = _adicionar_disciplina_core(f"bench_{self.execucao}_extra_{numero}", rng.randint(1, 50),
+                                                       self.consistencia)
+        except Exception:
+            resultado = {'sucesso': False, 'motivo': 'excecao'}
+        duracao = time.perf_counter() - inicio
+        with self._lock:
+            # As operações devolvem a falha no resultado (offline, nao_encontrada, duplicada...), sem exceção
+            if not resultado.get('sucesso'):
+                self.erros[op][resultado.get('motivo', 'erro')] += 1
+                return
+            self.latencias[op].append(duracao)
+            if op == 'matricular':
+                self.matriculados.append((aluno, disciplina))
+
+    def cliente(self, indice, lider, quantidade):
+        rng = random.Random(f"{self.semente}-{indice}")
+        for _ in range(quantidade):
+            self.executar_operacao(rng, lider)
+
+
+def executar_benchmark(clientes=8, operacoes=1000, disciplinas=10, disputa=2.0, offline=(), mistura=None,
+                       semente=None, consistencia=None, rajada=False):
+    """
+    Roda a carga e retorna o resultado (dict serializável em JSON).
+    'disputa' é a razão alunos/vaga esperada em cada disciplina (>1 = fila de espera).
+    'consistencia' (ONE, QUORUM, ALL) vale para todas as operações (None = config.py).
+    'rajada' faz as matrículas passarem pelo modo rajada (app/rajada.py).
+    """
+    offline = [s for s in offline if s]
+    lideres = [s for s in ALL_SERVERS if s not in offline]
+    if not lideres:
+        raise ValueError("todos os líderes estão marcados como offline")
+    mistura = mistura or _ler_mistura(MISTURA_PADRAO)
+    semente = semente if semente is not None else random.randrange(2**32)
+    execucao = uuid.uuid4().hex[:6]
+    desligar_lideres(offline)
+
+    # Vagas para que, com a parcela de matrículas da mistura, cada disciplina receba 'disputa' alunos por vaga
+    matriculas_previstas = operacoes * mistura.get('matricular', 0) / sum(mistura.values())
+    vagas = max(1, round(matriculas_previstas / disciplinas / disputa))
+    nomes = [f"bench_{execucao}_{n}" for n in range(disciplinas)]
+    print(f"⏳ Preparando {disciplinas} disciplinas com {vagas} vagas (execução {execucao})...")
+    saida_original = sys.stdout
+    sys.stdout = _Silencio()
+    try:
+        adicionar_disciplinas_em_lote([(nome, vagas) for nome in nomes])
+    finally:
+        sys.stdout = saida_original
+
+    carga = Carga(execucao, nomes, mistura, semente, consistencia, rajada)
+    por_cliente = [operacoes // clientes + (1 if i < operacoes % clientes else 0) for i in range(clientes)]
+    threads = [threading.Thread(target=carga.cliente, args=(i, lideres[i % len(lideres)], qtd), daemon=True)
+               for i, qtd in enumerate(por_cliente) if qtd]
+
+    print(f"🚀 {clientes} clientes, {operacoes} operações via líderes {', '.join(lideres)}"
+          + (f" (offline: {', '.join(offline)})" if offline else "") + "...")
+    sys.stdout = _Silencio()
+    inicio = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        duracao = time.perf_counter() - inicio
+        sys.stdout = saida_original
+    # Entregas que seguiram em segundo plano terminam fora da medição
+    aguardar_entregas()
+
+    return {
+        'execucao': execucao,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'versao': _versao_codigo(),
+        'parametros': {
+            'clientes': clientes, 'operacoes': operacoes, 'disciplinas': disciplinas, 'vagas_por_disciplina': vagas,
+            'disputa': disputa, 'mistura': mistura, 'lideres': lideres, 'offline': offline, 'semente': semente,
+            'pool_max_conexoes': POOL_MAX_CONEXOES, 'consistencia': consistencia, 'rajada': rajada,
+        },
+        'duracao_segundos': round(duracao, 3),
+        'vazao_total_por_segundo': round(sum(len(v) for v in carga.latencias.values()) / duracao, 2) if duracao else 0,
+        'operacoes': {op: _resumir(carga.latencias[op], carga.erros[op], duracao)
+                      for op in OPERACOES if carga.latencias[op] or carga.erros[op]},
+    }
+
+
+def exibir_resultado(resultado):
+    table = PrettyTable()
+    table.field_names = ["Operação", "Total", "Erros", "Erros por Motivo", "Ops/s", "Média (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Máx (ms)"]
+    table.align = "l"
+    for op, r in resultado['operacoes'].items():
+        motivos = ", ".join(f"{motivo}: {qtd}" for motivo, qtd in r['erros_por_motivo'].items()) or "-"
+        table.add_row([op, r['total'], r['erros'], motivos, r['vazao_por_segundo'], r['media_ms'],
+                       r['p50_ms'], r['p95_ms'], r['p99_ms'], r['max_ms']])
+    print(f"\n--- Benchmark {resultado['execucao']} ({resultado['duracao_segundos']}s, "
+          f"{resultado['vazao_total_por_segundo']} ops/s no total) ---")
+    print(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.benchmark", description="Benchmark de carga do sistema de matrículas.")
+    parser.add_argument('--clientes', type=int, default=8, help="clientes simultâneos (threads)")
+    parser.add_argument('--operacoes', type=int, default=1000, help="total de operações")
+    parser.add_argument('--disciplinas', type=int, default=10, help="disciplinas criadas para a carga")
+    parser.add_argument('--disputa', type=float, default=2.0, help="alunos por vaga em cada disciplina")
+    parser.add_argument('--mistura', default=MISTURA_PADRAO, help=f"pesos das operações (padrão: {MISTURA_PADRAO})")
+    parser.add_argument('--offline', default="", help="líderes fora do ar durante a carga, ex.: B,C")
+    parser.add_argument('--semente', type=int, default=None, help="semente dos sorteios (repetibilidade)")
+    parser.add_argument('--consistencia', type=str.upper, choices=NIVEIS_CONSISTENCIA, default=None,
+                        help="confirmações esperadas em cada escrita (padrão: config.py)")
+    parser.add_argument('--rajada', action='store_true', help="matrículas agrupadas por disciplina (modo rajada)")
+    parser.add_argument('--saida', default=None, help="arquivo JSON do resultado (padrão: benchmark_<execucao>.json)")
+    args = parser.parse_args(argv)
+
+    try:
+        mistura = _ler_mistura(args.mistura)
+        offline = [s.strip().upper() for s in args.offline.split(',') if s.strip()]
+        desconhecidos = [s for s in offline if s not in SERVERS]
+        if desconhecidos:
+            raise ValueError(f"líderes desconhecidos: {', '.join(desconhecidos)}")
+        resultado = executar_benchmark(args.clientes, args.operacoes, args.disciplinas, args.disputa,
+                                       offline, mistura, args.semente, args.consistencia, args.rajada)
+    except ValueError as e:
+        print(f"❌ Parâmetros inválidos: {e}")
+        return 1
+    finally:
+        fechar_pools()
+
+    exibir_resultado(resultado)
+    caminho = args.saida or f"benchmark_{resultado['execucao']}.json"
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"📄 Resultado salvo em {caminho}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import OrderedDict
+from app.config import CATALOGO_MAX_ENTRADAS, CATALOGO_REVALIDAR_SEGUNDOS
+
+# "Versão" do catálogo no banco, lida pelo índice idx_disciplinas_chegada (migração 5). chegada_em
+# é marcada a cada INSERT/UPDATE neste nó, mesmo de uma escrita replicada com timestamp LWW antigo
+# (ex.: soft delete atrasado): o max muda com qualquer gravação e o count com qualquer DELETE.
+VERSAO_CATALOGO = "SELECT max(chegada_em), count(*) FROM disciplinas"
+
+
+class CatalogoNo:
+    """
+    Cache LRU das disciplinas ativas de UM nó: nome -> (id, vagas_totais) e id -> (nome, vagas_totais).
+
+    O catálogo muda pouco, então as consultas por nome/id são servidas da memória. De tempos em
+    tempos (CATALOGO_REVALIDAR_SEGUNDOS) o cache confere a "versão" do catálogo no banco
+    (VERSAO_CATALOGO) e só se descarta se ela mudou: isso cobre escritas de outros líderes que
+    chegam por replicação ou heal. Escritas locais invalidam na hora. Cada busca no banco lê a
+    versão no mesmo comando e só entra no cache se ela ainda for a do cache; buscas sem resultado
+    também entram (como ausentes), sob a mesma versão.
+    """
+
+    def __init__(self, max_entradas=CATALOGO_MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._por_nome = OrderedDict()
+        self._por_id = {}
+        self._ausentes = OrderedDict()   # ('nome' | 'id', valor) buscados e não encontrados
+        self._versao = None
+        self._validado_em = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'acertos': 0, 'faltas': 0, 'revalidacoes': 0, 'invalidacoes': 0, 'despejos': 0}
+
+    def _limpar(self):
+        self._por_nome.clear()
+        self._por_id.clear()
+        self._ausentes.clear()
+        self._versao = None
+
+    def invalidar(self):
+        with self._lock:
+            self._limpar()
+            self.stats['invalidacoes'] += 1
+
+    def _revalidar(self, conn):
+        """Confere a versão do catálogo no banco se o prazo venceu; descarta tudo se ela mudou."""
+        if time.monotonic() - self._validado_em < CATALOGO_REVALIDAR_SEGUNDOS and self._versao is not None:
+            return
+        cursor = conn.cursor()
+        try:
+            cursor.execute(VERSAO_CATALOGO)
+            versao = cursor.fetchone()
+        finally:
+            cursor.close()
+        with self._lock:
+            self.stats['revalidacoes'] += 1
+            if versao != self._versao:
+                self._limpar()
+                self._versao = versao
+            self._validado_em = time.monotonic()
+
+    def _guardar(self, disciplina_id, nome, vagas_totais, versao):
+        """Guarda o resultado de uma busca, salvo se o catálogo mudou desde a última revalidação."""
+        with self._lock:
+            if versao != self._versao:
+                # Busca feita sob outra versão: não vai para o cache e a próxima chamada revalida
+                self._validado_em = 0.0
+                return
+            self._por_nome[nome] = (disciplina_id, vagas_totais)
+            self._por_nome.move_to_end(nome)
+            self._por_id[disciplina_id] = (nome, vagas_totais)
+            while len(self._por_nome) > self.max_entradas:
+                nome_antigo, (id_antigo, _) = self._por_nome.popitem(last=False)
+                self._por_id.pop(id_antigo, None)
+                self.stats['despejos'] += 1
+
+    def _guardar_ausente(self, chave, versao):
+        """Guarda uma busca sem resultado, com a mesma regra de versão de _guardar."""
+        with self._lock:
+            if versao != self._versao:
+                self._validado_em = 0.0
+                return
+            self._ausentes[chave] = True
+            self._ausentes.move_to_end(chave)
+            while len(self._ausentes) > self.max_entradas:
+                self._ausentes.popitem(last=False)
+                self.stats['despejos'] += 1
+
+    def _ausente(self, chave):
+        """Se a busca já foi feita sem resultado nesta versão (chamar com o lock)."""
+        if chave in self._ausentes:
+            self._ausentes.move_to_end(chave)
+            self.stats['acertos'] += 1
+            return True
+        return False
+
+    def _buscar(self, conn, coluna, valor, com_nome=False):
+        """
+        (id, vagas_totais, versao[, nome]) da disciplina ativa com coluna = valor (id None se não
+        existe). A versão do catálogo vem do MESMO comando, logo do mesmo snapshot da linha.
+        """
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                WITH versao AS ({VERSAO_CATALOGO})
+                SELECT d.id, d.vagas_totais, v.*, d.nome
+                FROM versao v
+                LEFT JOIN disciplinas d ON d.{coluna} = %s AND (d.is_deleted IS NULL OR d.is_deleted = false)
+            """, (valor,))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+        resultado = (row[0], row[1], tuple(row[2:4]))
+        return resultado + (row[4],) if com_nome else resultado
+
+    def por_nome(self, conn, disciplina_nome):
+        """(id, vagas_totais) da disciplina ativa com esse nome, ou (None, None)."""
+        self._revalidar(conn)
+        with self._lock:
+            encontrado = self._por_nome.get(disciplina_nome)
+            if encontrado:
+                self._por_nome.move_to_end(disciplina_nome)
+                self.stats['acertos'] += 1
+                return encontrado
+            if self._ausente(('nome', disciplina_nome)):
+                return None, None
+            self.stats['faltas'] += 1
+        disciplina_id, vagas_totais, versao = self._buscar(conn, "nome", disciplina_nome)
+        if not disciplina_id:
+            self._guardar_ausente(('nome', disciplina_nome), versao)
+            return None, None
+        self._guardar(disciplina_id, disciplina_nome, vagas_totais, versao)
+        return disciplina_id, vagas_totais
+
+    def por_id(self, conn, disciplina_id):
+        """(nome, vagas_totais) da disciplina ativa com esse id, ou (None, None)."""
+        self._revalidar(conn)
+        with self._lock:
+            encontrado = self._por_id.get(disciplina_id)
+            if encontrado:
+                self._por_nome.move_to_end(encontrado[0])
+                self.stats['acertos'] += 1
+                return encontrado
+            if self._ausente(('id', disciplina_id)):
+                return None, None
+            self.stats['faltas'] += 1
+        _, vagas_totais, versao, nome = self._buscar(conn, "id", disciplina_id, com_nome=True)
+        if not nome:
+            self._guardar_ausente(('id', disciplina_id), versao)
+            return None, None
+        self._guardar(disciplina_id, nome, vagas_totais, versao)
+        return nome, vagas_totais
+
+    def estatisticas(self):
+        with self._lock:
+            return dict(self.stats, entradas=len(self._por_nome), ausentes=len(self._ausentes))
+
+
+_catalogos = {}
+_catalogos_lock = threading.Lock()
+
+
+def _catalogo(servidor_id):
+    with _catalogos_lock:
+        catalogo = _catalogos.get(servidor_id)
+        if catalogo is None:
+            catalogo = CatalogoNo()
+            _catalogos[servidor_id] = catalogo
+        return catalogo
+
+
+def obter_disciplina(conn, disciplina_nome):
+    """(id, vagas_totais) da disciplina ativa pelo nome, no nó da conexão (via cache)."""
+    return _catalogo(conn.servidor_id).por_nome(conn, disciplina_nome)
+
+
+def obter_disciplina_por_id(conn, disciplina_id):
+    """(nome, vagas_totais) da disciplina ativa pelo id, no nó da conexão (via cache)."""
+    return _catalogo(conn.servidor_id).por_id(conn, disciplina_id)
+
+
+def invalidar_catalogo(servidor_id=None):
+    """Descarta o cache de um nó (ou de todos). Chamada após escritas no catálogo."""
+    with _catalogos_lock:
+        catalogos = [_catalogos[servidor_id]] if servidor_id in _catalogos else (
+            list(_catalogos.values()) if servidor_id is None else [])
+    for catalogo in catalogos:
+        catalogo.invalidar()
+
+
+def estatisticas_catalogo():
+    """Estatísticas do cache de cada nó já consultado: {servidor_id: {...}}."""
+    with _catalogos_lock:
+        catalogos = dict(_catalogos)
+    return {servidor_id: catalogo.estatisticas() for servidor_id, catalogo in sorted(catalogos.items())}
@@ -0,0 +1,256 @@
+"""
+Coleta de lixo dos tombstones (deleted_disciplinas, deleted_matriculas) por confirmação dos pares.
+
+1. Confirmação: para cada par e cada tabela de tombstones, o nó local percorre em lotes, por
+   (timestamp, id), os tombstones mais velhos que GC_CARENCIA_HORAS que o par ainda não
+   confirmou, pergunta ao par quais ele já tem e entrega os que faltam (tombstone, linha removida
+   e, no caso de disciplinas, as matrículas dela). A marca d'água do par (tombstones_confirmados)
+   só avança depois do commit no par.
+2. Expurgo: com a confirmação de TODOS os pares, o que está até a menor marca d'água sai do banco
+   local: as linhas removidas (a FK em cascata leva as matrículas da disciplina) e os tombstones.
+   O horizonte vai para gc_expurgos, e o heal (filtrar_expurgados) não traz de volta nada anterior a ele.
+
+Cada líder expurga apenas o próprio banco. Entregas da outbox de algum par para este nó ainda
+pendentes seguram o horizonte (uma entrega atrasada não pode recriar uma linha expurgada), e a
+carência deve ser maior que a maior partição esperada entre os nós.
+
+Uso: python -m app.coleta_tombstones [carencia_horas]
+"""
+import sys
+import psycopg2
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from prettytable import PrettyTable
+from app.config import LOCAL_SERVERS, ALL_SERVERS, GC_CARENCIA_HORAS, GC_LOTE
+from app.conexao import connect_to_db, liberar_conexao, fechar_pools
+from app.replicacao import executar_em_paralelo
+from app.sincronizacao import TABELAS_SYNC, UUID_MINIMO, INICIO_DOS_TEMPOS, aplicar_registros_lww, ler_horizontes_gc
+
+# Tabela de tombstones -> tabela da entidade removida
+TABELAS_GC = {
+    'deleted_disciplinas': 'disciplinas',
+    'deleted_matriculas': 'matriculas',
+}
+# Únicas linhas das entidades que o expurgo apaga
+FILTRO_REMOVIDAS = {
+    'disciplinas': "is_deleted = true",
+    'matriculas': "status = 'REMOVIDA'",
+}
+
+
+@dataclass
+class ConfirmacaoPar:
+    """Resultado da etapa de confirmação com UM par."""
+    servidor_id: str
+    status: str = "✅ OK"
+    confirmados: dict = field(default_factory=dict)   # tabela -> timestamp confirmado
+    entregues: int = 0
+    pendente_desde: datetime = None                    # outbox mais antiga do par para este nó
+
+
+def _ler_confirmacao(cursor, par_id, tabela):
+    cursor.execute("SELECT ate, ate_id FROM tombstones_confirmados WHERE par = %s AND tabela = %s", (par_id, tabela))
+    row = cursor.fetchone()
+    return (row[0], row[1]) if row else (INICIO_DOS_TEMPOS, UUID_MINIMO)
+
+
+def _entregar_faltantes(cursor_local, cursor_par, tabela, ids, horizontes_par=None):
+    """Aplica no par (LWW) os tombstones que faltam lá e as linhas removidas correspondentes."""
+    entidade = TABELAS_GC[tabela]
+    # Ordem da FK: disciplina antes das matrículas dela
+    envios = [(tabela, 'id'), (entidade, 'id')]
+    if entidade == 'disciplinas':
+        envios.append(('matriculas', 'disciplina_id'))
+    entregues = 0
+    for tab, coluna in envios:
+        cursor_local.execute(f"SELECT {', '.join(TABELAS_SYNC[tab]['colunas'])} FROM {tab} "
+                             f"WHERE {coluna} = ANY(%s::uuid[])", (ids,))
+        aplicados = aplicar_registros_lww(cursor_par, tab, cursor_local.fetchall(), horizontes_par)
+        if tab == tabela:
+            entregues = aplicados
+    return entregues
+
+
+def confirmar_com_par(par_id, local_id, limite):
+    """
+    Etapa 1 com UM par (conexões próprias, roda em paralelo com os demais).
+    'limite': só tombstones anteriores a ele entram na confirmação. Retorna um ConfirmacaoPar.
+    """
+    resultado = ConfirmacaoPar(par_id)
+    conn_par = connect_to_db(par_id)
+    if not conn_par:
+        resultado.status = "⚠️ OFFLINE"
+        return resultado
+    conn_local = connect_to_db(local_id)
+    if not conn_local:
+        liberar_conexao(conn_par)
+        resultado.status = f"❌ Local {local_id} offline"
+        return resultado
+
+    cursor_local = conn_local.cursor()
+    cursor_par = conn_par.cursor()
+    try:
+        cursor_par.execute("SELECT min(criado_em) FROM replicacao_pendente WHERE destino = %s", (local_id,))
+        resultado.pendente_desde = cursor_par.fetchone()[0]
+        horizontes_par = ler_horizontes_gc(cursor_par)
+        conn_par.commit()
+
+        for tabela in TABELAS_GC:
+            ate, ate_id = _ler_confirmacao(cursor_local, par_id, tabela)
+            horizonte_par = horizontes_par.get(tabela)
+            while True:
+                cursor_local.execute(f"""
+                    SELECT id, timestamp FROM {tabela}
+                    WHERE (timestamp, id) > (%s, %s::uuid) AND timestamp < %s
+                    ORDER BY timestamp, id
+                    LIMIT %s
+                """, (ate, ate_id, limite, GC_LOTE))
+                lote = cursor_local.fetchall()
+                if not lote:
+                    break
+                cursor_par.execute(f"SELECT id FROM {tabela} WHERE id = ANY(%s::uuid[])", ([r[0] for r in lote],))
+                presentes = {row[0] for row in cursor_par.fetchall()}
+                # O que o par já expurgou também conta como confirmado
+                faltantes = [r[0] for r in lote
+                             if r[0] not in presentes and (horizonte_par is None or r[1] > horizonte_par)]
+                if faltantes:
+                    resultado.entregues += _entregar_faltantes(cursor_local, cursor_par, tabela, faltantes, horizontes_par)
+                    conn_par.commit()
+
+                ate, ate_id = lote[-1][1], lote[-1][0]
+                cursor_local.execute("""
+                    INSERT INTO tombstones_confirmados (par, tabela, ate, ate_id) VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (par, tabela) DO UPDATE SET ate = EXCLUDED.ate, ate_id = EXCLUDED.ate_id
+                    WHERE (tombstones_confirmados.ate, tombstones_confirmados.ate_id) < (EXCLUDED.ate, EXCLUDED.ate_id)
+                """, (par_id, tabela, ate, ate_id))
+                conn_local.commit()
+                if len(lote) < GC_LOTE:
+                    break
+            if ate != INICIO_DOS_TEMPOS:
+                resultado.confirmados[tabela] = ate
+    except psycopg2.Error as e:
+        conn_par.rollback()
+        conn_local.rollback()
+        resultado.status = f"❌ Erro: {str(e).strip()}"
+    finally:
+        cursor_local.close()
+        cursor_par.close()
+        liberar_conexao(conn_par)
+        liberar_conexao(conn_local)
+    return resultado
+
+
+def expurgar_tabela(conn, tabela, pares, pendente_desde=None):
+    """
+    Etapa 2 para UMA tabela de tombstones: expurga até a menor confirmação entre os 'pares'
+    (e antes de 'pendente_desde', se houver outbox pendente para este nó).
+    Retorna (horizonte, tombstones expurgados, linhas removidas) ou None se falta confirmação.
+    O horizonte é o maior timestamp de tombstone de fato expurgado: os que ficam (id com linha
+    viva) não o empurram para frente.
+    """
+    entidade = TABELAS_GC[tabela]
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT par, ate, ate_id FROM tombstones_confirmados WHERE tabela = %s AND par = ANY(%s)",
+                       (tabela, list(pares)))
+        confirmacoes = cursor.fetchall()
+        conn.commit()
+        if len(confirmacoes) < len(pares):
+            return None
+        ate, ate_id = min((row[1], row[2]) for row in confirmacoes)
+
+        tombstones = linhas = 0
+        horizonte = None
+        cursor_ts, cursor_id = INICIO_DOS_TEMPOS, UUID_MINIMO
+        while True:
+            cursor.execute(f"""
+                SELECT id, timestamp FROM {tabela}
+                WHERE (timestamp, id) > (%s, %s::uuid) AND (timestamp, id) <= (%s, %s::uuid)
+                  AND (%s::timestamptz IS NULL OR timestamp < %s)
+                ORDER BY timestamp, id
+                LIMIT %s
+            """, (cursor_ts, cursor_id, ate, ate_id, pendente_desde, pendente_desde, GC_LOTE))
+            lote = cursor.fetchall()
+            if not lote:
+                break
+            cursor_ts, cursor_id = lote[-1][1], lote[-1][0]
+            ids = [r[0] for r in lote]
+            cursor.execute(f"DELETE FROM {entidade} WHERE id = ANY(%s::uuid[]) AND {FILTRO_REMOVIDAS[entidade]}", (ids,))
+            linhas += cursor.rowcount
+            # Tombstone de id que ainda tem linha viva neste nó fica (é ele que a derruba no heal)
+            cursor.execute(f"""
+                DELETE FROM {tabela} t WHERE id = ANY(%s::uuid[])
+                AND NOT EXISTS (SELECT 1 FROM {entidade} e WHERE e.id = t.id)
+                RETURNING timestamp
+            """, (ids,))
+            expurgados = [row[0] for row in cursor.fetchall()]
+            tombstones += len(expurgados)
+            if expurgados:
+                horizonte = max(expurgados + [horizonte or INICIO_DOS_TEMPOS])
+                cursor.execute("""
+                    INSERT INTO gc_expurgos (tabela, ate) VALUES (%s, %s)
+                    ON CONFLICT (tabela) DO UPDATE SET ate = GREATEST(gc_expurgos.ate, EXCLUDED.ate)
+                """, (tabela, horizonte))
+            conn.commit()
+            if len(lote) < GC_LOTE:
+                break
+        return horizonte, tombstones, linhas
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def coletar_tombstones(carencia_horas=GC_CARENCIA_HORAS):
+    """Confirma os tombstones com todos os pares e expurga o que todos já têm (nó local)."""
+    local_id = LOCAL_SERVERS[0]
+    pares = [s for s in ALL_SERVERS if s != local_id]
+    limite = datetime.now(timezone.utc) - timedelta(hours=carencia_horas)
+    print(f"\n🧹 Coleta de tombstones do Líder {local_id} (carência de {carencia_horas}h: até {limite:%Y-%m-%d %H:%M:%S} UTC)...")
+
+    confirmacoes = executar_em_paralelo(pares, confirmar_com_par, local_id, limite)
+    table = PrettyTable()
+    table.field_names = ["Par", "Status", *(f"Confirmado ({t})" for t in TABELAS_GC), "Entregues Agora"]
+    table.align = "l"
+    for c in confirmacoes.values():
+        table.add_row([c.servidor_id, c.status,
+                       *(f"{c.confirmados[t]:%Y-%m-%d %H:%M:%S}" if t in c.confirmados else "-" for t in TABELAS_GC),
+                       c.entregues])
+    print(table)
+
+    falhas = [c.servidor_id for c in confirmacoes.values() if not c.status.startswith("✅")]
+    if falhas:
+        print(f"⚠️ Sem confirmação de {', '.join(falhas)} nesta rodada: nada será expurgado.")
+        return
+    pendencias = [c.pendente_desde for c in confirmacoes.values() if c.pendente_desde is not None]
+    pendente_desde = min(pendencias) if pendencias else None
+
+    conn = connect_to_db(local_id)
+    if not conn:
+        print(f"❌ Líder local {local_id} offline. Expurgo abortado.")
+        return
+    table = PrettyTable()
+    table.field_names = ["Tabela", "Expurgado Até", "Tombstones Removidos", "Linhas Removidas"]
+    table.align = "l"
+    try:
+        for tabela in TABELAS_GC:
+            resultado = expurgar_tabela(conn, tabela, pares, pendente_desde)
+            if resultado is None:
+                table.add_row([tabela, "aguardando confirmação de todos os pares", 0, 0])
+                continue
+            horizonte, tombstones, linhas = resultado
+            table.add_row([tabela, f"{horizonte:%Y-%m-%d %H:%M:%S}" if horizonte else "-", tombstones, linhas])
+    except psycopg2.Error as e:
+        print(f"❌ Erro durante o expurgo: {str(e).strip()}")
+        return
+    finally:
+        liberar_conexao(conn)
+    print(table)
+
+
+if __name__ == "__main__":
+    try:
+        coletar_tombstones(float(sys.argv[1]) if len(sys.argv) > 1 else GC_CARENCIA_HORAS)
+    finally:
+        fechar_pools()
@@ -0,0 +1,246 @@
+import threading
+import time
+import psycopg2
+import psycopg2.extensions
+from contextlib import contextmanager
+from app.config import (SERVERS, CONNECT_TIMEOUT, POOL_MAX_CONEXOES, POOL_ESPERA_MAX_SEGUNDOS, POOL_VALIDAR_APOS_SEGUNDOS,
+                        METRICAS_ATIVAS)
+from app.metricas import span
+from app.saude import permitir, registrar_sucesso, registrar_falha
+
+
+class ConexaoNo(psycopg2.extensions.connection):
+    """Conexão psycopg2 que sabe a qual nó (servidor_id) pertence."""
+    servidor_id = None
+    ultimo_uso = 0.0
+
+    def commit(self):
+        with span('commit', no=self.servidor_id):
+            return super().commit()
+
+
+class CursorMedido(psycopg2.extensions.cursor):
+    """Cursor que mede cada ida ao servidor (execute) nas métricas do nó."""
+
+    def execute(self, query, vars=None):
+        with span('sql', no=self.connection.servidor_id):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with span('sql', no=self.connection.servidor_id):
+            return super().executemany(query, vars_list)
+
+
+class PoolEsgotado(psycopg2.OperationalError):
+    """Todas as conexões do pool seguiram em uso por POOL_ESPERA_MAX_SEGUNDOS (o nó pode estar saudável)."""
+
+
+class PoolNo:
+    """
+    Pool de conexões de UM nó (chave do SERVERS no config.py).
+    As conexões são criadas sob demanda e validadas na retirada (checkout).
+    """
+
+    def __init__(self, servidor_id, max_conexoes=POOL_MAX_CONEXOES, espera_max=POOL_ESPERA_MAX_SEGUNDOS):
+        self.servidor_id = servidor_id
+        self.max_conexoes = max_conexoes
+        self.espera_max = espera_max
+        self._ociosas = []
+        self._em_uso = 0
+        self._lock = threading.Condition()
+        self.stats = {
+            'criadas': 0,
+            'reutilizadas': 0,
+            'descartadas': 0,
+            'falhas_conexao': 0,
+            'esperas': 0,
+            'esgotamentos': 0,
+        }
+
+    def _nova_conexao(self):
+        config = SERVERS.get(self.servidor_id)
+        if not config:
+            raise ValueError(f"Configuração do servidor {self.servidor_id} não encontrada.")
+        connect_args = {k: v for k, v in config.items() if k != 'tipo'}
+        connect_args['connect_timeout'] = CONNECT_TIMEOUT
+        if METRICAS_ATIVAS:
+            connect_args['cursor_factory'] = CursorMedido
+        conn = psycopg2.connect(connection_factory=ConexaoNo, **connect_args)
+        conn.servidor_id = self.servidor_id
+        return conn
+
+    def _conexao_saudavel(self, conn):
+        """Validação na retirada: conexão aberta, sem transação quebrada e (se ociosa há muito tempo) respondendo a um ping."""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() not in (psycopg2.extensions.TRANSACTION_STATUS_IDLE,):
+            return False
+        if time.monotonic() - conn.ultimo_uso < POOL_VALIDAR_APOS_SEGUNDOS:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _descartar(self, conn):
+        self.stats['descartadas'] += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def obter(self):
+        """
+        Retira uma conexão saudável do pool (ou cria uma nova). Lança OperationalError se o nó
+        estiver offline, e PoolEsgotado se nenhuma conexão for devolvida em 'espera_max' segundos.
+        """
+        prazo = time.monotonic() + self.espera_max
+        while True:
+            with self._lock:
+                conn = self._ociosas.pop() if self._ociosas else None
+                if conn is None:
+                    if self._em_uso < self.max_conexoes:
+                        self._em_uso += 1
+                        break
+                    restante = prazo - time.monotonic()
+                    if restante <= 0:
+                        self.stats['esgotamentos'] += 1
+                        raise PoolEsgotado(f"Pool do nó {self.servidor_id} esgotado: {self.max_conexoes} conexões "
+                                           f"em uso por mais de {self.espera_max}s.")
+                    self.stats['esperas'] += 1
+                    self._lock.wait(restante)
+                    continue
+                self._em_uso += 1
+
+            # A validação (que pode fazer um ping) roda fora do lock
+            if self._conexao_saudavel(conn):
+                with self._lock:
+                    self.stats['reutilizadas'] += 1
+                return conn
+            with self._lock:
+                self._em_uso -= 1
+                self._descartar(conn)
+                self._lock.notify()
+
+        # Cria a conexão FORA do lock: o handshake pode demorar (connect_timeout)
+        try:
+            conn = self._nova_conexao()
+        except Exception:
+            with self._lock:
+                self._em_uso -= 1
+                self.stats['falhas_conexao'] += 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self.stats['criadas'] += 1
+        return conn
+
+    def devolver(self, conn, descartar=False):
+        """Devolve a conexão ao pool. Transações abertas são desfeitas (rollback)."""
+        if not conn.closed and not descartar:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                descartar = True
+        with self._lock:
+            self._em_uso -= 1
+            if conn.closed or descartar:
+                self._descartar(conn)
+            else:
+                conn.ultimo_uso = time.monotonic()
+                self._ociosas.append(conn)
+            self._lock.notify()
+
+    def fechar(self):
+        with self._lock:
+            while self._ociosas:
+                self._ociosas.pop().close()
+
+    def estatisticas(self):
+        with self._lock:
+            return dict(self.stats, em_uso=self._em_uso, ociosas=len(self._ociosas))
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obter_pool(servidor_id):
+    with _pools_lock:
+        pool = _pools.get(servidor_id)
+        if pool is None:
+            pool = PoolNo(servidor_id)
+            _pools[servidor_id] = pool
+        return pool
+
+
+def connect_to_db(servidor_id):
+    """
+    Retira uma conexão do pool do nó 'servidor_id'. Retorna None em caso de falha, ou na hora
+    se o circuito do nó estiver aberto (app/saude.py).
+    A conexão deve ser devolvida com liberar_conexao(conn) (e NÃO com conn.close()).
+    """
+    if servidor_id not in SERVERS:
+        print(f"❌ Configuração do servidor {servidor_id} não encontrada.")
+        return None
+    if not permitir(servidor_id):
+        return None
+    try:
+        with span('conexao', no=servidor_id):
+            conn = obter_pool(servidor_id).obter()
+    except PoolEsgotado as e:
+        # Não é falha do nó: o circuito (app/saude.py) continua fechado
+        print(f"❌ {e}")
+        return None
+    except psycopg2.OperationalError as e:
+        registrar_falha(servidor_id, e)
+        print(f"❌ Falha de conexão com {servidor_id}: {str(e).strip()}")
+        return None
+    registrar_sucesso(servidor_id)
+    return conn
+
+
+def liberar_conexao(conn, descartar=False):
+    """Devolve ao pool uma conexão obtida com connect_to_db."""
+    if conn is None:
+        return
+    obter_pool(conn.servidor_id).devolver(conn, descartar=descartar)
+
+
+@contextmanager
+def conexao(servidor_id):
+    """Context manager: 'with conexao("A") as conn:' (conn é None se o nó estiver offline)."""
+    conn = connect_to_db(servidor_id)
+    try:
+        yield conn
+    finally:
+        liberar_conexao(conn)
+
+
+def connect_to_any_db(servidores_ids):
+    """Retorna (conn, servidor_id) do primeiro nó da lista que responder."""
+    for servidor_id in servidores_ids:
+        conn = connect_to_db(servidor_id)
+        if conn:
+            return conn, servidor_id
+    return None, None
+
+
+def estatisticas_pool():
+    """Estatísticas de cada pool já utilizado: {servidor_id: {...}}."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {servidor_id: pool.estatisticas() for servidor_id, pool in sorted(pools.items())}
+
+
+def fechar_pools():
+    """Fecha todas as conexões ociosas (chamado ao sair do sistema)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.fechar()
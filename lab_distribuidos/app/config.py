@@ -36,4 +36,83 @@ SERVERS = {
 ALL_SERVERS = ['A', 'B', 'C', 'D'] 
 LEADER_SERVERS = ['A', 'B', 'C', 'D'] 
 
-LOCAL_SERVERS = ['A'] # (Continua 'A')
\ No newline at end of file
+LOCAL_SERVERS = ['A'] # (Continua 'A')
+
+# --- Pool de conexões (app/conexao.py) ---
+CONNECT_TIMEOUT = 5            # segundos para o handshake TCP+auth de cada nó
+POOL_MAX_CONEXOES = 10         # conexões simultâneas por nó
+POOL_ESPERA_MAX_SEGUNDOS = 10  # espera máxima por uma conexão livre antes de desistir (pool esgotado)
+POOL_VALIDAR_APOS_SEGUNDOS = 30  # conexões ociosas há mais tempo que isso recebem um 'SELECT 1' na retirada
+
+# --- Saúde dos nós / circuit breaker (app/saude.py) ---
+SAUDE_ATIVA = True                # nós com falhas seguidas de conexão são ignorados até voltarem
+SAUDE_FALHAS_PARA_ABRIR = 2       # falhas de conexão seguidas que abrem o circuito do nó
+SAUDE_SONDA_INICIAL_SEGUNDOS = 1  # primeira sondagem após abrir; dobra a cada falha
+SAUDE_SONDA_MAX_SEGUNDOS = 30     # intervalo máximo entre sondagens de um nó fora do ar
+
+# --- Sincronização incremental (app/sincronizacao.py) ---
+SYNC_TAMANHO_LOTE = 1000               # registros por lote (cada lote avança o checkpoint)
+SYNC_MARGEM_SEGUNDOS = 300             # re-lê esta janela antes do checkpoint (commits fora de ordem / relógios)
+SYNC_VERIFICACAO_COMPLETA_HORAS = 24   # de quanto em quanto tempo o heal volta a comparar todas as chaves
+
+# --- Anti-entropia por árvore de hash (app/anti_entropia.py) ---
+SYNC_USAR_MERKLE = True      # a verificação completa do heal compara árvores de hash em vez de todas as chaves
+MERKLE_NIVEIS = [1, 2, 3]    # caracteres do prefixo do id em cada nível: 16, 256 e 4096 buckets
+
+# --- Outbox de replicação (app/replicacao.py) ---
+OUTBOX_LOTE = 100                  # entradas entregues por transação no destino
+OUTBOX_INTERVALO_SEGUNDOS = 2      # período do drenador em segundo plano
+OUTBOX_BACKOFF_MAX_SEGUNDOS = 60   # espera máxima entre tentativas para um par offline
+OUTBOX_TENTATIVAS_MAX = 10         # falhas de aplicação até a entrada ir para a fila morta
+
+# --- Consistência das escritas (app/replicacao.py) ---
+# Confirmações (W de N, contando o líder de origem) esperadas antes de responder:
+# ONE = só o líder local, QUORUM = maioria, ALL = todos. O restante é entregue em segundo plano.
+CONSISTENCIA_PADRAO = 'ALL'
+CONSISTENCIA_POR_OPERACAO = {      # sobrescreve o padrão por operação (None = padrão)
+    'matricular': None,
+    'remover_aluno': None,
+    'adicionar_disciplina': None,
+}
+REPLICACAO_TRABALHADORES = 16      # entregas simultâneas que seguem em segundo plano após atingir W
+
+# --- Fila de matrícula no servidor (app/matricular.py) ---
+# A fila é avaliada e gravada por fila_matricular() no líder local (1 chamada) e a outbox
+# replica 1 chamada de fila_aplicar_matricula() por nó. Requer as migrações 3 e 4 em TODOS os líderes.
+PROCEDIMENTOS_ARMAZENADOS = False
+# Sem os procedimentos, a FilaEspera de cada disciplina fica em memória entre matrículas e remoções
+# deste processo e só é remontada do estado global quando outra origem escreveu na fila (fila_versoes,
+# migração 6). Sem a migração 6 em algum nó, a fila é remontada a cada operação.
+FILA_EM_MEMORIA = True
+
+# --- Modo rajada: matrículas agrupadas por disciplina (app/rajada.py) ---
+RAJADA_ATIVA = False      # a API (e o benchmark com --rajada) matricula pelo modo rajada
+RAJADA_JANELA_MS = 20     # quanto o primeiro pedido de um lote espera pelos outros da mesma disciplina
+RAJADA_LOTE_MAX = 200     # com esse número de pedidos o lote fecha antes do fim da janela
+
+# --- Replicação por decodificação lógica (app/replicacao_logica.py) ---
+REPLICACAO_LOGICA_ATIVA = False            # inicia o daemon junto com o main.py (requer wal_level=logical)
+REPLICACAO_LOGICA_INTERVALO_SEGUNDOS = 0.2  # período de leitura dos slots
+REPLICACAO_LOGICA_LOTE = 1000              # mudanças lidas do slot por ciclo
+
+# --- Cache do catálogo de disciplinas (app/catalogo.py) ---
+CATALOGO_MAX_ENTRADAS = 1024        # disciplinas guardadas por nó (LRU)
+CATALOGO_REVALIDAR_SEGUNDOS = 5     # intervalo mínimo entre conferências da versão (max(chegada_em), count) no banco
+
+# --- Métricas de desempenho (app/metricas.py) ---
+METRICAS_ATIVAS = True           # spans de tempo em conexões, SQL, fila, replicação e heal
+METRICAS_PORTA = None            # ex.: 9108 para expor http://127.0.0.1:9108/metrics (None = desligado)
+METRICAS_LIMITE_LENTA_MS = 1000  # matrícula/remoção/adição acima disso imprimem onde o tempo foi gasto (None = nunca)
+
+# --- API HTTP/JSON (app/api.py) ---
+API_HOST = '127.0.0.1'
+API_PORTA = 8080
+API_TRABALHADORES = 8     # requisições atendidas ao mesmo tempo (cada uma usa conexões de vários pools)
+API_FILA_MAX = 64         # requisições aguardando um trabalhador; acima disso a API responde 503
+
+# --- Relógio lógico híbrido (app/relogio.py) ---
+RELOGIO_DESVIO_MAX_SEGUNDOS = 60   # avisa quando um nó grava timestamps mais adiantados que isso
+
+# --- Coleta de tombstones (app/coleta_tombstones.py) ---
+GC_CARENCIA_HORAS = 168   # tombstones mais novos que isso nunca são expurgados, mesmo confirmados por todos
+GC_LOTE = 1000            # tombstones conferidos/expurgados por transação
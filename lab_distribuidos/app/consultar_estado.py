@@ -1,80 +1,133 @@
+import queue
+import threading
 import psycopg2
+from concurrent.futures import ThreadPoolExecutor
 from prettytable import PrettyTable
-from app.config import SERVERS, ALL_SERVERS 
+from app.config import SERVERS, ALL_SERVERS
+from app.conexao import connect_to_db, liberar_conexao
 from datetime import timezone
 
-def connect_to_db(servidor_id):
-    config = SERVERS.get(servidor_id)
-    if not config: return None, "Configuração não encontrada."
-    connect_args = {k: v for k, v in config.items() if k != 'tipo'}
-    connect_args['connect_timeout'] = 5
+# Estado de TODAS as disciplinas de um nó numa única consulta: a posição na fila e a
+# validade da vaga vêm da window function, já ordenadas por disciplina e posição.
+QUERY_ESTADO = """
+    SELECT id, nome, vagas_totais, nome_aluno, timestamp_matricula, posicao, posicao <= vagas_totais AS valida
+    FROM (
+        SELECT d.id, d.nome, d.vagas_totais, m.nome_aluno, m.timestamp_matricula,
+               ROW_NUMBER() OVER (PARTITION BY d.id ORDER BY m.timestamp_matricula, m.id) AS posicao
+        FROM disciplinas d
+        LEFT JOIN matriculas m ON m.disciplina_id = d.id AND m.status <> 'REMOVIDA'
+        WHERE (d.is_deleted IS NULL OR d.is_deleted = false)
+    ) estado
+    ORDER BY nome, id, posicao;
+"""
+
+# Linhas trazidas por ida ao servidor pelo cursor nomeado (server-side)
+LINHAS_POR_LOTE = 2000
+
+# Blocos (disciplinas) já prontos que cada nó pode acumular antes de ser impresso: quem está
+# adiantado espera (a leitura do cursor para) em vez de guardar o nó inteiro em memória
+BLOCOS_EM_ESPERA = 64
+
+FIM = object()
+
+
+def _renderizar_disciplina(nome_disciplina, vagas_totais, matriculas):
+    """Bloco de texto de UMA disciplina. 'matriculas': [(posicao, nome, timestamp, valida)]."""
+    matricula_table = PrettyTable()
+    matricula_table.field_names = ["#", "Nome do Aluno", "Timestamp (H:M:S.ms)", "Status da Vaga"]
+    matricula_table.align = "l"
+    alunos_aceites = []
+    for posicao, nome, ts_db, valida in matriculas:
+        ts_utc = ts_db.replace(tzinfo=timezone.utc)
+        ts_local = ts_utc.astimezone(None)
+        ts_formatado = ts_local.strftime('%H:%M:%S.%f')[:-3]
+        if valida:
+            alunos_aceites.append(nome)
+            status = "✅ Válida"
+        else:
+            status = "❌ Conflito/Rejeitada"
+        matricula_table.add_row([posicao, nome, ts_formatado, status])
+
+    resumo_alunos = ', '.join(alunos_aceites) if alunos_aceites else 'Nenhum'
+    return (f"\n[DISCIPLINA: {nome_disciplina}] | Vagas: {len(alunos_aceites)}/{vagas_totais} ocupadas\n"
+            f"{matricula_table}\n"
+            f"Alunos Matriculados (Válidos): {resumo_alunos}\n"
+            + "-" * 70)
+
+
+def _colocar(saida, bloco, cancelado):
+    """put() na fila limitada que desiste se a impressão foi interrompida. Retorna False nesse caso."""
+    while not cancelado.is_set():
+        try:
+            saida.put(bloco, timeout=0.5)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _produzir_estado(servidor, saida, cancelado):
+    """
+    Lê o estado de UM servidor com um cursor nomeado (as linhas chegam em lotes) e coloca
+    em 'saida' um bloco de texto por disciplina, assim que ela termina. Encerra com FIM.
+    """
     try:
-        conn = psycopg2.connect(**connect_args)
-        return conn, None
-    except psycopg2.OperationalError as e:
-        return None, str(e)
+        conn = connect_to_db(servidor)
+        if not conn:
+            _colocar(saida, f"❌ Erro de conexão com o servidor {servidor}.", cancelado)
+            return
+        cursor = conn.cursor(name='consultar_estado')
+        cursor.itersize = LINHAS_POR_LOTE
+        try:
+            cursor.execute(QUERY_ESTADO)
+            id_atual = None
+            disciplina_atual = None  # (nome, vagas_totais)
+            matriculas = []
+            encontradas = 0
+            for disciplina_id, nome_disciplina, vagas_totais, nome_aluno, ts_db, posicao, valida in cursor:
+                if disciplina_id != id_atual:
+                    if disciplina_atual:
+                        bloco = _renderizar_disciplina(*disciplina_atual, matriculas)
+                        if not _colocar(saida, bloco, cancelado):
+                            return  # impressão interrompida
+                    id_atual, disciplina_atual, matriculas = disciplina_id, (nome_disciplina, vagas_totais), []
+                    encontradas += 1
+                if nome_aluno is not None:  # disciplina sem matrículas (LEFT JOIN)
+                    matriculas.append((posicao, nome_aluno, ts_db, valida))
+            if disciplina_atual:
+                _colocar(saida, _renderizar_disciplina(*disciplina_atual, matriculas), cancelado)
+            if not encontradas:
+                _colocar(saida, "⚠️ Nenhuma disciplina encontrada. Verifique se o banco foi inicializado.", cancelado)
+            else:
+                _colocar(saida, f"Total de disciplinas no {servidor}: {encontradas}", cancelado)
+        except psycopg2.Error as e:
+            _colocar(saida, f"❌ Erro ao consultar o servidor {servidor}: {e}", cancelado)
+        finally:
+            cursor.close()
+            liberar_conexao(conn)
+    finally:
+        _colocar(saida, FIM, cancelado)
+
 
 def consultar_estado():
     print("\n" + "="*70)
     print("INICIANDO CONSULTA DE ESTADO DETALHADO DOS SERVIDORES")
     print("="*70)
-    for servidor in ALL_SERVERS:
-        tipo = SERVERS[servidor]['tipo'].upper()
-        print("\n" + "="*20 + f" ESTADO DO {tipo} {servidor} " + "="*20)
-        conn, erro_conexao = connect_to_db(servidor)
-        if not conn:
-            print(f"❌ Erro de conexão com o servidor {servidor}: {erro_conexao}")
-            continue
-        cursor = conn.cursor()
-        try:
-           
-            cursor.execute("""
-                SELECT id, nome, vagas_totais FROM disciplinas 
-                WHERE (is_deleted IS NULL OR is_deleted = false) ORDER BY nome;
-            """)
-            disciplinas = cursor.fetchall()
-            if not disciplinas:
-                print("⚠️ Nenhuma disciplina encontrada. Verifique se o banco foi inicializado.")
-                continue
 
-            print(f"Disciplinas encontradas no {servidor}: {len(disciplinas)}")
-            print("-" * 70)
-            for disciplina_id, nome_disciplina, vagas_totais in disciplinas:
-                
-                
-                cursor.execute("""
-                    SELECT nome_aluno, timestamp_matricula FROM matriculas
-                    WHERE disciplina_id = %s AND status != 'REMOVIDA'
-                    ORDER BY timestamp_matricula;
-                """, (disciplina_id,))
-                matriculas = cursor.fetchall()
-                
-                matricula_table = PrettyTable()
-                matricula_table.field_names = ["#", "Nome do Aluno", "Timestamp (H:M:S.ms)", "Status da Vaga"]
-                matricula_table.align = "l"
-                vagas_ocupadas = 0
-                alunos_aceites = []
-                
-                for i, (nome, ts_db) in enumerate(matriculas):
-                    posicao = i + 1
-                    ts_utc = ts_db.replace(tzinfo=timezone.utc)
-                    ts_local = ts_utc.astimezone(None)
-                    ts_formatado = ts_local.strftime('%H:%M:%S.%f')[:-3] 
-                    if i < vagas_totais:
-                        vagas_ocupadas += 1
-                        alunos_aceites.append(nome)
-                        status = "✅ Válida"
-                    else:
-                        status = "❌ Conflito/Rejeitada"
-                    matricula_table.add_row([posicao, nome, ts_formatado, status])
+    # Os servidores são lidos ao mesmo tempo; a saída é impressa na ordem de ALL_SERVERS,
+    # à medida que cada disciplina fica pronta (os demais nós continuam lendo em paralelo).
+    saidas = {servidor: queue.Queue(maxsize=BLOCOS_EM_ESPERA) for servidor in ALL_SERVERS}
+    cancelado = threading.Event()
+    with ThreadPoolExecutor(max_workers=len(ALL_SERVERS), thread_name_prefix='estado') as executor:
+        for servidor, saida in saidas.items():
+            executor.submit(_produzir_estado, servidor, saida, cancelado)
 
-                print(f"\n[DISCIPLINA: {nome_disciplina}] | Vagas: {vagas_ocupadas}/{vagas_totais} ocupadas")
-                print(matricula_table)
-                resumo_alunos = ', '.join(alunos_aceites) if alunos_aceites else 'Nenhum'
-                print(f"Alunos Matriculados (Válidos): {resumo_alunos}")
-                print("-" * 70)
-        except Exception as e:
-            print(f"❌ Erro ao consultar o servidor {servidor}: {e}")
+        try:
+            for servidor, saida in saidas.items():
+                tipo = SERVERS[servidor]['tipo'].upper()
+                print("\n" + "="*20 + f" ESTADO DO {tipo} {servidor} " + "="*20)
+                while (bloco := saida.get()) is not FIM:
+                    print(bloco)
         finally:
-            if cursor: cursor.close()
-            if conn: conn.close()
\ No newline at end of file
+            # Interrompido (ex.: Ctrl+C): os produtores param em vez de esperar vaga na fila
+            cancelado.set()
@@ -0,0 +1,132 @@
+from bisect import bisect_left
+from collections import Counter
+
+STATUS_ACEITA = 'ACEITA'
+STATUS_REJEITADA = 'REJEITADA'
+
+
+class FilaEspera:
+    """
+    Fila de espera de UMA disciplina, ordenada por (timestamp_matricula, id).
+    As 'vagas_totais' primeiras posições são ACEITA e o restante REJEITADA.
+
+    A fila é carregada do estado global (corrigindo, numa única passada, status que estejam
+    fora da regra) e pode durar um lote ou várias operações: a posição de cada nova tentativa
+    vem de uma busca binária, e inserir ou remover alguém só pode mover UMA pessoa pela
+    fronteira das vagas. alteracoes() devolve apenas os status que de fato mudaram desde a
+    carga ou o último confirmar().
+    """
+
+    def __init__(self, vagas_totais, registros=()):
+        """'registros': tuplas (id, nome, timestamp_matricula, status), como as de consultar_estado_global."""
+        self.vagas_totais = vagas_totais
+        self._chaves = []          # [(timestamp_matricula, id)] em ordem
+        self._dados = {}           # id -> [nome, timestamp_matricula, status]
+        self._status_original = {} # id -> status lido do banco (para emitir só o que mudou)
+        self._tocados = set()      # ids cujo status foi recalculado desde a carga (ou o último confirmar)
+        self._novos = set()        # ids inseridos desde a carga (ou o último confirmar)
+        self._nomes = Counter()    # nome_aluno -> matrículas na fila
+        for matricula_id, nome, ts, status in registros:
+            if matricula_id in self._dados:
+                continue
+            self._chaves.append((ts, matricula_id))
+            self._dados[matricula_id] = [nome, ts, status]
+            self._status_original[matricula_id] = status
+            self._nomes[nome] += 1
+        self._chaves.sort()
+        for indice in range(len(self._chaves)):
+            self._definir_status(indice, self._status_da_posicao(indice))
+
+    def __len__(self):
+        return len(self._chaves)
+
+    def __contains__(self, matricula_id):
+        return matricula_id in self._dados
+
+    def _status_da_posicao(self, indice):
+        return STATUS_ACEITA if indice < self.vagas_totais else STATUS_REJEITADA
+
+    def _definir_status(self, indice, status):
+        matricula_id = self._chaves[indice][1]
+        if self._dados[matricula_id][2] != status:
+            self._dados[matricula_id][2] = status
+            self._tocados.add(matricula_id)
+
+    def _indice(self, matricula_id):
+        ts = self._dados[matricula_id][1]
+        return bisect_left(self._chaves, (ts, matricula_id))
+
+    def posicao(self, matricula_id):
+        """Posição (a partir de 1) de uma matrícula na fila."""
+        return self._indice(matricula_id) + 1
+
+    def status(self, matricula_id):
+        return self._dados[matricula_id][2]
+
+    def tem_aluno(self, nome):
+        """Se o aluno já tem uma matrícula (ACEITA ou REJEITADA) na fila."""
+        return self._nomes[nome] > 0
+
+    def status_anterior(self, matricula_id):
+        """Status lido do banco na carga (None para tentativas inseridas depois)."""
+        return self._status_original.get(matricula_id)
+
+    def inserir(self, matricula_id, nome, ts):
+        """
+        Insere uma nova tentativa. Se ela entrar dentro das vagas, quem ocupava a última vaga
+        passa a REJEITADA. Retorna (status, posicao) da nova tentativa.
+        """
+        chave = (ts, matricula_id)
+        indice = bisect_left(self._chaves, chave)
+        self._chaves.insert(indice, chave)
+        status = self._status_da_posicao(indice)
+        self._dados[matricula_id] = [nome, ts, status]
+        self._novos.add(matricula_id)
+        self._nomes[nome] += 1
+        if indice < self.vagas_totais < len(self._chaves):
+            self._definir_status(self.vagas_totais, STATUS_REJEITADA)
+        return status, indice + 1
+
+    def remover(self, matricula_id):
+        """
+        Remove uma matrícula. Se ela ocupava uma vaga, o primeiro da espera passa a ACEITA.
+        Retorna False se a matrícula não estava na fila.
+        """
+        if matricula_id not in self._dados:
+            return False
+        indice = self._indice(matricula_id)
+        del self._chaves[indice]
+        nome = self._dados.pop(matricula_id)[0]
+        self._nomes[nome] -= 1
+        self._status_original.pop(matricula_id, None)
+        if indice < self.vagas_totais <= len(self._chaves):
+            self._definir_status(self.vagas_totais - 1, STATUS_ACEITA)
+        return True
+
+    def alteracoes(self):
+        """Matrículas já existentes na carga cujo status mudou: [(id, nome, novo_status, timestamp_matricula)]."""
+        alteracoes = []
+        for matricula_id in self._tocados:
+            dados = self._dados.get(matricula_id)
+            if dados and matricula_id in self._status_original and dados[2] != self._status_original[matricula_id]:
+                alteracoes.append((matricula_id, dados[0], dados[2], dados[1]))
+        alteracoes.sort(key=lambda a: (a[3], a[0]))
+        return alteracoes
+
+    def confirmar(self):
+        """
+        Marca o estado atual como o gravado no banco (depois do commit), para a fila seguir em uso
+        na próxima operação: alteracoes() volta a ficar vazia. Custa O(mudanças desde a carga).
+        """
+        for matricula_id in self._tocados | self._novos:
+            dados = self._dados.get(matricula_id)
+            if dados:
+                self._status_original[matricula_id] = dados[2]
+        self._tocados.clear()
+        self._novos.clear()
+
+    def registros(self):
+        """A fila em ordem: (id, nome, timestamp_matricula, status)."""
+        for ts, matricula_id in self._chaves:
+            nome, _, status = self._dados[matricula_id]
+            yield matricula_id, nome, ts, status
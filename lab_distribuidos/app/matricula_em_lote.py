@@ -0,0 +1,236 @@
+"""
+Matrícula em lote a partir de um arquivo CSV (colunas aluno,disciplina) ou JSONL
+({"aluno": ..., "disciplina": ...} por linha).
+
+Os pedidos são agrupados por disciplina. Para cada uma, o estado global é lido UMA vez,
+todas as posições saem de uma única FilaEspera, e a escrita (inserts + mudanças de status)
+vai numa transação com execute_values, registrada na outbox e entregue aos pares no fim.
+
+Uso: python -m app.matricula_em_lote arquivo.csv
+"""
+import csv
+import json
+import sys
+import time
+import uuid
+from datetime import timedelta
+import psycopg2
+from psycopg2.extras import execute_values
+from prettytable import PrettyTable
+from app.config import LOCAL_SERVERS
+from app.conexao import connect_to_db, liberar_conexao
+from app.fila import FilaEspera, STATUS_ACEITA
+from app.matricular import consultar_estado_global, travar_disciplina
+from app.replicacao import Operacao, registrar_pendencias, entregar_pendencias
+from app.relogio import agora, reservar
+
+QUERY_INSERT_MATRICULAS = """
+    INSERT INTO matriculas (id, disciplina_id, nome_aluno, timestamp_matricula, status, data_ultima_modificacao)
+    VALUES %s
+    ON CONFLICT (id) DO NOTHING
+"""
+# Mesma guarda LWW de QUERY_ATUALIZAR_STATUS (app/matricular.py)
+QUERY_UPDATE_STATUS = """
+    UPDATE matriculas SET status = v.status, data_ultima_modificacao = v.ts::timestamptz
+    FROM (VALUES %s) AS v(id, status, ts)
+    WHERE matriculas.id = v.id::uuid AND matriculas.status <> 'REMOVIDA'
+      AND matriculas.data_ultima_modificacao < v.ts::timestamptz
+"""
+
+# Quantas linhas de resultado aparecem na tela (o relatório completo vai para o arquivo)
+LINHAS_NA_TELA = 20
+
+
+def _ler_registros(arquivo, caminho):
+    """(linha, registro) do CSV ou do JSONL. Linhas do JSONL que não são um objeto JSON vêm com registro None."""
+    if not caminho.endswith(('.jsonl', '.json')):
+        yield from enumerate(csv.DictReader(arquivo), start=2)
+        return
+    for linha, texto in enumerate(arquivo, start=1):
+        if not texto.strip():
+            continue
+        try:
+            registro = json.loads(texto)
+        except ValueError:
+            registro = None
+        yield linha, registro if isinstance(registro, dict) else None
+
+
+def ler_pedidos(caminho):
+    """Lê o arquivo e retorna [(linha, aluno, disciplina)]. Linhas inválidas ou incompletas são ignoradas com aviso."""
+    pedidos = []
+    with open(caminho, encoding='utf-8', newline='') as arquivo:
+        for linha, registro in _ler_registros(arquivo, caminho):
+            if registro is None:
+                print(f"⚠️ Linha {linha} ignorada: não é um objeto JSON válido.")
+                continue
+            aluno, disciplina = registro.get('aluno'), registro.get('disciplina')
+            if not isinstance(aluno, str) or not isinstance(disciplina, str) or not aluno.strip() or not disciplina.strip():
+                print(f"⚠️ Linha {linha} ignorada: 'aluno' e 'disciplina' são obrigatórios (texto).")
+                continue
+            pedidos.append((linha, aluno.strip(), disciplina.strip()))
+    return pedidos
+
+
+def _buscar_disciplinas(conn, nomes):
+    """{nome: (id, vagas_totais)} das disciplinas ativas, numa única consulta."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT nome, id, vagas_totais FROM disciplinas
+            WHERE nome = ANY(%s) AND (is_deleted IS NULL OR is_deleted = false)
+        """, (list(nomes),))
+        return {nome: (disciplina_id, vagas) for nome, disciplina_id, vagas in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def _matricular_disciplina(conn, lider_entrada, disciplina_id, vagas_totais, pedidos, resultados, ids=None):
+    """
+    Processa todos os pedidos de UMA disciplina numa transação. Preenche 'resultados'
+    ({linha: (status, posicao, mensagem)}) e, se informado, 'ids' ({linha: matricula_id} das
+    tentativas gravadas); retorna o número de mudanças de status em outros alunos.
+    """
+    cursor = conn.cursor()
+    try:
+        travar_disciplina(cursor, disciplina_id)
+        registros_atuais = consultar_estado_global(disciplina_id)
+        alunos_existentes = {nome for _, nome, _, _ in registros_atuais}
+        fila = FilaEspera(vagas_totais, registros_atuais)
+
+        # Timestamps reservados no relógio híbrido: cada pedido recebe +1 µs (ordem do arquivo)
+        timestamp_base = reservar(len(pedidos))
+
+        novos = []
+        for indice, (linha, aluno, _) in enumerate(pedidos):
+            if aluno in alunos_existentes:
+                resultados[linha] = ("REJEITADA", None, "Aluno já possui registro nesta disciplina")
+                continue
+            alunos_existentes.add(aluno)
+            matricula_id = str(uuid.uuid4())
+            timestamp = timestamp_base + timedelta(microseconds=indice)
+            fila.inserir(matricula_id, aluno, timestamp.replace(tzinfo=None))
+            novos.append((linha, matricula_id, aluno, timestamp))
+
+        # Status e posições finais (uma inserção pode ter empurrado outra da mesma carga)
+        linhas_insert = []
+        for linha, matricula_id, aluno, timestamp in novos:
+            status = fila.status(matricula_id)
+            resultados[linha] = (status, fila.posicao(matricula_id), "OK")
+            linhas_insert.append((matricula_id, disciplina_id, aluno, timestamp, status, timestamp))
+            if ids is not None:
+                ids[linha] = matricula_id
+        timestamp_alteracao = agora()
+        alteracoes = [(matricula_id, status, timestamp_alteracao) for matricula_id, _, status, _ in fila.alteracoes()]
+
+        operacoes = []
+        if linhas_insert:
+            operacoes.append(Operacao(QUERY_INSERT_MATRICULAS, linhas_insert, em_lote=True))
+        if alteracoes:
+            operacoes.append(Operacao(QUERY_UPDATE_STATUS, alteracoes, em_lote=True))
+        for op in operacoes:
+            execute_values(cursor, op.query, op.parametros, page_size=1000)
+        if operacoes:
+            registrar_pendencias(conn, lider_entrada, operacoes)
+        conn.commit()
+        return len(alteracoes)
+    except psycopg2.Error as e:
+        conn.rollback()
+        for linha, _, _ in pedidos:
+            resultados[linha] = ("ERRO", None, f"Erro PostgreSQL: {str(e).strip()}")
+        return 0
+    finally:
+        cursor.close()
+
+
+def matricular_em_lote(lider_entrada, pedidos):
+    """
+    Matricula todos os 'pedidos' ([(linha, aluno, disciplina)]) via 'lider_entrada'.
+    Retorna [(linha, aluno, disciplina, status, posicao, mensagem)] na ordem do arquivo.
+    """
+    inicio = time.perf_counter()
+    resultados = {}
+
+    por_disciplina = {}
+    for pedido in pedidos:
+        por_disciplina.setdefault(pedido[2], []).append(pedido)
+
+    conn = connect_to_db(lider_entrada)
+    if not conn:
+        print(f"❌ Matrícula em lote falhou: Líder {lider_entrada} está offline.")
+        return []
+    promocoes = 0
+    try:
+        disciplinas = _buscar_disciplinas(conn, por_disciplina.keys())
+        for nome, pedidos_disciplina in por_disciplina.items():
+            if nome not in disciplinas:
+                for linha, _, _ in pedidos_disciplina:
+                    resultados[linha] = ("REJEITADA", None, "Disciplina não encontrada ou removida")
+                continue
+            disciplina_id, vagas_totais = disciplinas[nome]
+            promocoes += _matricular_disciplina(conn, lider_entrada, disciplina_id, vagas_totais,
+                                                pedidos_disciplina, resultados)
+            print(f"✅ {nome}: {len(pedidos_disciplina)} pedidos processados.")
+    finally:
+        liberar_conexao(conn)
+
+    print("\n--- Replicação da Matrícula em Lote ---")
+    entregar_pendencias(lider_entrada).imprimir(f"{len(pedidos)} pedidos + {promocoes} mudanças de status")
+
+    duracao = time.perf_counter() - inicio
+    print(f"\n⏱ {len(pedidos)} pedidos em {duracao:.2f}s ({len(pedidos) / duracao if duracao else 0:.0f} pedidos/s).")
+    return [(linha, aluno, disciplina) + resultados[linha] for linha, aluno, disciplina in pedidos]
+
+
+def exibir_resultados(resultados, caminho_relatorio=None):
+    """Resumo por status na tela (com as primeiras linhas) e o relatório completo em CSV."""
+    contagem = {}
+    for resultado in resultados:
+        contagem[resultado[3]] = contagem.get(resultado[3], 0) + 1
+    print("Resumo: " + ", ".join(f"{status}: {qtd}" for status, qtd in sorted(contagem.items())))
+
+    table = PrettyTable()
+    table.field_names = ["Linha", "Aluno", "Disciplina", "Status", "Posição", "Mensagem"]
+    table.align = "l"
+    for linha, aluno, disciplina, status, posicao, mensagem in resultados[:LINHAS_NA_TELA]:
+        icone = "✅" if status == STATUS_ACEITA else "❌"
+        table.add_row([linha, aluno, disciplina, f"{icone} {status}", posicao or "-", mensagem])
+    print(table)
+
+    if caminho_relatorio:
+        with open(caminho_relatorio, 'w', encoding='utf-8', newline='') as arquivo:
+            escritor = csv.writer(arquivo)
+            escritor.writerow(["linha", "aluno", "disciplina", "status", "posicao", "mensagem"])
+            escritor.writerows(resultados)
+        print(f"📄 Relatório completo ({len(resultados)} linhas) salvo em {caminho_relatorio}")
+
+
+def importar_arquivo(caminho):
+    try:
+        pedidos = ler_pedidos(caminho)
+    except (OSError, ValueError) as e:
+        print(f"❌ Não foi possível ler o arquivo '{caminho}': {e}")
+        return
+    if not pedidos:
+        print("❌ Nenhum pedido válido no arquivo.")
+        return
+    lider_entrada = LOCAL_SERVERS[0]
+    print(f"\n⏳ Matriculando {len(pedidos)} pedidos via Líder {lider_entrada}...")
+    resultados = matricular_em_lote(lider_entrada, pedidos)
+    if resultados:
+        exibir_resultados(resultados, caminho.rsplit('.', 1)[0] + '.resultado.csv')
+
+
+def matricular_em_lote_menu():
+    caminho = input("Caminho do arquivo (CSV com colunas aluno,disciplina ou JSONL): ").strip()
+    if not caminho:
+        print("❌ Operação cancelada. O caminho do arquivo não pode ser vazio.")
+        return
+    importar_arquivo(caminho)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python -m app.matricula_em_lote arquivo.csv|arquivo.jsonl")
+        sys.exit(1)
+    importar_arquivo(sys.argv[1])
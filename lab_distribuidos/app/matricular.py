@@ -1,111 +1,240 @@
+import heapq
+import json
 import psycopg2
-import time
-from app.config import SERVERS, ALL_SERVERS, LOCAL_SERVERS 
-from psycopg2.extras import execute_values 
-
-STATUS_ACEITA = 'ACEITA'
-STATUS_REJEITADA = 'REJEITADA'
-
-def connect_to_db(servidor_id):
-    config = SERVERS.get(servidor_id)
-    if not config:
-        raise ValueError(f"Configuração do servidor {servidor_id} não encontrada.")
-    connect_args = {k: v for k, v in config.items() if k != 'tipo'}
-    connect_args['connect_timeout'] = 5
-    try:
-        conn = psycopg2.connect(**connect_args)
-        return conn
-    except psycopg2.OperationalError as e:
-        print(f"❌ Falha de conexão com {servidor_id}: {e}")
-        return None
+import threading
+import uuid
+from datetime import timezone
+from app.config import ALL_SERVERS, LOCAL_SERVERS, PROCEDIMENTOS_ARMAZENADOS, FILA_EM_MEMORIA
+from app.conexao import connect_to_db, liberar_conexao
+from app.replicacao import (Operacao, executar_em_paralelo, registrar_pendencias, entregar_pendencias,
+                            nivel_consistencia, QUERY_MARCAR_ORIGEM)
+from app.fila import FilaEspera, STATUS_ACEITA, STATUS_REJEITADA
+from app.catalogo import obter_disciplina
+from app.metricas import cronometrado, rotulo_no
+from app.relogio import agora, observar
+
+# Mudança de status da fila (promoção/rebaixamento), local e replicada pela outbox. A guarda faz
+# dela um LWW: uma entrega atrasada não ressuscita uma matrícula REMOVIDA nem desfaz uma
+# mudança mais nova. Parâmetros: (status, ts, id, ts).
+QUERY_ATUALIZAR_STATUS = """
+    UPDATE matriculas SET status = %s, data_ultima_modificacao = %s
+    WHERE id = %s AND status <> 'REMOVIDA' AND data_ultima_modificacao < %s
+"""
 
 def obter_disciplina_id_e_vagas(conn, disciplina_nome):
+    """(id, vagas_totais) da disciplina ativa no nó da conexão, servido pelo cache do catálogo."""
+    return obter_disciplina(conn, disciplina_nome)
+
+@cronometrado('consultar_fila', rotulo_no)
+def _consultar_fila_no_servidor(servidor_id, disciplina_id):
+    """Fila (não removida) da disciplina em UM nó, já ordenada por (timestamp_matricula, id)."""
+    conn = connect_to_db(servidor_id)
+    if not conn:
+        return []
     cursor = conn.cursor()
     try:
         cursor.execute("""
-            SELECT id, vagas_totais FROM disciplinas 
-            WHERE nome = %s AND (is_deleted IS NULL OR is_deleted = false)
-        """, (disciplina_nome,))
-        result = cursor.fetchone()
-        if result:
-            return result[0], result[1]
-        return None, None
+            SELECT id, nome_aluno, timestamp_matricula, status, data_ultima_modificacao
+            FROM matriculas
+            WHERE disciplina_id = %s AND status != 'REMOVIDA'
+            ORDER BY timestamp_matricula, id;
+        """, (disciplina_id,))
+        registros_corrigidos = []
+        modificacoes = []
+        for matricula_id, nome, timestamp_db, status, modificacao in cursor:
+            modificacoes.append(modificacao)
+            if timestamp_db and timestamp_db.tzinfo is not None:
+                # Normaliza para UTC: o merge compara timestamps vindos de nós diferentes
+                timestamp_naive = timestamp_db.astimezone(timezone.utc).replace(tzinfo=None)
+            else:
+                timestamp_naive = timestamp_db
+            registros_corrigidos.append((matricula_id, nome, timestamp_naive, status))
+        # As mudanças de status são LWW (QUERY_ATUALIZAR_STATUS): o relógio local passa a ficar
+        # depois da última modificação de cada matrícula da fila
+        observar(*modificacoes)
+        return registros_corrigidos
+    except Exception as e:
+        print(f"❌ Erro ao consultar servidor {servidor_id} para estado global: {e}")
+        return []
     finally:
         cursor.close()
+        liberar_conexao(conn)
+
+def _mesclar_filas(filas):
+    """
+    Merge k-way (streaming) das filas de cada nó, que já chegam ordenadas.
+    Remove duplicatas pelo id da matrícula à medida que os registros passam.
+    """
+    vistos = set()
+    for registro in heapq.merge(*filas, key=lambda r: (r[2], r[0])):
+        if registro[0] in vistos:
+            continue
+        vistos.add(registro[0])
+        yield registro
 
-def consultar_estado_global(disciplina_id):
-    """Consulta o estado global, ignorando matrículas removidas."""
-    todos_registros = []
-    for servidor_id in ALL_SERVERS:
-        conn = connect_to_db(servidor_id)
-        if conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute("""
-                    SELECT id, nome_aluno, timestamp_matricula, status
-                    FROM matriculas
-                    WHERE disciplina_id = %s AND status != 'REMOVIDA'
-                    ORDER BY timestamp_matricula;
-                """, (disciplina_id,))
-                
-                registros = cursor.fetchall()
-                registros_corrigidos = []
-                for matricula_id, nome, timestamp_db, status in registros:
-                    if timestamp_db and timestamp_db.tzinfo is not None:
-                        timestamp_naive = timestamp_db.replace(tzinfo=None)
-                    else:
-                        timestamp_naive = timestamp_db
-                    registros_corrigidos.append((matricula_id, nome, timestamp_naive, status))
-                todos_registros.extend(registros_corrigidos)
-            except Exception as e:
-                print(f"❌ Erro ao consultar servidor {servidor_id} para estado global: {e}")
-            finally:
-                if cursor: cursor.close()
-                if conn: conn.close()
-    
-    registros_unicos = set(todos_registros) 
-    registros_finais = list(registros_unicos)
-    registros_finais.sort(key=lambda x: x[2]) 
-    return registros_finais
-
-def reavaliar_posicao(lider_destino, disciplina_id, vagas_totais, nova_tentativa=None, id_a_ignorar=None):
-    """
-    Reavalia o status de todos os alunos na fila.
+def travar_disciplina(cursor, disciplina_id):
+    """
+    Serializa, NESTE líder, as escritas na fila de uma disciplina até o fim da transação:
+    duas matrículas simultâneas (ex.: via API) não calculam posições sobre o mesmo estado.
+    """
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('fila:' || %s))", (str(disciplina_id),))
+
+# --- Fila em memória (FILA_EM_MEMORIA) ---
+# Cada processo marca as suas escritas nas filas com uma origem própria por líder; os triggers da
+# migração 6 contam, por disciplina, as escritas de cada origem em cada nó (fila_versoes). Enquanto
+# a soma das escritas de OUTRAS origens não muda em nenhum nó, a FilaEspera guardada continua
+# igual ao estado global e a operação seguinte a usa direto, sem ler as filas.
+ORIGEM_PROCESSO = uuid.uuid4().hex[:12]
+_filas = {}      # (lider, disciplina_id) -> (versoes, FilaEspera)
+_geracoes = {}   # (lider, disciplina_id) -> nº de aberturas (só a última abertura guarda a fila)
+_filas_lock = threading.Lock()
+
+def origem_escritas(lider):
+    """Origem das escritas deste processo pelo 'lider' (app.origem, migração 6)."""
+    return f"{ORIGEM_PROCESSO}:{lider}"
+
+def marcar_origem(cursor, lider):
+    """Marca a transação do cursor (e o que a outbox replicar dela) com a origem deste processo."""
+    cursor.execute(QUERY_MARCAR_ORIGEM, (origem_escritas(lider),))
+
+def _versao_fila_no_servidor(servidor_id, disciplina_id, origem):
+    """
+    Escritas de outras origens na fila da disciplina em UM nó: 'offline' se o nó não responde e
+    None se não foi possível ler (ex.: nó sem a migração 6), o que impede reaproveitar a fila.
+    """
+    conn = connect_to_db(servidor_id)
+    if not conn:
+        return 'offline'
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT coalesce(sum(versao), 0) FROM fila_versoes WHERE disciplina_id = %s AND origem <> %s",
+                       (disciplina_id, origem))
+        versao = cursor.fetchone()[0]
+        conn.rollback()
+        return versao
+    except psycopg2.Error:
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+        liberar_conexao(conn)
+
+def _versoes_fila(lider, disciplina_id):
+    versoes = executar_em_paralelo(ALL_SERVERS, _versao_fila_no_servidor, disciplina_id, origem_escritas(lider))
+    return None if None in versoes.values() else versoes
+
+def abrir_fila(lider, disciplina_id, vagas_totais):
+    """
+    FilaEspera da disciplina para uma operação do 'lider' (chamar com a trava da disciplina).
+    Reaproveita a fila guardada por guardar_fila() se nenhuma outra origem escreveu nela desde
+    então; senão, monta de novo do estado global. Retorna (fila, marca), a marca para guardar_fila().
+    """
+    chave = (lider, str(disciplina_id))
+    with _filas_lock:
+        guardada = _filas.pop(chave, None)
+        geracao = _geracoes[chave] = _geracoes.get(chave, 0) + 1
+    if not FILA_EM_MEMORIA:
+        return FilaEspera(vagas_totais, consultar_estado_global(disciplina_id)), (geracao, None)
+
+    versoes = _versoes_fila(lider, disciplina_id)
+    if guardada and versoes is not None and guardada[0] == versoes and guardada[1].vagas_totais == vagas_totais:
+        return guardada[1], (geracao, versoes)
+    fila = FilaEspera(vagas_totais, consultar_estado_global(disciplina_id))
+    # Uma escrita de outra origem (ou um nó que caiu) durante a leitura: a fila não é guardada
+    if versoes is not None and _versoes_fila(lider, disciplina_id) != versoes:
+        versoes = None
+    return fila, (geracao, versoes)
+
+def guardar_fila(lider, disciplina_id, fila, marca):
+    """
+    Guarda a fila para a próxima operação, DEPOIS do commit das escritas calculadas com ela.
+    Não guarda se as versões não puderam ser lidas ou se outra operação abriu a fila depois.
+    """
+    geracao, versoes = marca
+    if versoes is None:
+        return
+    fila.confirmar()
+    chave = (lider, str(disciplina_id))
+    with _filas_lock:
+        if _geracoes.get(chave) == geracao:
+            _filas[chave] = (versoes, fila)
+
+@cronometrado('consultar_estado_global')
+def consultar_estado_global(disciplina_id, servidores=None):
+    """
+    Consulta o estado global (todos os nós em paralelo, ou só 'servidores'), ignorando
+    matrículas removidas.
+    """
+    filas = executar_em_paralelo(servidores or ALL_SERVERS, _consultar_fila_no_servidor, disciplina_id)
+    registros = list(_mesclar_filas(filas.values()))
+    # O relógio local passa a ficar depois de tudo o que foi visto nos outros nós
+    observar(*(ts for _, _, ts, _ in registros[-1:]))
+    return registros
+
+@cronometrado('reavaliar_posicao', rotulo_no)
+def reavaliar_posicao(lider_destino, disciplina_id, vagas_totais, nova_tentativa=None, id_a_ignorar=None,
+                      registros_atuais=None, fila=None):
+    """
+    Reavalia a fila após uma nova tentativa e/ou a remoção de 'id_a_ignorar'.
+    'fila' é a FilaEspera de abrir_fila(), que fica em memória entre operações: inserir e remover
+    são incrementais e só os alunos que cruzam a fronteira das vagas (ou que estavam com status
+    fora da regra) geram updates. Sem ela, a fila é montada de 'registros_atuais' (um
+    consultar_estado_global já feito pelo chamador) ou do estado global.
     'lider_destino' é usado apenas para a lógica de consulta (embora aqui não seja usado).
     """
-    
-    registros_atuais = consultar_estado_global(disciplina_id)
-    updates_a_replicar = []
-    
+
+    if fila is None:
+        if registros_atuais is None:
+            registros_atuais = consultar_estado_global(disciplina_id)
+        fila = FilaEspera(vagas_totais, registros_atuais)
+
     if id_a_ignorar:
-        registros_limpos = [r for r in registros_atuais if r[0] != id_a_ignorar]
-    else:
-        registros_limpos = list(registros_atuais)
+        fila.remover(id_a_ignorar)
 
-    if nova_tentativa:
-        registros_limpos.append(nova_tentativa)
-        registros_limpos.sort(key=lambda x: x[2])
-        
     posicao_na_fila = 0
     status_final = None
+    if nova_tentativa:
+        novo_id, nome, ts, _ = nova_tentativa
+        status_final, posicao_na_fila = fila.inserir(novo_id, nome, ts)
+        print(f"Aluno {nome} (Novo) -> Status Final: {status_final} (Posição: {posicao_na_fila}/{vagas_totais})")
+
+    updates_a_replicar = fila.alteracoes()
+    for old_id, nome, status_calculado, ts in updates_a_replicar:
+        print(f"Status Atualizado: {nome} mudou de {fila.status_anterior(old_id)} para {status_calculado}")
 
-    for i, (old_id, nome, ts, status_antigo) in enumerate(registros_limpos):
-        posicao = i + 1
-        status_calculado = STATUS_ACEITA if posicao <= vagas_totais else STATUS_REJEITADA
-        
-        is_nova_tentativa = nova_tentativa and old_id == nova_tentativa[0]
-        
-        if is_nova_tentativa:
-            status_final = status_calculado
-            posicao_na_fila = posicao
-            print(f"Aluno {nome} (Novo) -> Status Final: {status_final} (Posição: {posicao}/{vagas_totais})")
-            
-        elif status_calculado != status_antigo:
-            updates_a_replicar.append((old_id, nome, status_calculado, ts))
-            print(f"Status Atualizado: {nome} mudou de {status_antigo} para {status_calculado}")
-    
     return status_final, posicao_na_fila, updates_a_replicar
 
+# Replicação da matrícula avaliada no servidor: 1 comando por nó (migração 3)
+QUERY_APLICAR_MATRICULA = "SELECT fila_aplicar_matricula(%s, %s, %s, %s, %s, %s::jsonb)"
+
+@cronometrado('reavaliar_posicao', lambda cursor, *args: {'no': cursor.connection.servidor_id})
+def avaliar_no_servidor(cursor, matricula_id, disciplina_id, aluno_nome, timestamp_utc, vagas_totais, externos):
+    """
+    Versão de reavaliar_posicao executada no próprio banco: fila_matricular() junta a fila
+    local com 'externos' (filas lidas dos outros nós), grava a tentativa e as mudanças de status
+    e devolve o resultado em UMA chamada.
+    Retorna (status_final, posicao, alteracoes) ou None se o aluno já está na fila.
+    'alteracoes' vem no formato [{'id', 'status'}] de fila_aplicar_matricula.
+    """
+    fila_externa = [{'id': str(mid), 'nome_aluno': nome, 'status': status,
+                     'timestamp_matricula': ts.replace(tzinfo=timezone.utc).isoformat()}
+                    for mid, nome, ts, status in externos]
+    cursor.execute("SELECT matricula_id, aluno, novo_status, posicao, nova FROM fila_matricular(%s, %s, %s, %s, %s, %s::jsonb)",
+                   (matricula_id, disciplina_id, aluno_nome, timestamp_utc, vagas_totais, json.dumps(fila_externa)))
+    linhas = cursor.fetchall()
+    _, _, status_final, posicao_na_fila, _ = next(linha for linha in linhas if linha[4])
+    if status_final == 'DUPLICADA':
+        return None
+    print(f"Aluno {aluno_nome} (Novo) -> Status Final: {status_final} (Posição: {posicao_na_fila}/{vagas_totais})")
+    alteracoes = []
+    for old_id, nome, novo_status, _, nova in linhas:
+        if nova:
+            continue
+        anterior = STATUS_REJEITADA if novo_status == STATUS_ACEITA else STATUS_ACEITA
+        print(f"Status Atualizado: {nome} mudou de {anterior} para {novo_status}")
+        alteracoes.append({'id': str(old_id), 'status': novo_status})
+    return status_final, posicao_na_fila, alteracoes
+
 def matricular_aluno_menu():
     aluno_nome = input("Nome do Aluno: ").strip()
     disciplina_nome = input("Nome da Disciplina: ").strip()
@@ -119,36 +248,55 @@ def matricular_aluno_menu():
     print(f"\n⏳ Tentando matricular {aluno_nome} (Disciplina: {disciplina_nome}) via Líder {lider_entrada}...")
     _processar_matricula(lider_entrada, aluno_nome, disciplina_nome)
 
-def _processar_matricula(lider_entrada, aluno_nome, disciplina_nome):
+@cronometrado('matricular', rotulo_no, relatar_lenta=True)
+def _processar_matricula(lider_entrada, aluno_nome, disciplina_nome, consistencia=None):
     """
     Processa a matrícula.
     'lider_entrada' é o ID do servidor local que está recebendo a requisição.
+    'consistencia' (ONE, QUORUM, ALL; None = config.py) define quantos líderes precisam ter
+    gravado antes do retorno.
+    Retorna um dict com 'sucesso' e, em caso de falha, 'motivo' (offline, nao_encontrada,
+    duplicada ou erro) e 'mensagem'; em caso de sucesso, o status e a posição na fila.
     """
-    
+    nivel = nivel_consistencia('matricular', consistencia)
     conn = connect_to_db(lider_entrada)
     if not conn:
         print(f"❌ Matrícula falhou: Líder {lider_entrada} está offline.")
-        return
+        return {'sucesso': False, 'motivo': 'offline', 'mensagem': f"Líder {lider_entrada} está offline."}
     cursor = conn.cursor()
     try:
         disciplina_id, vagas_totais = obter_disciplina_id_e_vagas(conn, disciplina_nome)
         if not disciplina_id:
             print(f"❌ Matrícula falhou: Disciplina '{disciplina_nome}' não encontrada ou foi removida.")
-            return
+            return {'sucesso': False, 'motivo': 'nao_encontrada',
+                    'mensagem': f"Disciplina '{disciplina_nome}' não encontrada ou foi removida."}
 
-        registros_atuais = consultar_estado_global(disciplina_id)
-        alunos_existentes = {nome for id, nome, ts, status in registros_atuais}
-        if aluno_nome in alunos_existentes:
+        travar_disciplina(cursor, disciplina_id)
+        if PROCEDIMENTOS_ARMAZENADOS:
+            resultado = _matricular_no_servidor(lider_entrada, conn, cursor, disciplina_id, vagas_totais,
+                                                aluno_nome, disciplina_nome, nivel)
+            if resultado is not None:
+                return resultado
             print(f"❌ REJEITADA! Aluno {aluno_nome} já possui um registro de matrícula (ACEITA ou REJEITADA) na {disciplina_nome}.")
-            return
+            return {'sucesso': False, 'motivo': 'duplicada',
+                    'mensagem': f"Aluno {aluno_nome} já possui um registro de matrícula na {disciplina_nome}."}
 
-        cursor.execute("SELECT gen_random_uuid(), (NOW() AT TIME ZONE 'UTC')")
-        matricula_id, timestamp_utc = cursor.fetchone()
+        marcar_origem(cursor, lider_entrada)
+        fila, marca = abrir_fila(lider_entrada, disciplina_id, vagas_totais)
+        if fila.tem_aluno(aluno_nome):
+            conn.rollback()
+            guardar_fila(lider_entrada, disciplina_id, fila, marca)
+            print(f"❌ REJEITADA! Aluno {aluno_nome} já possui um registro de matrícula (ACEITA ou REJEITADA) na {disciplina_nome}.")
+            return {'sucesso': False, 'motivo': 'duplicada',
+                    'mensagem': f"Aluno {aluno_nome} já possui um registro de matrícula na {disciplina_nome}."}
+
+        # Id e timestamp gerados localmente (relógio híbrido), depois de obtida a trava
+        matricula_id, timestamp_utc = str(uuid.uuid4()), agora()
         timestamp_naive = timestamp_utc.replace(tzinfo=None)
         nova_tentativa = (matricula_id, aluno_nome, timestamp_naive, 'PENDENTE')
 
         status_final, posicao_na_fila, updates_a_replicar = reavaliar_posicao(
-            lider_entrada, disciplina_id, vagas_totais, nova_tentativa, id_a_ignorar=None
+            lider_entrada, disciplina_id, vagas_totais, nova_tentativa, id_a_ignorar=None, fila=fila
         )
        
         
@@ -162,47 +310,69 @@ def _processar_matricula(lider_entrada, aluno_nome, disciplina_nome):
             VALUES (%s, %s, %s, %s, %s, %s)
             ON CONFLICT (id) DO NOTHING
         """
-        update_query = "UPDATE matriculas SET status = %s, data_ultima_modificacao = (NOW() AT TIME ZONE 'UTC') WHERE id = %s"
-        
+
         cursor.execute(insert_query, matr_a_inserir)
         for old_id, nome, novo_status, ts in updates_a_replicar:
-            cursor.execute(update_query, (novo_status, old_id))
+            cursor.execute(QUERY_ATUALIZAR_STATUS, (novo_status, timestamp_utc, old_id, timestamp_utc))
+
+        # Outbox: a replicação pendente é gravada na MESMA transação da matrícula
+        # (o mesmo timestamp vai para todos os nós: nenhum deles gera o seu)
+        replicacoes_pendentes = [Operacao(insert_query, matr_a_inserir)]
+        for old_id, nome, novo_status, ts in updates_a_replicar:
+            replicacoes_pendentes.append(Operacao(QUERY_ATUALIZAR_STATUS, (novo_status, timestamp_utc, old_id, timestamp_utc)))
+        registrar_pendencias(conn, lider_entrada, replicacoes_pendentes, origem=origem_escritas(lider_entrada))
         conn.commit()
+        guardar_fila(lider_entrada, disciplina_id, fila, marca)
         
-        print("\n--- Replicação de Matrícula ---")
-        replicacoes_pendentes = [(insert_query, matr_a_inserir)]
-        for old_id, nome, novo_status, ts in updates_a_replicar:
-            replicacoes_pendentes.append((update_query, (novo_status, old_id)))
-
-        for servidor_id in ALL_SERVERS:
-            if servidor_id == lider_entrada: continue
-            replica_conn = connect_to_db(servidor_id)
-            if replica_conn:
-                replica_cursor = replica_conn.cursor()
-                try:
-                    for query, data in replicacoes_pendentes:
-                        replica_cursor.execute(query, data)
-                    replica_conn.commit()
-                    print(f"➡ Replicação SUCESSO (Nova matrícula + {len(updates_a_replicar)} updates) para o Líder {servidor_id}.")
-                except Exception as e:
-                    print(f"❌ Erro ao replicar para {servidor_id}: {e}")
-                    replica_conn.rollback()
-                finally:
-                    if replica_cursor: replica_cursor.close()
-                    if replica_conn: replica_conn.close()
-            else:
-                print(f"❌ Falha de Conexão: Líder {servidor_id} offline. (Replicação pendente)")
-
-        print(f"\nResultado da Matrícula (Líder {lider_entrada}):")
-        if status_final == STATUS_ACEITA:
-            print(f"✅ SUCESSO! Aluno {aluno_nome} aceito na {disciplina_nome}. (Posição: {posicao_na_fila}/{vagas_totais})")
-        else:
-            print(f"❌ REJEITADA! Aluno {aluno_nome} rejeitado. (Posição: {posicao_na_fila}/{vagas_totais})")
+        return _concluir_matricula(lider_entrada, nivel, matricula_id, aluno_nome, disciplina_nome,
+                                   status_final, posicao_na_fila, vagas_totais, len(updates_a_replicar))
     except psycopg2.Error as e:
         conn.rollback()
         print(f"❌ Erro PostgreSQL durante a matrícula: {e}")
+        return {'sucesso': False, 'motivo': 'erro', 'mensagem': f"Erro PostgreSQL: {str(e).strip()}"}
     except Exception as e:
         print(f"❌ Erro inesperado: {e}")
+        return {'sucesso': False, 'motivo': 'erro', 'mensagem': f"Erro inesperado: {e}"}
     finally:
         if cursor: cursor.close()
-        if conn: conn.close()
\ No newline at end of file
+        liberar_conexao(conn)
+
+def _matricular_no_servidor(lider_entrada, conn, cursor, disciplina_id, vagas_totais, aluno_nome, disciplina_nome, nivel):
+    """
+    Caminho de _processar_matricula com PROCEDIMENTOS_ARMAZENADOS (trava já obtida): os outros
+    nós são só lidos, e a avaliação e a gravação no líder local são uma chamada a fila_matricular().
+    Retorna o dict de resultado, ou None se o aluno já está na fila.
+    """
+    externos = consultar_estado_global(disciplina_id, [s for s in ALL_SERVERS if s != lider_entrada])
+    matricula_id, timestamp_utc = str(uuid.uuid4()), agora()
+    avaliacao = avaliar_no_servidor(cursor, matricula_id, disciplina_id, aluno_nome, timestamp_utc,
+                                    vagas_totais, externos)
+    if avaliacao is None:
+        conn.rollback()
+        return None
+    status_final, posicao_na_fila, alteracoes = avaliacao
+
+    # Outbox: a mesma chamada (com a fila já avaliada) é o único comando replicado para cada nó
+    registrar_pendencias(conn, lider_entrada, [Operacao(QUERY_APLICAR_MATRICULA, (
+        matricula_id, disciplina_id, aluno_nome, timestamp_utc, status_final, json.dumps(alteracoes)))])
+    conn.commit()
+    return _concluir_matricula(lider_entrada, nivel, matricula_id, aluno_nome, disciplina_nome,
+                               status_final, posicao_na_fila, vagas_totais, len(alteracoes))
+
+def _concluir_matricula(lider_entrada, nivel, matricula_id, aluno_nome, disciplina_nome,
+                        status_final, posicao_na_fila, vagas_totais, promocoes):
+    """Entrega a replicação (já na outbox e commitada) e monta o resultado da matrícula."""
+    print("\n--- Replicação de Matrícula ---")
+    resultado_replicacao = entregar_pendencias(lider_entrada, nivel=nivel)
+    resultado_replicacao.imprimir(f"Nova matrícula + {promocoes} updates")
+
+    print(f"\nResultado da Matrícula (Líder {lider_entrada}):")
+    if status_final == STATUS_ACEITA:
+        print(f"✅ SUCESSO! Aluno {aluno_nome} aceito na {disciplina_nome}. (Posição: {posicao_na_fila}/{vagas_totais})")
+    else:
+        print(f"❌ REJEITADA! Aluno {aluno_nome} rejeitado. (Posição: {posicao_na_fila}/{vagas_totais})")
+    return {'sucesso': True, 'matricula_id': str(matricula_id), 'status': status_final,
+            'posicao': posicao_na_fila, 'vagas_totais': vagas_totais,
+            'promocoes': promocoes,
+            'replicacao': {s: r.sucesso for s, r in resultado_replicacao.pares.items()},
+            'consistencia': resultado_replicacao.resumo_consistencia()}
@@ -0,0 +1,247 @@
+"""
+Instrumentação leve: spans de tempo, histogramas de latência e contadores por operação e nó,
+exportáveis no formato texto do Prometheus (arquivo ou endpoint HTTP local).
+
+    with span('reavaliar_posicao', no='A'):
+        ...
+
+    @cronometrado('matricular', rotulo_no, relatar_lenta=True)
+    def _processar_matricula(lider_entrada, ...): ...
+
+Os spans de uma mesma thread se aninham: quando uma operação marcada com 'relatar_lenta'
+passa de METRICAS_LIMITE_LENTA_MS, é impresso onde o tempo foi gasto (conexão, SQL, fila,
+replicação...).
+"""
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from prettytable import PrettyTable
+from app.config import METRICAS_ATIVAS, METRICAS_LIMITE_LENTA_MS
+
+PREFIXO = "lab_distribuidos"
+# Limites superiores (segundos) dos buckets do histograma
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histograma:
+    """Contagens por bucket (não cumulativas), soma e máximo das durações observadas."""
+
+    __slots__ = ('contagens', 'soma', 'total', 'maximo')
+
+    def __init__(self):
+        self.contagens = [0] * (len(BUCKETS_SEGUNDOS) + 1)
+        self.soma = 0.0
+        self.total = 0
+        self.maximo = 0.0
+
+    def observar(self, segundos):
+        indice = 0
+        while indice < len(BUCKETS_SEGUNDOS) and segundos > BUCKETS_SEGUNDOS[indice]:
+            indice += 1
+        self.contagens[indice] += 1
+        self.soma += segundos
+        self.total += 1
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+
+_histogramas = {}   # (operacao, rotulos ordenados) -> Histograma
+_erros = {}         # (operacao, rotulos ordenados) -> int
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _chave(operacao, rotulos):
+    return operacao, tuple(sorted((k, str(v)) for k, v in rotulos.items() if v is not None))
+
+
+def observar(operacao, segundos, erro=False, **rotulos):
+    """Registra uma duração (e, se 'erro', uma falha) para a operação com esses rótulos."""
+    chave = _chave(operacao, rotulos)
+    with _lock:
+        histograma = _histogramas.get(chave)
+        if histograma is None:
+            histograma = _histogramas[chave] = Histograma()
+        histograma.observar(segundos)
+        if erro:
+            _erros[chave] = _erros.get(chave, 0) + 1
+
+
+class span:
+    """
+    Context manager que mede um trecho e registra no histograma de 'operacao'.
+    Exceções que atravessam o span contam como erro (e são propagadas).
+    """
+
+    __slots__ = ('operacao', 'rotulos', 'relatar_lenta', 'inicio', 'filhos')
+
+    def __init__(self, operacao, relatar_lenta=False, **rotulos):
+        self.operacao = operacao
+        self.rotulos = rotulos
+        self.relatar_lenta = relatar_lenta
+
+    def __enter__(self):
+        if not METRICAS_ATIVAS:
+            return self
+        pilha = getattr(_local, 'pilha', None)
+        if pilha is None:
+            pilha = _local.pilha = []
+        self.filhos = {}
+        pilha.append(self)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_erro, erro, tb):
+        if not METRICAS_ATIVAS:
+            return False
+        duracao = time.perf_counter() - self.inicio
+        pilha = _local.pilha
+        pilha.pop()
+        observar(self.operacao, duracao, erro=tipo_erro is not None, **self.rotulos)
+        descricao = self.operacao + (f"@{self.rotulos['no']}" if self.rotulos.get('no') else "")
+        if pilha:
+            pai = pilha[-1].filhos
+            total, vezes = pai.get(descricao, (0.0, 0))
+            pai[descricao] = (total + duracao, vezes + 1)
+        if self.relatar_lenta and METRICAS_LIMITE_LENTA_MS is not None and duracao * 1000 >= METRICAS_LIMITE_LENTA_MS:
+            partes = ", ".join(f"{nome} {total * 1000:.0f}ms" + (f" ({vezes}x)" if vezes > 1 else "")
+                               for nome, (total, vezes) in sorted(self.filhos.items(), key=lambda i: -i[1][0]))
+            print(f"🐢 Operação lenta: {descricao} levou {duracao * 1000:.0f}ms [{partes or 'sem detalhamento'}]")
+        return False
+
+
+def rotulo_no(servidor_id, *args, **kwargs):
+    """Rótulos de funções cujo primeiro argumento é o nó (lider_entrada, destino...)."""
+    return {'no': servidor_id}
+
+
+def cronometrado(operacao, rotulos=None, relatar_lenta=False):
+    """
+    Decorador: cada chamada vira um span 'operacao'. 'rotulos' recebe os mesmos argumentos da
+    função e devolve o dict de rótulos (ex.: rotulo_no).
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with span(operacao, relatar_lenta, **(rotulos(*args, **kwargs) if rotulos else {})):
+                return funcao(*args, **kwargs)
+        return medida
+    return decorador
+
+
+def _formatar_rotulos(rotulos, extra=None):
+    itens = list(rotulos) + ([extra] if extra else [])
+    if not itens:
+        return ""
+    escapar = lambda v: v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in itens) + "}"
+
+
+def exportar_prometheus():
+    """Todas as métricas no formato texto de exposição do Prometheus."""
+    with _lock:
+        histogramas = {chave: (list(h.contagens), h.soma, h.total) for chave, h in _histogramas.items()}
+        erros = dict(_erros)
+
+    linhas = []
+    nome = f"{PREFIXO}_operacao_duracao_segundos"
+    linhas.append(f"# HELP {nome} Duração das operações instrumentadas, por operação e nó.")
+    linhas.append(f"# TYPE {nome} histogram")
+    for (operacao, rotulos), (contagens, soma, total) in sorted(histogramas.items()):
+        base = (('operacao', operacao),) + rotulos
+        acumulado = 0
+        for limite, contagem in zip(BUCKETS_SEGUNDOS, contagens):
+            acumulado += contagem
+            linhas.append(f"{nome}_bucket{_formatar_rotulos(base, ('le', repr(limite)))} {acumulado}")
+        linhas.append(f"{nome}_bucket{_formatar_rotulos(base, ('le', '+Inf'))} {total}")
+        linhas.append(f"{nome}_sum{_formatar_rotulos(base)} {soma:.6f}")
+        linhas.append(f"{nome}_count{_formatar_rotulos(base)} {total}")
+
+    nome = f"{PREFIXO}_operacao_erros_total"
+    linhas.append(f"# HELP {nome} Operações instrumentadas que terminaram com exceção.")
+    linhas.append(f"# TYPE {nome} counter")
+    for (operacao, rotulos), quantidade in sorted(erros.items()):
+        linhas.append(f"{nome}{_formatar_rotulos((('operacao', operacao),) + rotulos)} {quantidade}")
+    return "\n".join(linhas) + "\n"
+
+
+def salvar_metricas(caminho):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(exportar_prometheus())
+
+
+def zerar_metricas():
+    with _lock:
+        _histogramas.clear()
+        _erros.clear()
+
+
+# --- ENDPOINT HTTP (/metrics) ---
+
+class _HandlerMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        corpo = exportar_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass  # não polui o menu com o log de cada coleta
+
+
+_servidor_http = None
+
+
+def iniciar_servidor_metricas(porta, host='127.0.0.1'):
+    """Expõe /metrics em http://host:porta numa thread em segundo plano."""
+    global _servidor_http
+    if _servidor_http:
+        return
+    try:
+        _servidor_http = ThreadingHTTPServer((host, porta), _HandlerMetricas)
+    except OSError as e:
+        print(f"⚠️ Endpoint de métricas não iniciado na porta {porta}: {e}")
+        return
+    _servidor_http.daemon_threads = True
+    threading.Thread(target=_servidor_http.serve_forever, name='metricas-http', daemon=True).start()
+    print(f"📈 Métricas disponíveis em http://{host}:{porta}/metrics")
+
+
+def parar_servidor_metricas():
+    global _servidor_http
+    if _servidor_http:
+        _servidor_http.shutdown()
+        _servidor_http.server_close()
+        _servidor_http = None
+
+
+def exibir_metricas():
+    """Resumo na tela (operação x nó) e, se pedido, exportação para arquivo."""
+    with _lock:
+        linhas = [(operacao, dict(rotulos), h.total, _erros.get((operacao, rotulos), 0), h.soma, h.maximo)
+                  for (operacao, rotulos), h in sorted(_histogramas.items())]
+    if not linhas:
+        print("Nenhuma operação medida ainda." + ("" if METRICAS_ATIVAS else " (METRICAS_ATIVAS = False no config.py)"))
+        return
+    table = PrettyTable()
+    table.field_names = ["Operação", "Nó", "Outros Rótulos", "Chamadas", "Erros", "Média (ms)", "Máx (ms)"]
+    table.align = "l"
+    for operacao, rotulos, total, erros, soma, maximo in linhas:
+        no = rotulos.pop('no', '-')
+        outros = " ".join(f"{k}={v}" for k, v in rotulos.items()) or "-"
+        table.add_row([operacao, no, outros, total, erros, f"{soma / total * 1000:.2f}", f"{maximo * 1000:.2f}"])
+    print("\n--- Métricas de Desempenho (desde o início do processo) ---")
+    print(table)
+    caminho = input("Exportar no formato Prometheus para arquivo (Enter = não exportar): ").strip()
+    if caminho:
+        try:
+            salvar_metricas(caminho)
+            print(f"📄 Métricas salvas em {caminho}")
+        except OSError as e:
+            print(f"❌ Não foi possível salvar as métricas: {e}")
@@ -0,0 +1,293 @@
+import psycopg2
+from prettytable import PrettyTable
+from app.config import ALL_SERVERS
+from app.conexao import connect_to_db, liberar_conexao
+from app.replicacao import executar_em_paralelo
+
+# Migrações numeradas do esquema: (versão, descrição, comandos).
+# NUNCA edite uma migração já publicada: crie uma nova versão no fim da lista.
+MIGRACOES = [
+    (1, "Índices das consultas quentes (filas, busca por nome, heal incremental)", [
+        # Busca de disciplina ativa por nome (matricular, remover, remover_disciplina)
+        """CREATE INDEX IF NOT EXISTS idx_disciplinas_nome_ativas
+           ON disciplinas (nome) WHERE (is_deleted IS NULL OR is_deleted = false)""",
+        # Fila de espera: filtra por disciplina, ordena por (timestamp_matricula, id)
+        """CREATE INDEX IF NOT EXISTS idx_matriculas_fila
+           ON matriculas (disciplina_id, timestamp_matricula, id) WHERE status <> 'REMOVIDA'""",
+        # Matrícula ativa de um aluno numa disciplina (remover)
+        """CREATE INDEX IF NOT EXISTS idx_matriculas_aluno_ativas
+           ON matriculas (nome_aluno, disciplina_id) WHERE status <> 'REMOVIDA'""",
+        # Vagas ocupadas (relatório consolidado)
+        """CREATE INDEX IF NOT EXISTS idx_matriculas_aceitas
+           ON matriculas (disciplina_id) WHERE status = 'ACEITA'""",
+        # Todas as matrículas de uma disciplina (remover_disciplina e o ON DELETE CASCADE da FK)
+        "CREATE INDEX IF NOT EXISTS idx_matriculas_disciplina ON matriculas (disciplina_id)",
+        # Heal incremental: varredura por (timestamp, id) a partir do checkpoint
+        "CREATE INDEX IF NOT EXISTS idx_disciplinas_sync ON disciplinas (data_ultima_modificacao, id)",
+        "CREATE INDEX IF NOT EXISTS idx_matriculas_sync ON matriculas (data_ultima_modificacao, id)",
+        "CREATE INDEX IF NOT EXISTS idx_deleted_disciplinas_sync ON deleted_disciplinas (timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS idx_deleted_matriculas_sync ON deleted_matriculas (timestamp, id)",
+    ]),
+    (2, "Coleta de tombstones (confirmações dos pares e horizonte de expurgo)", [
+        # Até onde (timestamp, id) cada par já confirmou ter os tombstones deste nó
+        """CREATE TABLE IF NOT EXISTS tombstones_confirmados (
+               par VARCHAR(10) NOT NULL,
+               tabela VARCHAR(50) NOT NULL,
+               ate TIMESTAMPTZ NOT NULL,
+               ate_id UUID NOT NULL,
+               PRIMARY KEY (par, tabela)
+           )""",
+        # Maior timestamp de tombstone já expurgado neste nó (o heal não traz de volta o que está antes)
+        """CREATE TABLE IF NOT EXISTS gc_expurgos (
+               tabela VARCHAR(50) PRIMARY KEY,
+               ate TIMESTAMPTZ NOT NULL
+           )""",
+    ]),
+    (3, "Funções da fila de matrícula no servidor (app/matricular.py, PROCEDIMENTOS_ARMAZENADOS)", [
+        # Aplica uma matrícula já avaliada: a nova tentativa e as mudanças de status da fila.
+        # É o que a outbox replica (1 comando por nó em vez de 1 + N).
+        """CREATE OR REPLACE FUNCTION fila_aplicar_matricula(
+               p_id UUID, p_disciplina_id UUID, p_nome VARCHAR, p_ts TIMESTAMPTZ, p_status VARCHAR,
+               p_alteracoes JSONB)
+           RETURNS VOID LANGUAGE plpgsql AS $$
+           BEGIN
+               INSERT INTO matriculas (id, disciplina_id, nome_aluno, timestamp_matricula, status, data_ultima_modificacao)
+               VALUES (p_id, p_disciplina_id, p_nome, p_ts, p_status, p_ts)
+               ON CONFLICT (id) DO NOTHING;
+               UPDATE matriculas m SET status = a.status, data_ultima_modificacao = p_ts
+               FROM jsonb_to_recordset(p_alteracoes) AS a(id UUID, status VARCHAR)
+               WHERE m.id = a.id;
+           END $$""",
+        # Avalia a nova tentativa na fila (local + 'p_externos', as filas lidas dos outros nós),
+        # grava com fila_aplicar_matricula e devolve a nova tentativa (nova = true) e as
+        # matrículas cujo status mudou. Aluno já na fila: devolve só a tentativa com DUPLICADA.
+        """CREATE OR REPLACE FUNCTION fila_matricular(
+               p_id UUID, p_disciplina_id UUID, p_nome VARCHAR, p_ts TIMESTAMPTZ, p_vagas INT, p_externos JSONB)
+           RETURNS TABLE (matricula_id UUID, aluno VARCHAR, novo_status VARCHAR, posicao INT, nova BOOLEAN)
+           LANGUAGE plpgsql AS $$
+           DECLARE
+               r RECORD;
+               v_status VARCHAR;
+               v_posicao INT;
+               v_alteracoes JSONB := '[]'::jsonb;
+           BEGIN
+               PERFORM pg_advisory_xact_lock(hashtext('fila:' || p_disciplina_id::text));
+
+               IF EXISTS (SELECT 1 FROM matriculas m
+                          WHERE m.disciplina_id = p_disciplina_id AND m.status <> 'REMOVIDA' AND m.nome_aluno = p_nome)
+                  OR EXISTS (SELECT 1 FROM jsonb_to_recordset(p_externos) AS e(nome_aluno VARCHAR)
+                             WHERE e.nome_aluno = p_nome) THEN
+                   matricula_id := p_id; aluno := p_nome; novo_status := 'DUPLICADA'; nova := true;
+                   RETURN NEXT;
+                   RETURN;
+               END IF;
+
+               -- Mesma regra da FilaEspera: ordem (timestamp_matricula, id), as p_vagas primeiras ACEITA;
+               -- a cópia local de cada matrícula tem precedência sobre a dos outros nós
+               FOR r IN
+                   SELECT o.id, o.nome_aluno, o.status, o.posicao::INT AS posicao,
+                          CASE WHEN o.posicao <= p_vagas THEN 'ACEITA' ELSE 'REJEITADA' END AS calculado
+                   FROM (
+                       SELECT u.*, row_number() OVER (ORDER BY u.timestamp_matricula, u.id) AS posicao
+                       FROM (
+                           SELECT DISTINCT ON (f.id) f.* FROM (
+                               SELECT m.id, m.nome_aluno, m.timestamp_matricula, m.status, 0 AS prioridade
+                               FROM matriculas m
+                               WHERE m.disciplina_id = p_disciplina_id AND m.status <> 'REMOVIDA'
+                               UNION ALL
+                               SELECT e.id, e.nome_aluno, e.timestamp_matricula, e.status, 1
+                               FROM jsonb_to_recordset(p_externos)
+                                    AS e(id UUID, nome_aluno VARCHAR, timestamp_matricula TIMESTAMPTZ, status VARCHAR)
+                               UNION ALL
+                               SELECT p_id, p_nome, p_ts, NULL, 0
+                           ) f
+                           ORDER BY f.id, f.prioridade
+                       ) u
+                   ) o
+                   ORDER BY o.posicao
+               LOOP
+                   IF r.id = p_id THEN
+                       v_status := r.calculado;
+                       v_posicao := r.posicao;
+                   ELSIF r.status IS DISTINCT FROM r.calculado THEN
+                       v_alteracoes := v_alteracoes || jsonb_build_object('id', r.id, 'status', r.calculado);
+                       matricula_id := r.id; aluno := r.nome_aluno; novo_status := r.calculado;
+                       posicao := r.posicao; nova := false;
+                       RETURN NEXT;
+                   END IF;
+               END LOOP;
+
+               PERFORM fila_aplicar_matricula(p_id, p_disciplina_id, p_nome, p_ts, v_status, v_alteracoes);
+               matricula_id := p_id; aluno := p_nome; novo_status := v_status; posicao := v_posicao; nova := true;
+               RETURN NEXT;
+           END $$""",
+    ]),
+    (4, "Guarda LWW nas mudanças de status de fila_aplicar_matricula", [
+        # Replicada com atraso, a chamada não pode ressuscitar uma matrícula REMOVIDA nem desfazer
+        # uma mudança mais nova (mesma guarda de QUERY_ATUALIZAR_STATUS em app/matricular.py)
+        """CREATE OR REPLACE FUNCTION fila_aplicar_matricula(
+               p_id UUID, p_disciplina_id UUID, p_nome VARCHAR, p_ts TIMESTAMPTZ, p_status VARCHAR,
+               p_alteracoes JSONB)
+           RETURNS VOID LANGUAGE plpgsql AS $$
+           BEGIN
+               INSERT INTO matriculas (id, disciplina_id, nome_aluno, timestamp_matricula, status, data_ultima_modificacao)
+               VALUES (p_id, p_disciplina_id, p_nome, p_ts, p_status, p_ts)
+               ON CONFLICT (id) DO NOTHING;
+               UPDATE matriculas m SET status = a.status, data_ultima_modificacao = p_ts
+               FROM jsonb_to_recordset(p_alteracoes) AS a(id UUID, status VARCHAR)
+               WHERE m.id = a.id AND m.status <> 'REMOVIDA' AND m.data_ultima_modificacao < p_ts;
+           END $$""",
+    ]),
+    (5, "Marca de chegada local das linhas sincronizadas (checkpoint do heal incremental)", [
+        # Momento em que a linha foi gravada NESTE nó (escrita local, replicação ou heal), independente
+        # do timestamp LWW de quem a escreveu: o heal incremental varre por ela (app/sincronizacao.py)
+        """CREATE OR REPLACE FUNCTION sync_marcar_chegada()
+           RETURNS TRIGGER LANGUAGE plpgsql AS $$
+           BEGIN
+               NEW.chegada_em := clock_timestamp();
+               RETURN NEW;
+           END $$""",
+        *[comando
+          for tabela in ('disciplinas', 'matriculas', 'deleted_disciplinas', 'deleted_matriculas')
+          for comando in (
+              f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS chegada_em TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()",
+              f"DROP TRIGGER IF EXISTS trg_{tabela}_chegada ON {tabela}",
+              f"""CREATE TRIGGER trg_{tabela}_chegada BEFORE INSERT OR UPDATE ON {tabela}
+                  FOR EACH ROW EXECUTE FUNCTION sync_marcar_chegada()""",
+              f"CREATE INDEX IF NOT EXISTS idx_{tabela}_chegada ON {tabela} (chegada_em, id)",
+          )],
+        # Os checkpoints antigos eram timestamps LWW: o próximo heal faz a verificação completa
+        # e grava o checkpoint já na nova marca. Bancos que ainda não passaram por um heal não
+        # têm a tabela (garantir_tabela_checkpoint a cria só no heal): ela é criada aqui.
+        """CREATE TABLE IF NOT EXISTS sync_checkpoints (
+               origem VARCHAR(10) NOT NULL,
+               tabela VARCHAR(50) NOT NULL,
+               ultimo_timestamp TIMESTAMPTZ,
+               ultima_verificacao_completa TIMESTAMPTZ,
+               PRIMARY KEY (origem, tabela)
+           )""",
+        "UPDATE sync_checkpoints SET ultimo_timestamp = NULL, ultima_verificacao_completa = NULL",
+    ]),
+    (6, "Versão das filas por disciplina e origem (fila em memória de app/matricular.py)", [
+        # Quantas escritas cada origem (processo e líder que as gerou, em 'app.origem') fez nas
+        # matrículas de cada disciplina NESTE nó. Sem origem (heal, lote, rajada, GC...) conta como '-'
+        """CREATE TABLE IF NOT EXISTS fila_versoes (
+               disciplina_id UUID NOT NULL,
+               origem VARCHAR(64) NOT NULL,
+               versao BIGINT NOT NULL,
+               PRIMARY KEY (disciplina_id, origem)
+           )""",
+        """CREATE OR REPLACE FUNCTION fila_contar_versao()
+           RETURNS TRIGGER LANGUAGE plpgsql AS $$
+           DECLARE
+               v_disciplina UUID;
+           BEGIN
+               IF TG_OP = 'DELETE' THEN
+                   v_disciplina := OLD.disciplina_id;
+               ELSE
+                   v_disciplina := NEW.disciplina_id;
+               END IF;
+               IF v_disciplina IS NOT NULL THEN
+                   INSERT INTO fila_versoes (disciplina_id, origem, versao)
+                   VALUES (v_disciplina, COALESCE(NULLIF(current_setting('app.origem', true), ''), '-'), 1)
+                   ON CONFLICT (disciplina_id, origem) DO UPDATE SET versao = fila_versoes.versao + 1;
+               END IF;
+               RETURN NULL;
+           END $$""",
+        "DROP TRIGGER IF EXISTS trg_matriculas_fila_versao ON matriculas",
+        """CREATE TRIGGER trg_matriculas_fila_versao AFTER INSERT OR UPDATE OR DELETE ON matriculas
+           FOR EACH ROW EXECUTE FUNCTION fila_contar_versao()""",
+    ]),
+]
+
+
+def garantir_tabela_migracoes(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                versao INT PRIMARY KEY,
+                descricao TEXT NOT NULL,
+                aplicada_em TIMESTAMPTZ DEFAULT NOW()
+            )
+        """)
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def versao_atual(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COALESCE(max(versao), 0) FROM schema_migrations")
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+def aplicar_pendentes(conn, aplicadas):
+    """
+    Aplica na conexão as migrações pendentes, cada uma numa transação (DDL + registro da versão),
+    anotando em 'aplicadas' as versões gravadas. Um advisory lock impede que duas instâncias
+    migrem o mesmo nó ao mesmo tempo. Uma falha desfaz só a migração em curso e é propagada.
+    """
+    garantir_tabela_migracoes(conn)
+    cursor = conn.cursor()
+    try:
+        for versao, descricao, comandos in MIGRACOES:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))")
+            cursor.execute("SELECT 1 FROM schema_migrations WHERE versao = %s", (versao,))
+            if cursor.fetchone():
+                conn.commit()
+                continue
+            for comando in comandos:
+                cursor.execute(comando)
+            cursor.execute("INSERT INTO schema_migrations (versao, descricao) VALUES (%s, %s)", (versao, descricao))
+            conn.commit()
+            aplicadas.append(versao)
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def migrar_servidor(servidor_id):
+    """
+    Aplica no nó as migrações pendentes (aplicar_pendentes).
+    Retorna (versao_final, [versões aplicadas]) ou None se o nó estiver offline.
+    """
+    conn = connect_to_db(servidor_id)
+    if not conn:
+        return None
+    try:
+        aplicadas = []
+        try:
+            aplicar_pendentes(conn, aplicadas)
+        except psycopg2.Error as e:
+            print(f"❌ Migração falhou em {servidor_id}: {str(e).strip()}")
+        return versao_atual(conn), aplicadas
+    finally:
+        liberar_conexao(conn)
+
+
+def aplicar_migracoes(exibir=True):
+    """Migra todos os líderes em paralelo. Nós offline são migrados na próxima execução."""
+    resultados = executar_em_paralelo(ALL_SERVERS, migrar_servidor)
+    if not exibir:
+        return resultados
+
+    versao_alvo = MIGRACOES[-1][0]
+    table = PrettyTable()
+    table.field_names = ["Nó", "Versão", "Aplicadas Agora", "Status"]
+    table.align = "l"
+    for servidor_id, resultado in resultados.items():
+        if resultado is None:
+            table.add_row([servidor_id, "-", "-", "⚠️ OFFLINE"])
+            continue
+        versao, aplicadas = resultado
+        status = "✅ Atualizado" if versao >= versao_alvo else "❌ Desatualizado"
+        table.add_row([servidor_id, versao, ", ".join(map(str, aplicadas)) or "-", status])
+    print(f"\n--- Migrações de Esquema (versão atual: {versao_alvo}) ---")
+    print(table)
+    return resultados
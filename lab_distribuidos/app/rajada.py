@@ -0,0 +1,128 @@
+"""
+Modo rajada: matrículas simultâneas na mesma disciplina são agrupadas (group commit).
+
+Quando as inscrições abrem, muitos alunos disputam as mesmas disciplinas ao mesmo tempo e cada
+_processar_matricula leria o estado global, reordenaria a fila e replicaria sozinho. Aqui, o
+primeiro pedido de uma disciplina abre um lote e espera RAJADA_JANELA_MS (ou até
+RAJADA_LOTE_MAX pedidos); os que chegam nesse intervalo entram no mesmo lote. A thread que abriu
+o lote processa todos com o núcleo da matrícula em lote (_matricular_disciplina: uma leitura do
+estado global, uma FilaEspera, uma transação com a outbox), entrega a replicação uma vez e
+devolve a cada chamador o seu resultado, no mesmo formato de _processar_matricula.
+
+Dentro do lote a ordem é a de chegada. O nível de consistência do lote é o mais forte pedido.
+"""
+import threading
+from dataclasses import dataclass, field
+from app.config import RAJADA_JANELA_MS, RAJADA_LOTE_MAX
+from app.conexao import connect_to_db, liberar_conexao
+from app.fila import STATUS_ACEITA
+from app.matricula_em_lote import _matricular_disciplina
+from app.matricular import obter_disciplina_id_e_vagas
+from app.metricas import cronometrado, rotulo_no
+from app.replicacao import NIVEIS_CONSISTENCIA, entregar_pendencias, nivel_consistencia
+
+
+@dataclass
+class PedidoRajada:
+    """Um chamador esperando no lote: o resultado é preenchido pela thread que processa o lote."""
+    aluno: str
+    nivel: str
+    resultado: dict = None
+    pronto: threading.Event = field(default_factory=threading.Event)
+
+
+@dataclass
+class LoteRajada:
+    pedidos: list = field(default_factory=list)
+    fechado: threading.Event = field(default_factory=threading.Event)
+
+
+_lotes = {}     # (lider_entrada, disciplina_nome) -> LoteRajada aberto
+_lock = threading.Lock()
+
+
+def _resultado(pedido, disciplina_nome, vagas_totais, status, posicao, mensagem, matricula_id, extras):
+    """Resultado de UM pedido do lote no formato de _processar_matricula."""
+    if status == "ERRO":
+        return {'sucesso': False, 'motivo': 'erro', 'mensagem': mensagem}
+    if posicao is None:
+        return {'sucesso': False, 'motivo': 'duplicada',
+                'mensagem': f"Aluno {pedido.aluno} já possui um registro de matrícula na {disciplina_nome}."}
+    return dict(extras, sucesso=True, matricula_id=matricula_id, status=status, posicao=posicao,
+                vagas_totais=vagas_totais)
+
+
+@cronometrado('lote_rajada', rotulo_no)
+def processar_lote(lider_entrada, disciplina_nome, pedidos):
+    """Processa os 'pedidos' (PedidoRajada) de UMA disciplina e preenche o resultado de cada um."""
+    conn = connect_to_db(lider_entrada)
+    if not conn:
+        falha = {'sucesso': False, 'motivo': 'offline', 'mensagem': f"Líder {lider_entrada} está offline."}
+        for pedido in pedidos:
+            pedido.resultado = falha
+        return
+    try:
+        disciplina_id, vagas_totais = obter_disciplina_id_e_vagas(conn, disciplina_nome)
+        if not disciplina_id:
+            falha = {'sucesso': False, 'motivo': 'nao_encontrada',
+                     'mensagem': f"Disciplina '{disciplina_nome}' não encontrada ou foi removida."}
+            for pedido in pedidos:
+                pedido.resultado = falha
+            return
+        resultados, ids = {}, {}
+        promocoes = _matricular_disciplina(conn, lider_entrada, disciplina_id, vagas_totais,
+                                           [(indice, pedido.aluno, disciplina_nome) for indice, pedido in enumerate(pedidos)],
+                                           resultados, ids)
+    finally:
+        liberar_conexao(conn)
+
+    nivel = max((pedido.nivel for pedido in pedidos), key=NIVEIS_CONSISTENCIA.index)
+    replicacao = entregar_pendencias(lider_entrada, nivel=nivel)
+    aceitas = sum(1 for status, _, _ in resultados.values() if status == STATUS_ACEITA)
+    print(f"⚡ Rajada {disciplina_nome} (Líder {lider_entrada}): {len(pedidos)} pedidos, {aceitas} aceitos, "
+          f"{promocoes} mudanças de status. {replicacao.resumo_consistencia()}")
+
+    extras = {'promocoes': promocoes, 'lote': len(pedidos),
+              'replicacao': {s: r.sucesso for s, r in replicacao.pares.items()},
+              'consistencia': replicacao.resumo_consistencia()}
+    for indice, pedido in enumerate(pedidos):
+        pedido.resultado = _resultado(pedido, disciplina_nome, vagas_totais, *resultados[indice],
+                                      ids.get(indice), extras)
+
+
+@cronometrado('matricular_rajada', rotulo_no, relatar_lenta=True)
+def matricular_em_rajada(lider_entrada, aluno_nome, disciplina_nome, consistencia=None):
+    """
+    Mesma interface e retorno de _processar_matricula, mas o pedido entra no lote aberto da
+    disciplina (ou abre um) e só retorna quando o lote inteiro foi gravado e replicado.
+    """
+    pedido = PedidoRajada(aluno_nome, nivel_consistencia('matricular', consistencia))
+    chave = (lider_entrada, disciplina_nome)
+    with _lock:
+        lote = _lotes.get(chave)
+        abriu = lote is None
+        if abriu:
+            lote = _lotes[chave] = LoteRajada()
+        lote.pedidos.append(pedido)
+        if len(lote.pedidos) >= RAJADA_LOTE_MAX:
+            del _lotes[chave]
+            lote.fechado.set()
+
+    if not abriu:
+        pedido.pronto.wait()
+        return pedido.resultado
+
+    lote.fechado.wait(RAJADA_JANELA_MS / 1000)
+    with _lock:
+        if _lotes.get(chave) is lote:
+            del _lotes[chave]
+    try:
+        processar_lote(lider_entrada, disciplina_nome, lote.pedidos)
+    except Exception as e:
+        for outro in lote.pedidos:
+            if outro.resultado is None:
+                outro.resultado = {'sucesso': False, 'motivo': 'erro', 'mensagem': f"Erro inesperado: {e}"}
+    finally:
+        for outro in lote.pedidos:
+            outro.pronto.set()
+    return pedido.resultado
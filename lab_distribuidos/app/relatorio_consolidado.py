@@ -1,57 +1,64 @@
 import psycopg2
 from prettytable import PrettyTable
-from collections import defaultdict
-from app.config import SERVERS, ALL_SERVERS 
-
-def connect_to_any_db(servidores_ids):
-    for servidor_id in servidores_ids:
-        config = SERVERS.get(servidor_id)
-        if not config: continue
-        connect_args = {k: v for k, v in config.items() if k != 'tipo'}
-        connect_args['connect_timeout'] = 3
-        try:
-            conn = psycopg2.connect(**connect_args)
-            print(f"✅ Conectado com sucesso ao Líder {servidor_id} para leitura de consolidação.")
-            return conn, servidor_id
-        except psycopg2.OperationalError:
-            continue
-    return None, None
-
-def gerar_relatorio(): 
+from app.config import ALL_SERVERS
+from app.conexao import connect_to_db, connect_to_any_db, liberar_conexao
+from app.replicacao import executar_em_paralelo
+
+# Ocupação por disciplina agregada NO SERVIDOR: uma linha por disciplina, sem trafegar matrículas
+QUERY_OCUPACAO = """
+    SELECT d.id, d.nome, d.vagas_totais, COALESCE(m.aceitas, 0), COALESCE(m.em_espera, 0)
+    FROM disciplinas d
+    LEFT JOIN (
+        SELECT disciplina_id,
+               count(*) FILTER (WHERE status = 'ACEITA') AS aceitas,
+               count(*) FILTER (WHERE status = 'REJEITADA') AS em_espera
+        FROM matriculas
+        WHERE status <> 'REMOVIDA'
+        GROUP BY disciplina_id
+    ) m ON m.disciplina_id = d.id
+    WHERE (d.is_deleted IS NULL OR d.is_deleted = false)
+    ORDER BY d.nome, d.id;
+"""
+
+def _ler_ocupacao(conn):
+    """[(id, nome, vagas_totais, aceitas, em_espera)] do nó da conexão."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(QUERY_OCUPACAO)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def _ocupacao_no_servidor(servidor_id):
+    """Ocupação de UM nó (None se offline ou com erro)."""
+    conn = connect_to_db(servidor_id)
+    if not conn:
+        return None
+    try:
+        return _ler_ocupacao(conn)
+    except psycopg2.Error as e:
+        print(f"❌ Erro SQL no Líder {servidor_id}: {e}")
+        return None
+    finally:
+        liberar_conexao(conn)
+
+def gerar_relatorio():
     conn, servidor_id = connect_to_any_db(ALL_SERVERS)
     if not conn:
         print("\n❌ Não foi possível conectar a nenhum líder para gerar o relatório consolidado.")
         return
-    cursor = conn.cursor()
+    print(f"✅ Conectado com sucesso ao Líder {servidor_id} para leitura de consolidação.")
     print(f"\n--- Relatório Consolidado (Fonte de Dados: Líder {servidor_id}) ---")
     try:
-        
-        cursor.execute("""
-            SELECT id, nome, vagas_totais  FROM disciplinas 
-            WHERE (is_deleted IS NULL OR is_deleted = false) ORDER BY id;
-        """)
-        disciplinas_info = {row[0]: {'nome': row[1], 'vagas_totais': row[2]} for row in cursor.fetchall()}
-        if not disciplinas_info:
+        ocupacao = _ler_ocupacao(conn)
+        if not ocupacao:
             print("Nenhuma disciplina encontrada no catálogo.")
             return
-        
-        
-        cursor.execute("SELECT disciplina_id, status FROM matriculas WHERE status = 'ACEITA';")
-        matriculas_aceitas = cursor.fetchall()
-
-        vagas_ocupadas = defaultdict(int)
-        for disc_id, status in matriculas_aceitas:
-            vagas_ocupadas[disc_id] += 1
 
         table = PrettyTable()
         table.field_names = ["ID", "Disciplina", "Vagas Totais", "Vagas Ocupadas", "Vagas Disponíveis"]
         table.align = "l"
-        for disc_id, info in disciplinas_info.items():
-            if disc_id not in vagas_ocupadas:
-                vagas_ocupadas[disc_id] = 0
-            nome = info['nome']
-            vagas_totais = info['vagas_totais']
-            ocupadas = vagas_ocupadas[disc_id]
+        for disc_id, nome, vagas_totais, ocupadas, _ in ocupacao:
             disponiveis = vagas_totais - ocupadas
             table.add_row([disc_id, nome, vagas_totais, ocupadas, disponiveis])
         print(table)
@@ -59,5 +66,55 @@ def gerar_relatorio():
     except psycopg2.Error as e:
         print(f"❌ Erro SQL: {e}")
     finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
\ No newline at end of file
+        liberar_conexao(conn)
+
+def gerar_relatorio_cluster():
+    """
+    Relatório de ocupação de TODO o cluster: cada líder agrega suas contagens (GROUP BY)
+    ao mesmo tempo, e as visões são comparadas disciplina a disciplina.
+    Disciplinas ausentes em algum nó online ou com contagens diferentes são marcadas.
+    """
+    visoes = executar_em_paralelo(ALL_SERVERS, _ocupacao_no_servidor)
+    online = [s for s, v in visoes.items() if v is not None]
+    offline = [s for s, v in visoes.items() if v is None]
+    if not online:
+        print("\n❌ Não foi possível conectar a nenhum líder para gerar o relatório do cluster.")
+        return
+
+    # {disc_id: {servidor_id: (nome, vagas_totais, aceitas, em_espera)}}
+    por_disciplina = {}
+    for servidor_id in online:
+        for disc_id, nome, vagas_totais, aceitas, em_espera in visoes[servidor_id]:
+            por_disciplina.setdefault(disc_id, {})[servidor_id] = (nome, vagas_totais, aceitas, em_espera)
+
+    print(f"\n--- Ocupação do Cluster (Líderes online: {', '.join(online)}"
+          + (f" | OFFLINE: {', '.join(offline)}" if offline else "") + ") ---")
+    if not por_disciplina:
+        print("Nenhuma disciplina encontrada no catálogo.")
+        return
+
+    table = PrettyTable()
+    table.field_names = ["Disciplina", "Vagas Totais", "Vagas Ocupadas", "Vagas Disponíveis", "Em Espera", "Nós", "Status"]
+    table.align = "l"
+    divergentes = 0
+    linhas = sorted(por_disciplina.items(), key=lambda item: (next(iter(item[1].values()))[0], item[0]))
+    for disc_id, por_no in linhas:
+        nome, vagas_totais, aceitas, em_espera = next(iter(por_no.values()))
+        valores = set(por_no.values())
+        if len(por_no) == len(online) and len(valores) == 1:
+            status = "✅ Consistente"
+        else:
+            divergentes += 1
+            detalhes = " ".join(f"{s}:{por_no[s][2]}/{por_no[s][1]}" if s in por_no else f"{s}:ausente"
+                                for s in online)
+            status = f"⚠️ Divergente ({detalhes})"
+            aceitas = max(v[2] for v in valores)
+            em_espera = max(v[3] for v in valores)
+        table.add_row([nome, vagas_totais, aceitas, vagas_totais - aceitas, em_espera,
+                       f"{len(por_no)}/{len(online)}", status])
+    print(table)
+    if divergentes:
+        print(f"⚠️ {divergentes} disciplina(s) com visões diferentes entre os líderes (ocupação mostrada: maior valor).")
+        print("   (A Opção 10 'Heal' sincroniza os nós; a Opção 12 mostra os buckets divergentes)")
+    else:
+        print("✅ Todos os líderes online concordam sobre a ocupação.")
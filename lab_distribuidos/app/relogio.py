@@ -0,0 +1,89 @@
+"""
+Relógio lógico híbrido (HLC) do processo: gera os timestamps das escritas sem ida ao banco.
+
+Cada leitura devolve max(relógio físico, último valor + 1 µs), então os valores são
+estritamente crescentes mesmo se o relógio da máquina voltar. Timestamps vindos de outros
+nós (fila global, heal, replicação) passam por observar(): a próxima escrita local fica
+depois deles, e a ordem LWW respeita a causalidade mesmo com relógios desalinhados.
+
+O "contador lógico" fica embutido nos microssegundos, então o valor continua sendo um
+TIMESTAMPTZ comum e as colunas/consultas existentes não mudam. Ao iniciar, o relógio é
+semeado com o maior timestamp já gravado no nó local (o próprio banco é a persistência).
+"""
+import threading
+from datetime import datetime, timedelta, timezone
+import psycopg2
+from app.config import LOCAL_SERVERS, RELOGIO_DESVIO_MAX_SEGUNDOS
+from app.conexao import connect_to_db, liberar_conexao
+
+TIQUE = timedelta(microseconds=1)
+INICIO = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_ultimo = INICIO
+_lock = threading.Lock()
+
+
+def _normalizar(ts):
+    """datetime em UTC com tzinfo (valores sem fuso são UTC, como os gravados pelo sistema)."""
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+
+def agora():
+    """Próximo timestamp HLC (datetime UTC com fuso). Estritamente maior que todos os anteriores."""
+    global _ultimo
+    fisico = datetime.now(timezone.utc)
+    with _lock:
+        _ultimo = max(fisico, _ultimo + TIQUE)
+        return _ultimo
+
+
+def reservar(quantidade):
+    """Reserva 'quantidade' timestamps consecutivos (1 µs de distância). Retorna o primeiro."""
+    global _ultimo
+    fisico = datetime.now(timezone.utc)
+    with _lock:
+        primeiro = max(fisico, _ultimo + TIQUE)
+        _ultimo = primeiro + TIQUE * (quantidade - 1)
+        return primeiro
+
+
+def observar(*timestamps):
+    """Avança o relógio para depois dos timestamps recebidos de outros nós (None é ignorado)."""
+    global _ultimo
+    validos = [_normalizar(ts) for ts in timestamps if ts is not None]
+    if not validos:
+        return
+    maior = max(validos)
+    with _lock:
+        avancou = maior > _ultimo
+        if avancou:
+            _ultimo = maior
+    adiantado = maior - datetime.now(timezone.utc)
+    if avancou and adiantado > timedelta(seconds=RELOGIO_DESVIO_MAX_SEGUNDOS):
+        print(f"⚠️ Relógio: timestamp recebido está {adiantado.total_seconds():.0f}s à frente do relógio local "
+              f"(relógio de algum nó adiantado?).")
+
+
+def semear_relogio(servidor_id=None):
+    """Parte do maior timestamp já gravado no nó local: o relógio nunca volta entre execuções."""
+    servidor_id = servidor_id or LOCAL_SERVERS[0]
+    conn = connect_to_db(servidor_id)
+    if not conn:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT greatest(
+                (SELECT max(data_ultima_modificacao) FROM disciplinas),
+                (SELECT max(data_ultima_modificacao) FROM matriculas),
+                (SELECT max(timestamp) FROM deleted_disciplinas),
+                (SELECT max(timestamp) FROM deleted_matriculas))
+        """)
+        observar(cursor.fetchone()[0])
+    except psycopg2.Error as e:
+        print(f"⚠️ Não foi possível semear o relógio a partir do Líder {servidor_id}: {e}")
+    finally:
+        cursor.close()
+        liberar_conexao(conn)
@@ -1,56 +1,42 @@
 import psycopg2
-from app.config import SERVERS, ALL_SERVERS, LOCAL_SERVERS
-from app.matricular import reavaliar_posicao
-
-def connect_to_db(servidor_id):
-    """Conecta ao banco de dados específico. Retorna None em caso de falha."""
-    config = SERVERS.get(servidor_id) 
-    if not config:
-        return None
-    connect_args = {k: v for k, v in config.items() if k != 'tipo'}
-    connect_args['connect_timeout'] = 10 
-    try:
-        conn = psycopg2.connect(**connect_args)
-        return conn
-    except psycopg2.OperationalError:
-        return None
+from app.config import LOCAL_SERVERS
+from app.conexao import connect_to_db, liberar_conexao
+from app.replicacao import Operacao, registrar_pendencias, entregar_pendencias, nivel_consistencia
+from app.matricular import (reavaliar_posicao, travar_disciplina, marcar_origem, origem_escritas, abrir_fila,
+                            guardar_fila, QUERY_ATUALIZAR_STATUS)
+from app.catalogo import obter_disciplina
+from app.metricas import cronometrado, rotulo_no
+from app.relogio import agora
 
 def obter_disciplina_id(conn, disciplina_nome):
-    """Busca o ID e o total de vagas da disciplina pelo nome."""
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            SELECT id, vagas_totais FROM disciplinas 
-            WHERE nome = %s AND (is_deleted IS NULL OR is_deleted = false)
-        """, (disciplina_nome,))
-        result = cursor.fetchone()
-        if result:
-            return result[0], result[1]
-        return None, None
-    finally:
-        cursor.close()
+    """Busca o ID e o total de vagas da disciplina pelo nome (cache do catálogo)."""
+    return obter_disciplina(conn, disciplina_nome)
 
-def remover_aluno(lider_destino, aluno, disciplina_nome):
+@cronometrado('remover_aluno', rotulo_no, relatar_lenta=True)
+def remover_aluno(lider_destino, aluno, disciplina_nome, consistencia=None):
     """
     Remove (Soft Delete) a matrícula E reavalia a fila de espera.
+    'consistencia': ONE, QUORUM ou ALL (None = config.py), como em _processar_matricula.
+    Retorna um dict com 'sucesso' (e 'motivo'/'mensagem' em caso de falha).
     """
+    nivel = nivel_consistencia('remover_aluno', consistencia)
     conn = connect_to_db(lider_destino)
     if not conn:
         print(f"❌ Remoção falhou em {lider_destino} devido à falha de conexão.")
-        return
+        return {'sucesso': False, 'motivo': 'offline', 'mensagem': f"Líder {lider_destino} está offline."}
 
     cursor = conn.cursor()
-    
-    disciplina_id, vagas_totais = obter_disciplina_id(conn, disciplina_nome)
-    
-    if not disciplina_id:
-        print(f"❌ Falha: Disciplina '{disciplina_nome}' não encontrada ou foi removida no líder {lider_destino}.")
-        conn.close()
-        return
-
     try:
+        disciplina_id, vagas_totais = obter_disciplina_id(conn, disciplina_nome)
+        if not disciplina_id:
+            print(f"❌ Falha: Disciplina '{disciplina_nome}' não encontrada ou foi removida no líder {lider_destino}.")
+            return {'sucesso': False, 'motivo': 'nao_encontrada',
+                    'mensagem': f"Disciplina '{disciplina_nome}' não encontrada ou foi removida."}
+
         # --- ETAPA 1: ENCONTRAR O ALUNO ---
         
+        travar_disciplina(cursor, disciplina_id)
+        marcar_origem(cursor, lider_destino)
         cursor.execute("""
             SELECT id FROM matriculas 
             WHERE nome_aluno = %s AND disciplina_id = %s AND status != 'REMOVIDA'
@@ -60,22 +46,26 @@ def remover_aluno(lider_destino, aluno, disciplina_nome):
         if not resultado:
             print(f"⚠️ Aviso: Aluno '{aluno}' não encontrado (ou já removido) em '{disciplina_nome}' no líder {lider_destino}.")
             conn.rollback()
-            return
+            return {'sucesso': False, 'motivo': 'nao_encontrada',
+                    'mensagem': f"Aluno '{aluno}' não encontrado (ou já removido) em '{disciplina_nome}'."}
             
         id_a_remover = resultado[0]
-        cursor.execute("SELECT (NOW() AT TIME ZONE 'UTC')")
-        timestamp_agora = cursor.fetchone()[0]
 
         # --- ETAPA 2: REAVALIAR A FILA (ANTES DE REMOVER) ---
         print("\n--- Reavaliação de Fila de Espera ---")
         
         
+        fila, marca = abrir_fila(lider_destino, disciplina_id, vagas_totais)
         status_final_dummy, pos_dummy, updates_a_replicar = reavaliar_posicao(
             lider_destino, disciplina_id, vagas_totais, 
             nova_tentativa=None, 
-            id_a_ignorar=id_a_remover 
+            id_a_ignorar=id_a_remover,
+            fila=fila
         )
         # --- FIM DA CORREÇÃO ---
+        # Depois da leitura global (a fila em memória só é reaproveitada se nada mudou desde a
+        # última): o relógio já observou os timestamps dos outros nós
+        timestamp_agora = agora()
 
         if updates_a_replicar:
             print(f"Promovendo {len(updates_a_replicar)} alunos da fila de espera...")
@@ -84,12 +74,12 @@ def remover_aluno(lider_destino, aluno, disciplina_nome):
             
         # --- ETAPA 3: APLICAR TODAS AS MUDANÇAS (1 TRANSAÇÃO) ---
         
-        # 3a. Remove o aluno
+        # 3a. Remove o aluno (LWW: uma entrega atrasada não sobrescreve uma mudança mais nova)
         update_query_remocao = """
             UPDATE matriculas SET status = 'REMOVIDA', data_ultima_modificacao = %s
-            WHERE id = %s
+            WHERE id = %s AND data_ultima_modificacao < %s
         """
-        cursor.execute(update_query_remocao, (timestamp_agora, id_a_remover))
+        cursor.execute(update_query_remocao, (timestamp_agora, id_a_remover, timestamp_agora))
         
         # 3b. Registra o "Tombstone"
         tombstone_query = """
@@ -99,52 +89,45 @@ def remover_aluno(lider_destino, aluno, disciplina_nome):
         cursor.execute(tombstone_query, (id_a_remover, timestamp_agora))
 
         # 3c. Aplica as promoções da fila
-        update_query_fila = "UPDATE matriculas SET status = %s, data_ultima_modificacao = (NOW() AT TIME ZONE 'UTC') WHERE id = %s"
         for old_id, nome, novo_status, ts in updates_a_replicar:
-             cursor.execute(update_query_fila, (novo_status, old_id))
+            cursor.execute(QUERY_ATUALIZAR_STATUS, (novo_status, timestamp_agora, old_id, timestamp_agora))
         
-        # 3d. Salva tudo (Commit 1)
+        # 3d. Outbox: as operações a replicar entram na MESMA transação
+        operacoes = [
+            # a) Replica o Soft Delete
+            Operacao(update_query_remocao, (timestamp_agora, id_a_remover, timestamp_agora)),
+            # b) Replica o Tombstone
+            Operacao(tombstone_query, (id_a_remover, timestamp_agora)),
+        ]
+        # c) Replica as promoções da fila
+        for old_id, nome, novo_status, ts in updates_a_replicar:
+            operacoes.append(Operacao(QUERY_ATUALIZAR_STATUS, (novo_status, timestamp_agora, old_id, timestamp_agora)))
+        registrar_pendencias(conn, lider_destino, operacoes, origem=origem_escritas(lider_destino))
+
+        # 3e. Salva tudo (Commit 1)
         conn.commit() 
+        guardar_fila(lider_destino, disciplina_id, fila, marca)
         print(f"✅ Remoção e reavaliação da fila salvas em {lider_destino}.")
 
         
         # --- ETAPA 4: REPLICAÇÃO ---
         print("\n--- Replicação de Remoção e Promoção da Fila ---")
-        
-        for servidor_id in ALL_SERVERS:
-            if servidor_id == lider_destino: continue 
-            replica_conn = connect_to_db(servidor_id)
-            if replica_conn:
-                replica_cursor = replica_conn.cursor()
-                try:
-                    # a) Replica o Soft Delete
-                    replica_cursor.execute(update_query_remocao, (timestamp_agora, id_a_remover))
-                    # b) Replica o Tombstone
-                    replica_cursor.execute(tombstone_query, (id_a_remover, timestamp_agora))
-                    
-                    # c) Replica as promoções da fila
-                    for old_id, nome, novo_status, ts in updates_a_replicar:
-                        replica_cursor.execute(update_query_fila, (novo_status, old_id))
-
-                    replica_conn.commit()
-                    print(f"➡️ Replicação sucesso (Remoção + {len(updates_a_replicar)} promoções) para o servidor {servidor_id}.")
-                except Exception as e:
-                    print(f"❌ Erro ao replicar para {servidor_id}: {e}")
-                    replica_conn.rollback()
-                finally:
-                    if replica_cursor: replica_cursor.close()
-                    if replica_conn: replica_conn.close()
-            else:
-                print(f"❌ Falha de Conexão: Líder {servidor_id} inacessível para replicação.")
+        resultado_replicacao = entregar_pendencias(lider_destino, nivel=nivel)
+        resultado_replicacao.imprimir(f"Remoção + {len(updates_a_replicar)} promoções")
+        return {'sucesso': True, 'matricula_id': str(id_a_remover), 'promocoes': len(updates_a_replicar),
+                'replicacao': {s: r.sucesso for s, r in resultado_replicacao.pares.items()},
+                'consistencia': resultado_replicacao.resumo_consistencia()}
             
     except psycopg2.Error as e:
         conn.rollback()
         print(f"❌ Erro PostgreSQL durante a remoção: {e}")
+        return {'sucesso': False, 'motivo': 'erro', 'mensagem': f"Erro PostgreSQL: {str(e).strip()}"}
     except Exception as e:
         print(f"❌ Erro inesperado: {e}")
+        return {'sucesso': False, 'motivo': 'erro', 'mensagem': f"Erro inesperado: {e}"}
     finally:
         if cursor: cursor.close()
-        if conn: conn.close()
+        liberar_conexao(conn)
 
 def remover_matricula_menu():
     if not LOCAL_SERVERS:
@@ -1,74 +1,71 @@
 # app/remover_disciplina.py
 import psycopg2
-from app.config import SERVERS, ALL_SERVERS, LOCAL_SERVERS
+from app.config import SERVERS, LOCAL_SERVERS
+from app.conexao import connect_to_db, liberar_conexao
+from app.replicacao import Operacao, aplicar_operacoes, registrar_pendencias, entregar_pendencias
+from app.catalogo import obter_disciplina, invalidar_catalogo
+from app.relogio import agora
 
-# --- NOVA FUNÇÃO DE AJUDA ---
-def connect_to_db(servidor_id):
-    """Conecta ao banco de dados específico. Retorna None em caso de falha."""
-    config = SERVERS.get(servidor_id)
-    if not config:
-        return None
-    connect_args = {k: v for k, v in config.items() if k != 'tipo'}
-    connect_args['connect_timeout'] = 5
-    try:
-        conn = psycopg2.connect(**connect_args)
-        return conn
-    except psycopg2.OperationalError:
-        return None
-# --- FIM DA FUNÇÃO DE AJUDA ---
-
-def remover_disciplina_no_servidor(servidor_id, disciplina_nome, timestamp_agora):
-    """Conecta e remove (Soft Delete) a disciplina em um único servidor."""
-    config = SERVERS.get(servidor_id)
-    if not config:
-        return False, f"Configuração do servidor {servidor_id} não encontrada."
-        
-    connect_args = {k: v for k, v in config.items() if k != 'tipo'}
-    connect_args['connect_timeout'] = 5 
-    
-    conn = None
-    try:
-        conn = psycopg2.connect(**connect_args)
-        cursor = conn.cursor()
-        
-        # 1. Encontra o ID da disciplina
-        cursor.execute("SELECT id FROM disciplinas WHERE nome = %s AND (is_deleted IS NULL OR is_deleted = false);", (disciplina_nome,))
-        resultado = cursor.fetchone()
-        
-        if not resultado:
-            return False, "Disciplina não encontrada ou já removida."
-
-        disciplina_id = resultado[0]
-
-        # 2. SOFT DELETE (Matrículas)
-        cursor.execute("""
+def operacoes_remocao_disciplina(disciplina_id, timestamp_agora):
+    """Operações (replicáveis) do Soft Delete de uma disciplina já identificada pelo ID."""
+    return [
+        # SOFT DELETE (Matrículas), LWW: não sobrescreve mudanças mais novas de cada matrícula
+        Operacao("""
             UPDATE matriculas SET status = 'REMOVIDA', data_ultima_modificacao = %s
-            WHERE disciplina_id = %s
-            """, (timestamp_agora, disciplina_id))
-        
-        # 3. SOFT DELETE (Disciplina)
-        cursor.execute("""
+            WHERE disciplina_id = %s AND data_ultima_modificacao < %s
+            """, (timestamp_agora, disciplina_id, timestamp_agora)),
+        # SOFT DELETE (Disciplina)
+        Operacao("""
             UPDATE disciplinas SET is_deleted = true, data_ultima_modificacao = %s
             WHERE id = %s
-            """, (timestamp_agora, disciplina_id))
-        
-        # 4. TOMBSTONE (Disciplina)
-        cursor.execute("""
+            """, (timestamp_agora, disciplina_id)),
+        # TOMBSTONE (Disciplina)
+        Operacao("""
             INSERT INTO deleted_disciplinas (id, timestamp) 
             VALUES (%s, %s)
             ON CONFLICT (id) DO UPDATE SET timestamp = EXCLUDED.timestamp
-            """, (disciplina_id, timestamp_agora))
+            """, (disciplina_id, timestamp_agora)),
+    ]
+
+def remover_disciplina_no_servidor(servidor_id, disciplina_nome, timestamp_agora, com_outbox=False):
+    """
+    Conecta e remove (Soft Delete) a disciplina em um único servidor.
+    Com 'com_outbox', as operações também são gravadas na outbox (mesma transação) para os pares.
+    Retorna (sucesso, motivo, mensagem); 'motivo' é None no sucesso e, na falha, um dos
+    códigos das operações ('nao_encontrada', 'offline' ou 'erro').
+    """
+    if servidor_id not in SERVERS:
+        return False, 'erro', f"Configuração do servidor {servidor_id} não encontrada."
+
+    conn = connect_to_db(servidor_id)
+    if not conn:
+        return False, 'offline', "FALHA DE CONEXÃO (servidor offline)."
+    try:
+        cursor = conn.cursor()
+        
+        # 1. Encontra o ID da disciplina (cache do catálogo do nó)
+        disciplina_id, _ = obter_disciplina(conn, disciplina_nome)
+        
+        if not disciplina_id:
+            return False, 'nao_encontrada', "Disciplina não encontrada ou já removida."
+
+        # 2-4. SOFT DELETE (Matrículas e Disciplina) + TOMBSTONE
+        operacoes = operacoes_remocao_disciplina(disciplina_id, timestamp_agora)
+        aplicar_operacoes(cursor, operacoes)
+        if com_outbox:
+            registrar_pendencias(conn, servidor_id, operacoes)
         
         conn.commit()
-        return True, "SUCESSO (Soft Delete)"
+        invalidar_catalogo(servidor_id)
+        return True, None, "SUCESSO (Soft Delete)"
 
     except psycopg2.OperationalError:
-        return False, "FALHA DE CONEXÃO (servidor offline)."
+        return False, 'offline', "FALHA DE CONEXÃO (servidor offline)."
     except Exception as e:
         if conn: conn.rollback()
-        return False, f"ERRO INESPERADO: {e}"
+        return False, 'erro', f"ERRO INESPERADO: {e}"
     finally:
-        if conn: conn.close()
+        liberar_conexao(conn)
 
 # Função principal
 def remover_disciplina():
@@ -80,6 +77,13 @@ def remover_disciplina():
         print("❌ Remoção cancelada: O nome da disciplina não pode ser vazio.")
         return
 
+    _remover_disciplina_core(disciplina_nome)
+
+def _remover_disciplina_core(disciplina_nome):
+    """
+    Remove a disciplina no líder local e replica aos pares.
+    Retorna um dict com 'sucesso', 'mensagem' e o resultado por líder em 'replicacao'.
+    """
     # Pega o ID local APENAS para o feedback final
     local_id = LOCAL_SERVERS[0]
     
@@ -87,33 +91,16 @@ def remover_disciplina():
     
     all_results = {}
     
-    # --- CORREÇÃO APLICADA AQUI (Lógica do timestamp) ---
-    # Tenta conectar a QUALQUER líder online para gerar o timestamp
-    timestamp_agora = None
-    for servidor_id in ALL_SERVERS:
-        conn_ts = connect_to_db(servidor_id)
-        if conn_ts:
-            try:
-                cursor_ts = conn_ts.cursor()
-                cursor_ts.execute("SELECT (NOW() AT TIME ZONE 'UTC')")
-                timestamp_agora = cursor_ts.fetchone()[0]
-                cursor_ts.close()
-                conn_ts.close()
-                print(f"✅ Timestamp para remoção gerado via Líder {servidor_id}.")
-                break # Conseguiu o timestamp
-            except Exception:
-                if conn_ts: conn_ts.close()
-                continue
-    
-    if timestamp_agora is None:
-        print("❌ Falha: Não foi possível conectar a NENHUM líder para gerar o timestamp. (Todos estão offline?)")
-        return
-    # --- FIM DA CORREÇÃO ---
+    # Timestamp do relógio híbrido local: não depende de nenhum líder estar online
+    timestamp_agora = agora()
 
-    # Loop de replicação (como antes)
-    for servidor_id in ALL_SERVERS:
-        sucesso, mensagem = remover_disciplina_no_servidor(servidor_id, disciplina_nome, timestamp_agora)
-        all_results[servidor_id] = {'sucesso': sucesso, 'mensagem': mensagem}
+    # Remove no líder local (gravando a outbox na mesma transação) e entrega aos pares ao mesmo tempo
+    sucesso, motivo, mensagem = remover_disciplina_no_servidor(local_id, disciplina_nome, timestamp_agora, com_outbox=True)
+    all_results[local_id] = {'sucesso': sucesso, 'mensagem': mensagem}
+    if sucesso:
+        for servidor_id, r in entregar_pendencias(local_id).pares.items():
+            all_results[servidor_id] = {'sucesso': r.sucesso, 'mensagem': r.mensagem}
+        invalidar_catalogo()
 
     local_result = all_results.get(local_id) # Pega o resultado do C ou D
     
@@ -132,4 +119,10 @@ def remover_disciplina():
         print(f"❌ Falha: Não foi possível remover no líder local ({local_id}).")
         print(f"Detalhes: {msg}")
         
-    print("-----------------------------\n")
\ No newline at end of file
+    print("-----------------------------\n")
+    resultado = {'sucesso': bool(local_result and local_result['sucesso']),
+                 'mensagem': local_result['mensagem'] if local_result else "",
+                 'replicacao': {s: r['sucesso'] for s, r in all_results.items()}}
+    if not resultado['sucesso']:
+        resultado['motivo'] = motivo
+    return resultado
\ No newline at end of file
@@ -0,0 +1,573 @@
+import json
+import threading
+import time
+import psycopg2
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import NamedTuple
+from psycopg2.extras import execute_values
+from app.config import (ALL_SERVERS, OUTBOX_LOTE, OUTBOX_INTERVALO_SEGUNDOS, OUTBOX_BACKOFF_MAX_SEGUNDOS,
+                        OUTBOX_TENTATIVAS_MAX, CONSISTENCIA_PADRAO, CONSISTENCIA_POR_OPERACAO, REPLICACAO_TRABALHADORES)
+from app.conexao import connect_to_db, liberar_conexao
+from app.metricas import cronometrado, rotulo_no
+
+
+class Operacao(NamedTuple):
+    """Um comando SQL a ser replicado. Se 'em_lote', 'parametros' é uma lista de tuplas para execute_values."""
+    query: str
+    parametros: tuple
+    em_lote: bool = False
+
+
+@dataclass
+class ResultadoPar:
+    """Resultado da replicação para UM líder ('em_andamento': outra drenagem está entregando)."""
+    servidor_id: str
+    sucesso: bool
+    mensagem: str
+    duracao: float = 0.0
+    em_andamento: bool = False
+
+
+@dataclass
+class ResultadoReplicacao:
+    """
+    Resultado agregado de um fan-out: um ResultadoPar por líder de destino que já respondeu.
+    Com nível de consistência abaixo de ALL, 'em_andamento' lista os destinos cuja entrega
+    continuou em segundo plano depois de atingidas as 'necessarias' confirmações.
+    """
+    origem: str
+    pares: dict = field(default_factory=dict)
+    nivel: str = 'ALL'
+    necessarias: int = None
+    em_andamento: list = field(default_factory=list)
+
+    @property
+    def sucessos(self):
+        return [s for s, r in self.pares.items() if r.sucesso]
+
+    @property
+    def falhas(self):
+        return [s for s, r in self.pares.items() if not r.sucesso]
+
+    @property
+    def todos_ok(self):
+        return not self.falhas and not self.em_andamento
+
+    @property
+    def confirmacoes(self):
+        """Líderes que já gravaram a escrita, contando a origem (salvo se a gravação nela falhou)."""
+        origem = self.pares.get(self.origem)
+        return len([s for s in self.sucessos if s != self.origem]) + (0 if origem and not origem.sucesso else 1)
+
+    @property
+    def consistencia_atingida(self):
+        return self.confirmacoes >= (self.necessarias or len(ALL_SERVERS))
+
+    def resumo_consistencia(self):
+        """Dict serializável do nível pedido e do que foi atingido (retorno das operações e da API)."""
+        return {'nivel': self.nivel, 'necessarias': self.necessarias or len(ALL_SERVERS),
+                'confirmacoes': self.confirmacoes, 'atingida': self.consistencia_atingida,
+                'em_segundo_plano': list(self.em_andamento)}
+
+    def imprimir(self, descricao):
+        for servidor_id, r in self.pares.items():
+            if r.sucesso:
+                print(f"➡ Replicação SUCESSO ({descricao}) para o Líder {servidor_id}. ({r.duracao * 1000:.0f} ms)")
+            else:
+                print(f"❌ Falha na replicação para o Líder {servidor_id}: {r.mensagem}")
+        for servidor_id in self.em_andamento:
+            print(f"⏳ Replicação para o Líder {servidor_id} continua em segundo plano.")
+        if self.nivel != 'ALL' or not self.consistencia_atingida:
+            marca = "✅" if self.consistencia_atingida else "⚠️"
+            print(f"{marca} Consistência {self.nivel}: {self.confirmacoes} de {self.necessarias or len(ALL_SERVERS)} "
+                  f"confirmações necessárias.")
+
+
+def aplicar_operacoes(cursor, operacoes):
+    """Executa as operações, em ordem, no cursor (sem commit)."""
+    for op in operacoes:
+        if op.em_lote:
+            execute_values(cursor, op.query, op.parametros)
+        else:
+            cursor.execute(op.query, op.parametros)
+
+
+def executar_em_paralelo(servidores, funcao, *args):
+    """
+    Chama funcao(servidor_id, *args) para cada servidor ao mesmo tempo (uma thread por servidor).
+    Retorna {servidor_id: retorno}, na ordem de 'servidores'. Exceções são propagadas.
+    """
+    servidores = list(servidores)
+    if not servidores:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(servidores), thread_name_prefix='fanout') as executor:
+        futuros = {s: executor.submit(funcao, s, *args) for s in servidores}
+        return {s: f.result() for s, f in futuros.items()}
+
+
+@cronometrado('replicacao_destino', rotulo_no)
+def _replicar_para(servidor_id, operacoes):
+    """Aplica as operações em UM líder, numa única transação."""
+    inicio = time.perf_counter()
+    conn = connect_to_db(servidor_id)
+    if not conn:
+        return ResultadoPar(servidor_id, False, "Líder offline (replicação pendente).", time.perf_counter() - inicio)
+    cursor = conn.cursor()
+    try:
+        aplicar_operacoes(cursor, operacoes)
+        conn.commit()
+        return ResultadoPar(servidor_id, True, "OK", time.perf_counter() - inicio)
+    except psycopg2.Error as e:
+        conn.rollback()
+        return ResultadoPar(servidor_id, False, f"Erro PostgreSQL: {e}", time.perf_counter() - inicio)
+    except Exception as e:
+        conn.rollback()
+        return ResultadoPar(servidor_id, False, f"Erro inesperado: {e}", time.perf_counter() - inicio)
+    finally:
+        cursor.close()
+        liberar_conexao(conn)
+
+
+def replicar_operacoes(lider_origem, operacoes, destinos=None):
+    """
+    Envia as operações para todos os líderes (exceto 'lider_origem') AO MESMO TEMPO.
+    A latência passa a ser a do par mais lento, e não a soma de todos.
+    """
+    if destinos is None:
+        destinos = [s for s in ALL_SERVERS if s != lider_origem]
+    resultado = ResultadoReplicacao(lider_origem)
+    resultado.pares = executar_em_paralelo(destinos, _replicar_para, list(operacoes))
+    return resultado
+
+
+# --- OUTBOX DURÁVEL (hinted handoff) ---
+# Toda escrita grava, NA MESMA transação local, uma entrada por líder de destino em
+# 'replicacao_pendente'. A entrega (imediata ou pelo drenador em segundo plano) aplica as
+# entradas de cada destino em ordem (seq) e apaga as que foram confirmadas. Uma entrada que
+# falha OUTBOX_TENTATIVAS_MAX vezes no destino (FK, função inexistente...) vai para a fila
+# morta (morta_em) e deixa de bloquear as seguintes; o heal repara o que ela não entregou.
+
+_outbox_garantida = set()
+_outbox_lock = threading.Lock()
+
+
+def garantir_tabela_outbox(conn):
+    """
+    Cria a tabela da outbox em bancos criados antes dela existir no init.sql (uma vez por nó).
+    Usa a conexão de quem chamou, SEM commit: se a tabela já está completa, só a confere (sem
+    travas); senão, o DDL entra na transação do chamador e a conferência se repete na próxima vez.
+    """
+    with _outbox_lock:
+        if conn.servidor_id in _outbox_garantida:
+            return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = 'replicacao_pendente' AND column_name = 'morta_em'
+        """)
+        if cursor.fetchone():
+            with _outbox_lock:
+                _outbox_garantida.add(conn.servidor_id)
+            return
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS replicacao_pendente (
+                seq BIGSERIAL PRIMARY KEY,
+                destino VARCHAR(10) NOT NULL,
+                operacoes JSONB NOT NULL,
+                criado_em TIMESTAMPTZ DEFAULT NOW(),
+                tentativas INT DEFAULT 0,
+                ultimo_erro TEXT
+            );
+            ALTER TABLE replicacao_pendente ADD COLUMN IF NOT EXISTS morta_em TIMESTAMPTZ;
+            CREATE INDEX IF NOT EXISTS idx_replicacao_pendente_destino ON replicacao_pendente (destino, seq);
+        """)
+    finally:
+        cursor.close()
+
+
+def _serializar(operacoes):
+    return json.dumps([[op.query, op.parametros, op.em_lote] for op in operacoes], default=str)
+
+
+def _desserializar(dados):
+    operacoes = []
+    for query, parametros, em_lote in dados:
+        if em_lote:
+            operacoes.append(Operacao(query, [tuple(p) for p in parametros], True))
+        else:
+            operacoes.append(Operacao(query, tuple(parametros)))
+    return operacoes
+
+
+# Origem das escritas da transação (contada por disciplina em fila_versoes, migração 6)
+QUERY_MARCAR_ORIGEM = "SELECT set_config('app.origem', %s, true)"
+
+
+def registrar_pendencias(conn, lider_origem, operacoes, destinos=None, origem=None):
+    """
+    Grava as operações na outbox do líder de origem (uma entrada por destino), SEM commit:
+    deve ser chamada dentro da transação local da escrita, antes do conn.commit().
+    Cada entrada começa marcando a sua 'origem' (vazia = sem origem), que vale no destino até a
+    próxima entrada do mesmo lote: é ela que a fila em memória de app/matricular.py ignora.
+    """
+    if destinos is None:
+        destinos = [s for s in ALL_SERVERS if s != lider_origem]
+    garantir_tabela_outbox(conn)
+    payload = _serializar([Operacao(QUERY_MARCAR_ORIGEM, (origem or '',))] + list(operacoes))
+    cursor = conn.cursor()
+    try:
+        execute_values(cursor, "INSERT INTO replicacao_pendente (destino, operacoes) VALUES %s",
+                       [(destino, payload) for destino in destinos])
+    finally:
+        cursor.close()
+
+
+@cronometrado('replicacao_destino', lambda destino, lider_origem: {'no': destino, 'origem': lider_origem})
+def drenar_destino(destino, lider_origem):
+    """
+    Entrega, em ordem e em lotes de OUTBOX_LOTE entradas por transação, tudo o que a outbox do
+    'lider_origem' tem para 'destino'. Um advisory lock por destino impede duas drenagens
+    simultâneas (o que poderia inverter a ordem das operações). Se outra drenagem já o tem, volta
+    na hora, sem segurar a conexão do pool esperando: quem drena relê a outbox até esvaziá-la e
+    entrega também o que foi gravado agora (o drenador em segundo plano cobre o resto).
+    """
+    inicio = time.perf_counter()
+    conn_local = connect_to_db(lider_origem)
+    if not conn_local:
+        return ResultadoPar(destino, False, f"Líder de origem {lider_origem} offline.", time.perf_counter() - inicio)
+    cursor_local = conn_local.cursor()
+    conn_destino = None
+    entregues = 0
+    travado = False
+    try:
+        garantir_tabela_outbox(conn_local)
+        cursor_local.execute("SELECT pg_try_advisory_lock(hashtext('replicacao_pendente:' || %s))", (destino,))
+        travado = cursor_local.fetchone()[0]
+        conn_local.commit()
+        if not travado:
+            return ResultadoPar(destino, False, "Entrega em andamento por outra drenagem.",
+                                time.perf_counter() - inicio, em_andamento=True)
+        while True:
+            cursor_local.execute("""
+                SELECT seq, operacoes FROM replicacao_pendente
+                WHERE destino = %s AND morta_em IS NULL ORDER BY seq LIMIT %s
+            """, (destino, OUTBOX_LOTE))
+            entradas = cursor_local.fetchall()
+            conn_local.commit()
+            if not entradas:
+                break
+
+            if conn_destino is None:
+                conn_destino = connect_to_db(destino)
+                if not conn_destino:
+                    _registrar_falha(conn_local, entradas[0][0], "Líder offline.", contar_tentativa=False)
+                    return ResultadoPar(destino, False, f"Líder offline (replicação pendente: {_profundidade(conn_local, destino)} na outbox).",
+                                        time.perf_counter() - inicio)
+            falha = None
+            cursor_destino = conn_destino.cursor()
+            try:
+                for seq, dados in entradas:
+                    aplicar_operacoes(cursor_destino, _desserializar(dados))
+                conn_destino.commit()
+                confirmadas = [seq for seq, _ in entradas]
+            except psycopg2.OperationalError as e:
+                # Conexão com o destino caiu: tenta de novo depois, sem contar contra a entrada
+                _desfazer(conn_destino)
+                _registrar_falha(conn_local, entradas[0][0], str(e), contar_tentativa=False)
+                return ResultadoPar(destino, False, f"Erro PostgreSQL: {e}", time.perf_counter() - inicio)
+            except psycopg2.Error:
+                # Algum comando do lote falhou: reentrega uma a uma para achar a entrada culpada
+                _desfazer(conn_destino)
+                confirmadas, falha = _entregar_uma_a_uma(conn_destino, entradas)
+            finally:
+                cursor_destino.close()
+
+            if confirmadas:
+                cursor_local.execute("DELETE FROM replicacao_pendente WHERE seq = ANY(%s)", (confirmadas,))
+                conn_local.commit()
+                entregues += len(confirmadas)
+            if falha:
+                seq, erro = falha
+                if not _registrar_falha(conn_local, seq, erro):
+                    return ResultadoPar(destino, False, f"Erro PostgreSQL: {erro}", time.perf_counter() - inicio)
+                print(f"☠️ Outbox {lider_origem}->{destino}: entrada {seq} falhou {OUTBOX_TENTATIVAS_MAX} vezes e foi "
+                      f"para a fila morta ({erro.strip().splitlines()[0] if erro.strip() else 'erro'}). "
+                      f"Rode o heal para reparar o destino.")
+        return ResultadoPar(destino, True, f"OK ({entregues} entradas entregues)", time.perf_counter() - inicio)
+    except psycopg2.Error as e:
+        conn_local.rollback()
+        return ResultadoPar(destino, False, f"Erro na outbox local: {e}", time.perf_counter() - inicio)
+    finally:
+        if travado:
+            try:
+                cursor_local.execute("SELECT pg_advisory_unlock(hashtext('replicacao_pendente:' || %s))", (destino,))
+                conn_local.commit()
+            except psycopg2.Error:
+                pass
+        cursor_local.close()
+        liberar_conexao(conn_local)
+        liberar_conexao(conn_destino)
+
+
+def _desfazer(conn):
+    """Rollback que tolera uma conexão já fechada (o pool a descarta na devolução)."""
+    try:
+        if not conn.closed:
+            conn.rollback()
+    except psycopg2.Error:
+        pass
+
+
+def _entregar_uma_a_uma(conn_destino, entradas):
+    """
+    Aplica as entradas, em ordem, cada uma na sua transação, até a primeira que falhar.
+    Retorna (seqs confirmados, (seq, erro) da que falhou ou None).
+    """
+    confirmadas = []
+    cursor = conn_destino.cursor()
+    try:
+        for seq, dados in entradas:
+            try:
+                aplicar_operacoes(cursor, _desserializar(dados))
+                conn_destino.commit()
+            except psycopg2.Error as e:
+                _desfazer(conn_destino)
+                return confirmadas, (seq, str(e))
+            confirmadas.append(seq)
+        return confirmadas, None
+    finally:
+        cursor.close()
+
+
+def _registrar_falha(conn_local, seq, erro, contar_tentativa=True):
+    """
+    Anota o erro na entrada. Falhas de aplicação (contar_tentativa) somam tentativas e, ao chegar
+    a OUTBOX_TENTATIVAS_MAX, a entrada vai para a fila morta. Retorna True nesse caso.
+    """
+    cursor = conn_local.cursor()
+    try:
+        cursor.execute("""
+            UPDATE replicacao_pendente
+            SET tentativas = tentativas + %s, ultimo_erro = %s,
+                morta_em = CASE WHEN tentativas + %s >= %s THEN NOW() END
+            WHERE seq = %s
+            RETURNING morta_em IS NOT NULL
+        """, (int(contar_tentativa), erro[:500], int(contar_tentativa), OUTBOX_TENTATIVAS_MAX, seq))
+        row = cursor.fetchone()
+        conn_local.commit()
+        return bool(row and row[0])
+    finally:
+        cursor.close()
+
+
+def _profundidade(conn_local, destino):
+    cursor = conn_local.cursor()
+    try:
+        cursor.execute("SELECT count(*) FROM replicacao_pendente WHERE destino = %s AND morta_em IS NULL", (destino,))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn_local.commit()
+
+
+# --- NÍVEIS DE CONSISTÊNCIA DA ESCRITA (W de N) ---
+# A escrita já está na outbox do líder de origem, então a entrega aos pares acontece de
+# qualquer jeito; o nível só decide quantas confirmações (W, contando a origem) a chamada
+# espera antes de voltar. O resto continua num pool em segundo plano.
+
+NIVEIS_CONSISTENCIA = ('ONE', 'QUORUM', 'ALL')
+
+_executor_entregas = None
+_executor_lock = threading.Lock()
+
+
+def nivel_consistencia(operacao, nivel=None):
+    """Nível efetivo da operação: o pedido na chamada, o de CONSISTENCIA_POR_OPERACAO ou o padrão."""
+    nivel = (nivel or CONSISTENCIA_POR_OPERACAO.get(operacao) or CONSISTENCIA_PADRAO).upper()
+    if nivel not in NIVEIS_CONSISTENCIA:
+        raise ValueError(f"nível de consistência inválido '{nivel}' (use {', '.join(NIVEIS_CONSISTENCIA)})")
+    return nivel
+
+
+def confirmacoes_necessarias(nivel, total=None):
+    """W do nível para N = 'total' líderes: ONE = 1, QUORUM = maioria, ALL = N."""
+    total = total or len(ALL_SERVERS)
+    return {'ONE': 1, 'QUORUM': total // 2 + 1, 'ALL': total}[nivel]
+
+
+def _executor():
+    global _executor_entregas
+    with _executor_lock:
+        if _executor_entregas is None:
+            _executor_entregas = ThreadPoolExecutor(max_workers=REPLICACAO_TRABALHADORES, thread_name_prefix='entrega')
+        return _executor_entregas
+
+
+def aguardar_entregas():
+    """Espera as entregas que seguiram em segundo plano (chamar antes de fechar os pools)."""
+    global _executor_entregas
+    with _executor_lock:
+        executor, _executor_entregas = _executor_entregas, None
+    if executor:
+        executor.shutdown(wait=True)
+
+
+@cronometrado('replicacao', rotulo_no)
+def entregar_pendencias(lider_origem, destinos=None, nivel=None):
+    """
+    Drena a outbox para todos os destinos AO MESMO TEMPO. Retorna um ResultadoReplicacao.
+    Sem 'nivel' (ou com ALL), espera todos os destinos; com ONE/QUORUM volta assim que a
+    origem (já gravada) mais os pares que confirmaram somam W, e o resto segue em segundo plano.
+    """
+    if destinos is None:
+        destinos = [s for s in ALL_SERVERS if s != lider_origem]
+    nivel = nivel or 'ALL'
+    resultado = ResultadoReplicacao(lider_origem, nivel=nivel, necessarias=confirmacoes_necessarias(nivel))
+    faltam = resultado.necessarias - 1
+    if faltam >= len(destinos):
+        resultado.pares = executar_em_paralelo(destinos, drenar_destino, lider_origem)
+        _separar_em_andamento(resultado)
+        return resultado
+
+    futuros = {_executor().submit(drenar_destino, destino, lider_origem): destino for destino in destinos}
+    if faltam > 0:
+        for futuro in as_completed(futuros):
+            resultado.pares[futuros[futuro]] = futuro.result()
+            if len(resultado.sucessos) >= faltam:
+                break
+    resultado.em_andamento = [destino for destino in destinos if destino not in resultado.pares]
+    for futuro, destino in futuros.items():
+        if destino in resultado.em_andamento:
+            futuro.add_done_callback(lambda f, d=destino: _relatar_entrega_em_segundo_plano(lider_origem, d, f))
+    _separar_em_andamento(resultado)
+    return resultado
+
+
+def _separar_em_andamento(resultado):
+    """Destinos que outra drenagem está entregando não são falhas: passam para 'em_andamento'."""
+    for destino, r in list(resultado.pares.items()):
+        if r.em_andamento:
+            del resultado.pares[destino]
+            resultado.em_andamento.append(destino)
+
+
+def _relatar_entrega_em_segundo_plano(lider_origem, destino, futuro):
+    """Avisa quando uma entrega que seguiu depois de atingido W falha (ninguém mais espera por ela)."""
+    erro = futuro.exception()
+    if erro is None and (futuro.result().sucesso or futuro.result().em_andamento):
+        return
+    mensagem = f"Erro inesperado: {erro}" if erro is not None else futuro.result().mensagem
+    print(f"⚠️ Replicação em segundo plano {lider_origem}->{destino} falhou: {mensagem} "
+          f"(fica na outbox; o drenador tenta de novo).")
+
+
+def gravar_e_replicar(lider_origem, operacoes, nivel=None):
+    """
+    Aplica as operações no líder de origem junto com a outbox (1 transação) e entrega aos pares
+    (esperando as confirmações do 'nivel', como em entregar_pendencias).
+    O resultado inclui o próprio líder de origem. Se ele estiver offline, não há outbox onde
+    gravar: cai no fan-out direto para os demais líderes (o heal cobre o que falhar).
+    """
+    inicio = time.perf_counter()
+    conn = connect_to_db(lider_origem)
+    if not conn:
+        resultado = replicar_operacoes(lider_origem, operacoes)
+        resultado.pares = {lider_origem: ResultadoPar(lider_origem, False, "Líder offline.", time.perf_counter() - inicio),
+                           **resultado.pares}
+        return resultado
+
+    cursor = conn.cursor()
+    try:
+        aplicar_operacoes(cursor, operacoes)
+        registrar_pendencias(conn, lider_origem, operacoes)
+        conn.commit()
+        resultado_local = ResultadoPar(lider_origem, True, "OK", time.perf_counter() - inicio)
+    except psycopg2.Error as e:
+        conn.rollback()
+        resultado = ResultadoReplicacao(lider_origem)
+        resultado.pares[lider_origem] = ResultadoPar(lider_origem, False, f"Erro PostgreSQL: {e}", time.perf_counter() - inicio)
+        return resultado
+    finally:
+        cursor.close()
+        liberar_conexao(conn)
+
+    resultado = entregar_pendencias(lider_origem, nivel=nivel)
+    resultado.pares = {lider_origem: resultado_local, **resultado.pares}
+    return resultado
+
+
+def profundidade_outbox(lider_origem):
+    """
+    {destino: (entradas_pendentes, mais_antiga, tentativas, ultimo_erro, na_fila_morta)} da outbox
+    do líder (None se offline). As três primeiras colunas contam só as entradas ainda vivas.
+    """
+    conn = connect_to_db(lider_origem)
+    if not conn:
+        return None
+    cursor = conn.cursor()
+    try:
+        garantir_tabela_outbox(conn)
+        cursor.execute("""
+            SELECT destino, count(*) FILTER (WHERE morta_em IS NULL),
+                   min(criado_em) FILTER (WHERE morta_em IS NULL),
+                   max(tentativas) FILTER (WHERE morta_em IS NULL),
+                   (array_agg(ultimo_erro ORDER BY seq) FILTER (WHERE ultimo_erro IS NOT NULL))[1],
+                   count(*) FILTER (WHERE morta_em IS NOT NULL)
+            FROM replicacao_pendente GROUP BY destino ORDER BY destino
+        """)
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+        liberar_conexao(conn)
+
+
+# --- DRENADOR EM SEGUNDO PLANO ---
+
+_drenador = None
+
+
+def _loop_drenador(lider_origem, parar):
+    proxima_tentativa = {}
+    falhas = {}
+    while not parar.wait(OUTBOX_INTERVALO_SEGUNDOS):
+        try:
+            _rodada_drenador(lider_origem, proxima_tentativa, falhas)
+        except Exception as e:
+            # Ex.: o líder local reiniciou. A thread continua e tenta de novo na próxima rodada.
+            print(f"⚠️ Drenador da outbox: erro nesta rodada ({type(e).__name__}: {str(e).strip()}).")
+
+
+def _rodada_drenador(lider_origem, proxima_tentativa, falhas):
+    pendentes = profundidade_outbox(lider_origem)
+    if not pendentes:
+        return
+    agora = time.monotonic()
+    destinos = [d for d, (qtd, *_) in pendentes.items() if qtd and proxima_tentativa.get(d, 0) <= agora]
+    for destino, r in entregar_pendencias(lider_origem, destinos).pares.items():
+        if r.sucesso:
+            falhas.pop(destino, None)
+            proxima_tentativa.pop(destino, None)
+        else:
+            # Backoff exponencial por destino
+            falhas[destino] = falhas.get(destino, 0) + 1
+            espera = min(OUTBOX_INTERVALO_SEGUNDOS * 2 ** falhas[destino], OUTBOX_BACKOFF_MAX_SEGUNDOS)
+            proxima_tentativa[destino] = time.monotonic() + espera
+
+
+def iniciar_drenador(lider_origem):
+    """Inicia (uma vez) a thread que entrega a outbox do líder local quando os pares voltam."""
+    global _drenador
+    if _drenador is None:
+        parar = threading.Event()
+        thread = threading.Thread(target=_loop_drenador, args=(lider_origem, parar), name='drenador-outbox', daemon=True)
+        thread.start()
+        _drenador = (thread, parar)
+
+
+def parar_drenador():
+    global _drenador
+    if _drenador is not None:
+        _drenador[1].set()
+        _drenador = None
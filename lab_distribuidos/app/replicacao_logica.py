@@ -0,0 +1,278 @@
+"""
+Daemon de replicação por decodificação lógica (push).
+
+Em cada líder, uma publicação cobre as tabelas replicadas e há um slot lógico (plugin
+'pgoutput', nativo do PostgreSQL) POR DESTINO. O daemon lê as mudanças do slot via SQL,
+extrai o id de cada linha alterada, relê a linha atual no líder local e a aplica no destino
+com a mesma regra LWW do heal (INSERT ... ON CONFLICT ... WHERE timestamp menor).
+O slot só avança depois que o destino confirmou o lote, então um destino offline apenas
+acumula WAL até voltar. A mudança aplicada no destino gera WAL lá, mas volta como no-op:
+o LWW não reescreve uma linha com o mesmo timestamp, e o ciclo para.
+
+Uso: python -m app.replicacao_logica [líder]   (ou REPLICACAO_LOGICA_ATIVA = True no config.py)
+"""
+import struct
+import sys
+import threading
+import time
+import psycopg2
+from app.config import (LOCAL_SERVERS, ALL_SERVERS, REPLICACAO_LOGICA_INTERVALO_SEGUNDOS, REPLICACAO_LOGICA_LOTE,
+                        OUTBOX_BACKOFF_MAX_SEGUNDOS)
+from app.conexao import connect_to_db, liberar_conexao
+from app.replicacao import executar_em_paralelo
+from app.sincronizacao import TABELAS_SYNC, aplicar_registros_lww
+
+PUBLICACAO = 'mlr_publicacao'
+
+# Ordem de aplicação: tombstones antes das entidades, disciplinas antes de matrículas (FK)
+ORDEM_TABELAS = ['deleted_disciplinas', 'deleted_matriculas', 'disciplinas', 'matriculas']
+
+
+def nome_slot(origem, destino):
+    return f"mlr_{origem}_para_{destino}".lower()
+
+
+def preparar_no(conn, destinos):
+    """Cria (se faltarem) a publicação e um slot lógico por destino no líder local."""
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM pg_publication WHERE pubname = %s", (PUBLICACAO,))
+        if not cursor.fetchone():
+            cursor.execute(f"CREATE PUBLICATION {PUBLICACAO} FOR TABLE {', '.join(ORDEM_TABELAS)}")
+        for destino in destinos:
+            slot = nome_slot(conn.servidor_id, destino)
+            cursor.execute("SELECT 1 FROM pg_replication_slots WHERE slot_name = %s", (slot,))
+            if not cursor.fetchone():
+                cursor.execute("SELECT pg_create_logical_replication_slot(%s, 'pgoutput')", (slot,))
+                print(f"✅ Slot lógico '{slot}' criado.")
+    finally:
+        cursor.close()
+        conn.autocommit = False
+
+
+# --- Decodificação do protocolo pgoutput (só o necessário: tabela e id de cada linha) ---
+
+def _ler_string(dados, pos):
+    fim = dados.index(b'\0', pos)
+    return dados[pos:fim].decode(), fim + 1
+
+
+def _ler_tupla(dados, pos):
+    """TupleData: Int16 colunas, e para cada uma 'n' (null), 'u' (toast inalterado) ou 't' + Int32 + texto."""
+    (ncols,) = struct.unpack_from('!h', dados, pos)
+    pos += 2
+    valores = []
+    for _ in range(ncols):
+        tipo = dados[pos:pos + 1]
+        pos += 1
+        if tipo == b't' or tipo == b'b':
+            (tamanho,) = struct.unpack_from('!i', dados, pos)
+            pos += 4
+            valores.append(dados[pos:pos + tamanho].decode())
+            pos += tamanho
+        else:
+            valores.append(None)
+    return valores, pos
+
+
+def decodificar_mensagem(dados, relacoes):
+    """
+    Decodifica UMA mensagem pgoutput. Atualiza 'relacoes' ({relid: (tabela, idx_id)}) nas
+    mensagens 'R' e retorna (tabela, id) para 'I', 'U' e 'D'; None para as demais.
+    """
+    tipo = dados[0:1]
+    if tipo == b'R':
+        (relid,) = struct.unpack_from('!I', dados, 1)
+        _, pos = _ler_string(dados, 5)
+        tabela, pos = _ler_string(dados, pos)
+        pos += 1  # replica identity
+        (ncols,) = struct.unpack_from('!h', dados, pos)
+        pos += 2
+        idx_id = None
+        for i in range(ncols):
+            pos += 1  # flags
+            coluna, pos = _ler_string(dados, pos)
+            pos += 8  # typeoid + typmod
+            if coluna == 'id':
+                idx_id = i
+        relacoes[relid] = (tabela, idx_id)
+        return None
+    if tipo not in (b'I', b'U', b'D'):
+        return None
+
+    (relid,) = struct.unpack_from('!I', dados, 1)
+    pos = 5
+    valores = None
+    if tipo == b'I':
+        valores, pos = _ler_tupla(dados, pos + 1)  # 'N'
+    else:
+        marcador = dados[pos:pos + 1]
+        if marcador in (b'K', b'O'):
+            valores, pos = _ler_tupla(dados, pos + 1)
+            marcador = dados[pos:pos + 1]
+        if tipo == b'U' and marcador == b'N':
+            valores, pos = _ler_tupla(dados, pos + 1)
+
+    tabela, idx_id = relacoes.get(relid, (None, None))
+    if tabela is None or idx_id is None or valores is None:
+        return None
+    return tabela, valores[idx_id]
+
+
+# --- Entrega ---
+
+def _ler_mudancas(conn_local, slot):
+    """Lê (sem consumir) até REPLICACAO_LOGICA_LOTE mudanças. Retorna ({tabela: {ids}}, ultimo_lsn)."""
+    cursor = conn_local.cursor()
+    try:
+        cursor.execute("""
+            SELECT lsn, data FROM pg_logical_slot_peek_binary_changes(
+                %s, NULL, %s, 'proto_version', '1', 'publication_names', %s)
+        """, (slot, REPLICACAO_LOGICA_LOTE, PUBLICACAO))
+        linhas = cursor.fetchall()
+        conn_local.commit()
+    finally:
+        cursor.close()
+
+    relacoes = {}
+    alterados = {}
+    for _, dados in linhas:
+        mudanca = decodificar_mensagem(bytes(dados), relacoes)
+        if mudanca:
+            tabela, id_linha = mudanca
+            alterados.setdefault(tabela, set()).add(id_linha)
+    return alterados, (linhas[-1][0] if linhas else None)
+
+
+def _avancar_slot(conn_local, slot, lsn):
+    cursor = conn_local.cursor()
+    try:
+        cursor.execute("SELECT pg_replication_slot_advance(%s, %s::pg_lsn)", (slot, lsn))
+        conn_local.commit()
+    finally:
+        cursor.close()
+
+
+def propagar_para(destino, origem):
+    """Um ciclo do daemon para UM destino. Retorna o número de linhas aplicadas (None se falhou)."""
+    slot = nome_slot(origem, destino)
+    conn_local = connect_to_db(origem)
+    if not conn_local:
+        return None
+    conn_destino = None
+    try:
+        alterados, ultimo_lsn = _ler_mudancas(conn_local, slot)
+        if ultimo_lsn is None:
+            return 0
+        aplicados = 0
+        if alterados:
+            conn_destino = connect_to_db(destino)
+            if not conn_destino:
+                return None
+            cursor_local = conn_local.cursor()
+            cursor_destino = conn_destino.cursor()
+            try:
+                for tabela in ORDEM_TABELAS:
+                    ids = alterados.get(tabela)
+                    if not ids:
+                        continue
+                    colunas = ', '.join(TABELAS_SYNC[tabela]['colunas'])
+                    cursor_local.execute(f"SELECT {colunas} FROM {tabela} WHERE id = ANY(%s::uuid[])", (list(ids),))
+                    aplicados += aplicar_registros_lww(cursor_destino, tabela, cursor_local.fetchall())
+                conn_destino.commit()
+                conn_local.commit()
+            finally:
+                cursor_local.close()
+                cursor_destino.close()
+        # Só consome as mudanças depois da confirmação do destino
+        _avancar_slot(conn_local, slot, ultimo_lsn)
+        return aplicados
+    except psycopg2.Error as e:
+        print(f"❌ Replicação lógica {origem} -> {destino} falhou: {str(e).strip()}")
+        return None
+    finally:
+        # liberar_conexao desfaz a transação aberta ou descarta a conexão quebrada
+        liberar_conexao(conn_local)
+        liberar_conexao(conn_destino)
+
+
+def executar_daemon(origem=None, parar=None):
+    """Loop principal: a cada intervalo, propaga as mudanças do líder 'origem' (padrão: o local) para os pares em paralelo."""
+    origem = origem or LOCAL_SERVERS[0]
+    destinos = [s for s in ALL_SERVERS if s != origem]
+    parar = parar or threading.Event()
+
+    conn = connect_to_db(origem)
+    if not conn:
+        print(f"❌ Líder local {origem} offline: daemon de replicação lógica não iniciado.")
+        return
+    try:
+        preparar_no(conn, destinos)
+    finally:
+        liberar_conexao(conn)
+
+    print(f"🔁 Replicação lógica ativa: {origem} -> {', '.join(destinos)}")
+    proxima_tentativa = {}
+    falhas = {}
+    while not parar.wait(REPLICACAO_LOGICA_INTERVALO_SEGUNDOS):
+        agora = time.monotonic()
+        prontos = [d for d in destinos if proxima_tentativa.get(d, 0) <= agora]
+        for destino, aplicados in executar_em_paralelo(prontos, propagar_para, origem).items():
+            if aplicados is None:
+                # Backoff exponencial por destino (o slot segura as mudanças até ele voltar)
+                falhas[destino] = falhas.get(destino, 0) + 1
+                espera = min(REPLICACAO_LOGICA_INTERVALO_SEGUNDOS * 2 ** falhas[destino], OUTBOX_BACKOFF_MAX_SEGUNDOS)
+                proxima_tentativa[destino] = time.monotonic() + espera
+                continue
+            falhas.pop(destino, None)
+            proxima_tentativa.pop(destino, None)
+            if aplicados:
+                print(f"➡ Replicação lógica: {aplicados} linhas aplicadas em {destino}.")
+
+
+_daemon = None
+
+
+def iniciar_daemon_replicacao():
+    """Inicia (uma vez) o daemon numa thread em segundo plano."""
+    global _daemon
+    if _daemon is None:
+        parar = threading.Event()
+        thread = threading.Thread(target=executar_daemon, args=(None, parar), name='replicacao-logica', daemon=True)
+        thread.start()
+        _daemon = (thread, parar)
+
+
+def parar_daemon_replicacao():
+    global _daemon
+    if _daemon is not None:
+        _daemon[1].set()
+        _daemon = None
+
+
+def remover_slots(origem=None):
+    """Remove os slots do líder (um slot abandonado segura WAL indefinidamente)."""
+    origem = origem or LOCAL_SERVERS[0]
+    conn = connect_to_db(origem)
+    if not conn:
+        return
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT pg_drop_replication_slot(slot_name) FROM pg_replication_slots
+            WHERE slot_name LIKE %s AND NOT active
+        """, (f"mlr_{origem.lower()}_para_%",))
+    finally:
+        cursor.close()
+        conn.autocommit = False
+        liberar_conexao(conn)
+
+
+if __name__ == "__main__":
+    # Um daemon por líder: python -m app.replicacao_logica [A|B|C|D]
+    try:
+        executar_daemon(sys.argv[1] if len(sys.argv) > 1 else None)
+    except KeyboardInterrupt:
+        print("\nDaemon de replicação lógica encerrado.")
@@ -0,0 +1,154 @@
+"""
+Registro de saúde dos nós com circuit breaker: um nó que falha SAUDE_FALHAS_PARA_ABRIR conexões
+seguidas tem o circuito aberto, e connect_to_db passa a devolver None na hora para ele, sem
+pagar o connect_timeout a cada matrícula, remoção ou replicação.
+
+Com o circuito aberto, uma sonda em segundo plano tenta conectar ao nó com backoff exponencial
+(SAUDE_SONDA_INICIAL_SEGUNDOS dobrando até SAUDE_SONDA_MAX_SEGUNDOS); quando ele responde, o
+circuito fecha. Sem a sonda rodando (scripts, benchmark), a primeira chamada depois do
+backoff faz o papel de sonda (meio-aberto).
+"""
+import threading
+import time
+import psycopg2
+from app.config import (SERVERS, CONNECT_TIMEOUT, SAUDE_ATIVA, SAUDE_FALHAS_PARA_ABRIR,
+                        SAUDE_SONDA_INICIAL_SEGUNDOS, SAUDE_SONDA_MAX_SEGUNDOS)
+
+FECHADO = 'fechado'
+ABERTO = 'aberto'
+MEIO_ABERTO = 'meio-aberto'
+
+
+class CircuitoNo:
+    """Estado do circuit breaker de UM nó. Todo acesso passa pelo lock do registro."""
+
+    def __init__(self, servidor_id):
+        self.servidor_id = servidor_id
+        self.estado = FECHADO
+        self.falhas_seguidas = 0
+        self.espera = SAUDE_SONDA_INICIAL_SEGUNDOS
+        self.proxima_sondagem = 0.0
+        self.ultimo_erro = None
+        self.stats = {'falhas': 0, 'ignoradas': 0, 'aberturas': 0, 'sondagens': 0}
+
+    def abrir(self, agora):
+        if self.estado != ABERTO:
+            self.stats['aberturas'] += 1
+        self.estado = ABERTO
+        self.proxima_sondagem = agora + self.espera
+        self.espera = min(self.espera * 2, SAUDE_SONDA_MAX_SEGUNDOS)
+
+    def fechar(self):
+        self.estado = FECHADO
+        self.falhas_seguidas = 0
+        self.espera = SAUDE_SONDA_INICIAL_SEGUNDOS
+        self.proxima_sondagem = 0.0
+
+    def resumo(self, agora):
+        proxima = round(max(0.0, self.proxima_sondagem - agora), 1) if self.estado != FECHADO else None
+        return dict(self.stats, estado=self.estado, falhas_seguidas=self.falhas_seguidas,
+                    proxima_sondagem_em=proxima, ultimo_erro=self.ultimo_erro)
+
+
+_circuitos = {}
+_lock = threading.Lock()
+_sonda = None
+
+
+def _circuito(servidor_id):
+    circuito = _circuitos.get(servidor_id)
+    if circuito is None:
+        circuito = _circuitos[servidor_id] = CircuitoNo(servidor_id)
+    return circuito
+
+
+def permitir(servidor_id):
+    """
+    True se uma conexão ao nó deve ser tentada. Com o circuito aberto é False, exceto (sem a
+    sonda em segundo plano) para UMA chamada depois do backoff, que testa o nó.
+    """
+    if not SAUDE_ATIVA:
+        return True
+    with _lock:
+        circuito = _circuito(servidor_id)
+        if circuito.estado == FECHADO:
+            return True
+        if circuito.estado == ABERTO and _sonda is None and time.monotonic() >= circuito.proxima_sondagem:
+            circuito.estado = MEIO_ABERTO
+            circuito.stats['sondagens'] += 1
+            return True
+        circuito.stats['ignoradas'] += 1
+        return False
+
+
+def registrar_sucesso(servidor_id):
+    with _lock:
+        circuito = _circuito(servidor_id)
+        if circuito.estado != FECHADO or circuito.falhas_seguidas:
+            if circuito.estado != FECHADO:
+                print(f"🟢 Líder {servidor_id} voltou a responder: circuito fechado.")
+            circuito.fechar()
+
+
+def registrar_falha(servidor_id, erro):
+    with _lock:
+        circuito = _circuito(servidor_id)
+        circuito.falhas_seguidas += 1
+        circuito.stats['falhas'] += 1
+        circuito.ultimo_erro = str(erro).strip().splitlines()[0] if str(erro).strip() else type(erro).__name__
+        if circuito.estado == MEIO_ABERTO or (circuito.estado == FECHADO and circuito.falhas_seguidas >= SAUDE_FALHAS_PARA_ABRIR):
+            if circuito.estado == FECHADO:
+                print(f"🔴 Líder {servidor_id} falhou {circuito.falhas_seguidas} conexões seguidas: "
+                      f"circuito aberto (chamadas a ele serão ignoradas até voltar).")
+            circuito.abrir(time.monotonic())
+
+
+def estado_circuitos():
+    """{servidor_id: {...}} de todos os nós configurados (serializável em JSON)."""
+    agora = time.monotonic()
+    with _lock:
+        return {servidor_id: _circuito(servidor_id).resumo(agora) for servidor_id in SERVERS}
+
+
+# --- SONDA EM SEGUNDO PLANO ---
+
+def sondar(servidor_id):
+    """Conexão avulsa (fora do pool) só para saber se o nó responde. Atualiza o circuito."""
+    config = {k: v for k, v in SERVERS[servidor_id].items() if k != 'tipo'}
+    try:
+        psycopg2.connect(connect_timeout=CONNECT_TIMEOUT, **config).close()
+    except psycopg2.Error as e:
+        registrar_falha(servidor_id, e)
+        return False
+    registrar_sucesso(servidor_id)
+    return True
+
+
+def _loop_sonda(parar):
+    while not parar.wait(0.5):
+        agora = time.monotonic()
+        with _lock:
+            vencidos = [c.servidor_id for c in _circuitos.values()
+                        if c.estado == ABERTO and agora >= c.proxima_sondagem]
+            for servidor_id in vencidos:
+                _circuitos[servidor_id].estado = MEIO_ABERTO
+                _circuitos[servidor_id].stats['sondagens'] += 1
+        for servidor_id in vencidos:
+            sondar(servidor_id)
+
+
+def iniciar_sonda():
+    """Inicia (uma vez) a thread que sonda os nós com circuito aberto."""
+    global _sonda
+    if _sonda is None and SAUDE_ATIVA:
+        parar = threading.Event()
+        thread = threading.Thread(target=_loop_sonda, args=(parar,), name='sonda-saude', daemon=True)
+        thread.start()
+        _sonda = (thread, parar)
+
+
+def parar_sonda():
+    global _sonda
+    if _sonda is not None:
+        _sonda[1].set()
+        _sonda = None
@@ -1,6 +1,11 @@
-import psycopg2
 from psycopg2 import OperationalError
+from prettytable import PrettyTable
 from app.config import SERVERS 
+from app.config import LOCAL_SERVERS
+from app.conexao import obter_pool, liberar_conexao, estatisticas_pool
+from app.replicacao import profundidade_outbox
+from app.catalogo import estatisticas_catalogo
+from app.saude import estado_circuitos, registrar_sucesso, registrar_falha, FECHADO
 
 
 def verificar_conexao_servidor(servidor_id, config):
@@ -14,15 +19,9 @@ def verificar_conexao_servidor(servidor_id, config):
     conn = None
 
     try:
-        # Tenta estabelecer a conexão com um timeout de 5 segundos
-        conn = psycopg2.connect(
-            host=host,
-            port=port,
-            dbname=config['dbname'],
-            user=config['user'],
-            password=config['password'],
-            connect_timeout=5
-        )
+        # Retira uma conexão do pool do nó (validada na retirada; timeout em CONNECT_TIMEOUT)
+        conn = obter_pool(servidor_id).obter()
+        registrar_sucesso(servidor_id)
         print(f"✅ SUCESSO! Conexão com o Servidor {servidor_id} estabelecida.")
 
         # Teste rápido de consulta para garantir que o banco está operacional
@@ -32,6 +31,7 @@ def verificar_conexao_servidor(servidor_id, config):
         cursor.close()
 
     except OperationalError as e:
+        registrar_falha(servidor_id, e)
         print(f"❌ FALHA! Não foi possível conectar ao Servidor {servidor_id}.")
         print(f"   Detalhes do erro: {e}")
         print("\n   *Possíveis Soluções:*")
@@ -44,8 +44,75 @@ def verificar_conexao_servidor(servidor_id, config):
 
     finally:
         if conn:
-            conn.close()
-            print(f"   Conexão com {servidor_id} fechada.")
+            liberar_conexao(conn)
+            print(f"   Conexão com {servidor_id} devolvida ao pool.")
+
+
+def exibir_estatisticas_pool():
+    """Mostra as estatísticas dos pools de conexão de cada nó."""
+    stats = estatisticas_pool()
+    if not stats:
+        print("Nenhum pool de conexão foi utilizado ainda.")
+        return
+    table = PrettyTable()
+    table.field_names = ["Nó", "Em uso", "Ociosas", "Criadas", "Reutilizadas", "Descartadas", "Falhas", "Esperas", "Esgotamentos"]
+    table.align = "l"
+    for servidor_id, s in stats.items():
+        table.add_row([servidor_id, s['em_uso'], s['ociosas'], s['criadas'], s['reutilizadas'],
+                       s['descartadas'], s['falhas_conexao'], s['esperas'], s['esgotamentos']])
+    print("\n--- Pools de Conexão ---")
+    print(table)
+
+
+def exibir_circuitos():
+    """Mostra o estado do circuit breaker de cada nó (app/saude.py)."""
+    table = PrettyTable()
+    table.field_names = ["Nó", "Circuito", "Falhas Seguidas", "Próxima Sondagem", "Ignoradas", "Aberturas", "Último Erro"]
+    table.align = "l"
+    for servidor_id, c in estado_circuitos().items():
+        circuito = "🟢 fechado" if c['estado'] == FECHADO else f"🔴 {c['estado']}"
+        proxima = "-" if c['proxima_sondagem_em'] is None else f"em {c['proxima_sondagem_em']}s"
+        table.add_row([servidor_id, circuito, c['falhas_seguidas'], proxima, c['ignoradas'], c['aberturas'],
+                       (c['ultimo_erro'] or "-")[:60]])
+    print("\n--- Circuit Breakers (Saúde dos Nós) ---")
+    print(table)
+
+
+def exibir_estatisticas_catalogo():
+    """Mostra o uso do cache do catálogo de disciplinas em cada nó."""
+    stats = estatisticas_catalogo()
+    if not stats:
+        return
+    table = PrettyTable()
+    table.field_names = ["Nó", "Entradas", "Ausentes", "Acertos", "Faltas", "Revalidações", "Invalidações", "Despejos"]
+    table.align = "l"
+    for servidor_id, s in stats.items():
+        table.add_row([servidor_id, s['entradas'], s['ausentes'], s['acertos'], s['faltas'], s['revalidacoes'],
+                       s['invalidacoes'], s['despejos']])
+    print("\n--- Cache do Catálogo de Disciplinas ---")
+    print(table)
+
+
+def exibir_outbox():
+    """Mostra a profundidade da outbox de replicação do líder local, por destino."""
+    lider_local = LOCAL_SERVERS[0]
+    pendentes = profundidade_outbox(lider_local)
+    print(f"\n--- Outbox de Replicação do Líder {lider_local} ---")
+    if pendentes is None:
+        print("❌ Líder local offline: não foi possível ler a outbox.")
+        return
+    if not pendentes:
+        print("✅ Nenhuma replicação pendente.")
+        return
+    table = PrettyTable()
+    table.field_names = ["Destino", "Pendentes", "Mais Antiga", "Tentativas", "Fila Morta", "Último Erro"]
+    table.align = "l"
+    for destino, (qtd, mais_antiga, tentativas, ultimo_erro, mortas) in pendentes.items():
+        table.add_row([destino, qtd, mais_antiga.strftime("%Y-%m-%d %H:%M:%S") if mais_antiga else "-",
+                       tentativas if qtd else "-", mortas, (ultimo_erro or "-")[:60]])
+    print(table)
+    if any(mortas for *_, mortas in pendentes.values()):
+        print("☠️ Há entradas na fila morta: o destino não as recebeu. Rode o heal (opção 10/11) para repará-lo.")
 
 
 def verificar_conexao_menu():
@@ -61,4 +128,8 @@ def verificar_conexao_menu():
     for servidor_id, config in SERVERS.items():
         verificar_conexao_servidor(servidor_id, config)
 
+    exibir_circuitos()
+    exibir_estatisticas_pool()
+    exibir_estatisticas_catalogo()
+    exibir_outbox()
     print("\n*** VERIFICAÇÃO CONCLUÍDA ***")
@@ -1,66 +1,237 @@
+import time
 import psycopg2
+from dataclasses import dataclass
+from prettytable import PrettyTable
+from datetime import datetime, timedelta, timezone
 from psycopg2.extras import execute_values
-from app.config import SERVERS, LOCAL_SERVERS, ALL_SERVERS
-
-def connect_to_db(servidor_id):
-    """Conecta ao banco de dados específico."""
-    config = SERVERS.get(servidor_id)
-    if not config:
-        return None
-    
-    connect_args = {k: v for k, v in config.items() if k != 'tipo'}
-    connect_args['connect_timeout'] = 5
-    
-    try:
-        conn = psycopg2.connect(**connect_args)
-        return conn
-    except psycopg2.OperationalError:
-        return None
+from app.config import (LOCAL_SERVERS, ALL_SERVERS, SYNC_TAMANHO_LOTE, SYNC_MARGEM_SEGUNDOS,
+                        SYNC_VERIFICACAO_COMPLETA_HORAS, SYNC_USAR_MERKLE)
+from app.conexao import connect_to_db, liberar_conexao
+from app.anti_entropia import buckets_divergentes, fetch_data_dos_buckets
+from app.replicacao import executar_em_paralelo
+from app.metricas import cronometrado
+from app.relogio import observar
+from app.migracoes import migrar_servidor
+
+# Colunas e regras de LWW (Last Write Wins) de cada tabela sincronizada
+TABELAS_SYNC = {
+    'disciplinas': {
+        'colunas': ['id', 'nome', 'vagas_totais', 'is_deleted', 'data_ultima_modificacao'], # 5 COLUNAS
+        'ts': 'data_ultima_modificacao',
+        'tombstone': 'deleted_disciplinas',
+        'removido': lambda r: r[3] is True,
+    },
+    'matriculas': {
+        'colunas': ['id', 'disciplina_id', 'nome_aluno', 'timestamp_matricula', 'status', 'data_ultima_modificacao'], # 6 COLUNAS
+        'ts': 'data_ultima_modificacao',
+        'tombstone': 'deleted_matriculas',
+        'removido': lambda r: r[4] == 'REMOVIDA',
+    },
+    'deleted_disciplinas': {
+        'colunas': ['id', 'timestamp'],
+        'ts': 'timestamp',
+        'entidade': 'disciplinas',
+    },
+    'deleted_matriculas': {
+        'colunas': ['id', 'timestamp'],
+        'ts': 'timestamp',
+        'entidade': 'matriculas',
+    },
+}
+
+UUID_MINIMO = '00000000-0000-0000-0000-000000000000'
+INICIO_DOS_TEMPOS = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def query_upsert_lww(tabela):
+    """Query 'INSERT ... ON CONFLICT' (LWW) da tabela, com o placeholder %s do execute_values."""
+    meta = TABELAS_SYNC[tabela]
+    colunas = meta['colunas']
+    update_set = ", ".join(f"{c} = EXCLUDED.{c}" for c in colunas if c != 'id')
+    return f"""
+        INSERT INTO {tabela} ({', '.join(colunas)})
+        VALUES %s
+        ON CONFLICT (id) DO UPDATE SET {update_set}
+        WHERE {tabela}.{meta['ts']} < EXCLUDED.{meta['ts']}
+        RETURNING id;
+    """
 
 def fetch_all_data_from_server(conn, tabela):
     """Busca todos os dados (id e timestamp) de uma tabela."""
     cursor = conn.cursor()
     try:
-        if tabela == 'disciplinas':
-            # Usa data_ultima_modificacao para LWW
-            cursor.execute(f"SELECT id, data_ultima_modificacao FROM {tabela}")
-        elif tabela == 'matriculas':
-            # Usa data_ultima_modificacao para LWW
-            cursor.execute(f"SELECT id, data_ultima_modificacao FROM {tabela}")
-        elif tabela == 'deleted_disciplinas' or tabela == 'deleted_matriculas':
-            cursor.execute(f"SELECT id, timestamp FROM {tabela}")
-        
+        # Usa data_ultima_modificacao (ou timestamp, nos tombstones) para LWW
+        cursor.execute(f"SELECT id, {TABELAS_SYNC[tabela]['ts']} FROM {tabela}")
         return {row[0]: row[1:] for row in cursor.fetchall()}
-    
+
     except psycopg2.Error as e:
         print(f"Erro ao buscar dados da tabela {tabela}: {e}")
         return {}
     finally:
         cursor.close()
 
-def merge_data(conn_local, conn_remoto, tabela, deleted_ids_local=set()):
+def fetch_maior_chegada(conn, tabela):
+    """Maior marca de chegada local (chegada_em) da tabela (None se vazia)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT max(chegada_em) FROM {tabela}")
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+def filtrar_tombstones(cursor, tabela, registros):
     """
-    Executa o "merge" (LWW) dos dados do remoto para o local.
+    LÓGICA ANTI-RESSURREIÇÃO: descarta registros cujo id já tem tombstone no banco de DESTINO
+    (consultado a cada lote, na mesma transação, então enxerga tombstones recém-chegados de outro par).
+    A própria remoção (soft delete) continua passando: ela não ressuscita nada.
     """
-    print(f"🔄 Sincronizando tabela '{tabela}'...")
-    
-    dados_locais = fetch_all_data_from_server(conn_local, tabela)
-    dados_remotos = fetch_all_data_from_server(conn_remoto, tabela)
-    
-    cursor_local = conn_local.cursor()
-    cursor_remoto = conn_remoto.cursor()
-    
+    meta = TABELAS_SYNC[tabela]
+    if 'tombstone' not in meta or not registros:
+        return registros
+    cursor.execute(f"SELECT id FROM {meta['tombstone']} WHERE id = ANY(%s::uuid[])", ([r[0] for r in registros],))
+    removidos = {row[0] for row in cursor.fetchall()}
+    if not removidos:
+        return registros
+    return [r for r in registros if r[0] not in removidos or meta['removido'](r)]
+
+def ler_horizontes_gc(cursor):
+    """
+    {tabela: horizonte} do que o banco do cursor já expurgou (gc_expurgos). Um nó que ainda
+    não recebeu a migração 2 não tem a tabela: nunca expurgou nada, então não há horizonte.
+    """
+    cursor.execute("SELECT to_regclass('gc_expurgos') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return {}
+    cursor.execute("SELECT tabela, ate FROM gc_expurgos")
+    return dict(cursor.fetchall())
+
+def filtrar_expurgados(cursor, tabela, registros, horizontes=None):
+    """
+    Descarta o histórico que o DESTINO já expurgou (app/coleta_tombstones.py): tombstones e
+    linhas removidas até o horizonte de GC do destino só passam se ainda houver lá uma linha
+    com aquele id; e, depois de um expurgo de disciplinas, matrículas cuja disciplina não existe
+    mais no destino são ignoradas (o ON DELETE CASCADE já as levou). Sem isso o heal
+    devolveria o que o GC acabou de apagar, ou falharia na FK.
+    'horizontes' (de ler_horizontes_gc) evita reler gc_expurgos a cada lote; None = lê agora.
+    """
+    meta = TABELAS_SYNC[tabela]
+    if not registros or ('tombstone' not in meta and 'entidade' not in meta):
+        return registros
+    if horizontes is None:
+        horizontes = ler_horizontes_gc(cursor)
+    if not horizontes:
+        return registros
+
+    horizonte = horizontes.get(meta.get('tombstone', tabela))
+    if horizonte is not None:
+        idx_ts = meta['colunas'].index(meta['ts'])
+        antigos = [r[0] for r in registros if r[idx_ts] is not None and r[idx_ts] <= horizonte
+                   and ('removido' not in meta or meta['removido'](r))]
+        if antigos:
+            cursor.execute(f"SELECT id FROM {meta.get('entidade', tabela)} WHERE id = ANY(%s::uuid[])", (antigos,))
+            descartar = set(antigos) - {row[0] for row in cursor.fetchall()}
+            registros = [r for r in registros if r[0] not in descartar]
+
+    if tabela == 'matriculas' and 'deleted_disciplinas' in horizontes and registros:
+        disciplinas = list({r[1] for r in registros})
+        cursor.execute("SELECT id FROM disciplinas WHERE id = ANY(%s::uuid[])", (disciplinas,))
+        existentes = {row[0] for row in cursor.fetchall()}
+        if len(existentes) < len(disciplinas):
+            registros = [r for r in registros if r[1] in existentes]
+    return registros
+
+def aplicar_registros_lww(cursor, tabela, registros, horizontes=None):
+    """
+    Aplica os registros com a regra LWW (respeitando os tombstones e o GC do destino).
+    Retorna quantos realmente mudaram o banco.
+    """
+    registros = filtrar_tombstones(cursor, tabela, registros)
+    registros = filtrar_expurgados(cursor, tabela, registros, horizontes)
+    if not registros:
+        return 0
+    # O relógio híbrido fica à frente de tudo o que o heal/replicação trouxe de outros nós
+    indice_ts = TABELAS_SYNC[tabela]['colunas'].index(TABELAS_SYNC[tabela]['ts'])
+    observar(*(r[indice_ts] for r in registros))
+    # Ordem fixa por id: heals concorrentes travam as linhas na mesma ordem (sem deadlock)
+    registros = sorted(registros, key=lambda r: str(r[0]))
+    return len(execute_values(cursor, query_upsert_lww(tabela), registros, fetch=True))
+
+# --- CHECKPOINTS DE SINCRONIZAÇÃO (high-water marks por par e por tabela) ---
+
+def garantir_tabela_checkpoint(conn):
+    """Cria a tabela de checkpoints em bancos criados antes dela existir no init.sql."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_checkpoints (
+                origem VARCHAR(10) NOT NULL,
+                tabela VARCHAR(50) NOT NULL,
+                ultimo_timestamp TIMESTAMPTZ,
+                ultima_verificacao_completa TIMESTAMPTZ,
+                PRIMARY KEY (origem, tabela)
+            )
+        """)
+        conn.commit()
+    finally:
+        cursor.close()
+
+def ler_checkpoint(conn, origem_id, tabela):
+    """
+    Retorna (ultimo_timestamp, verificacao_completa_vencida) do que este banco já absorveu de 'origem_id'.
+    'ultimo_timestamp' é a maior marca de chegada (chegada_em) do par já absorvida, no relógio do par;
+    é None enquanto a tabela do par estiver vazia. Sem checkpoint, a verificação completa é considerada vencida.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT ultimo_timestamp,
+                   ultima_verificacao_completa IS NULL
+                   OR ultima_verificacao_completa < NOW() - make_interval(hours => %s)
+            FROM sync_checkpoints WHERE origem = %s AND tabela = %s
+        """, (SYNC_VERIFICACAO_COMPLETA_HORAS, origem_id, tabela))
+        row = cursor.fetchone()
+        return (row[0], row[1]) if row else (None, True)
+    finally:
+        cursor.close()
+
+def gravar_checkpoint(cursor, origem_id, tabela, ultimo_timestamp, verificacao_completa=False):
+    """Avança o checkpoint (nunca para trás). Deve rodar na MESMA transação do merge."""
+    cursor.execute("""
+        INSERT INTO sync_checkpoints (origem, tabela, ultimo_timestamp, ultima_verificacao_completa)
+        VALUES (%s, %s, %s, CASE WHEN %s THEN NOW() END)
+        ON CONFLICT (origem, tabela) DO UPDATE SET
+            ultimo_timestamp = GREATEST(sync_checkpoints.ultimo_timestamp, EXCLUDED.ultimo_timestamp),
+            ultima_verificacao_completa = COALESCE(EXCLUDED.ultima_verificacao_completa,
+                                                   sync_checkpoints.ultima_verificacao_completa)
+    """, (origem_id, tabela, ultimo_timestamp, verificacao_completa))
+
+# --- MERGE ---
+
+def _rotulo(conn_destino, conn_origem):
+    """Prefixo das mensagens do merge (os pares sincronizam em paralelo e as linhas se intercalam)."""
+    return f"[{conn_destino.servidor_id} <- {conn_origem.servidor_id}]"
+
+def _merge_completo(conn_local, conn_remoto, tabela, origem_id, horizontes=None):
+    """
+    Compara o conjunto completo de (id, timestamp) dos dois lados. Retorna o nº de registros aplicados.
+    Com SYNC_USAR_MERKLE, as árvores de hash apontam os buckets divergentes e só as chaves deles trafegam.
+    """
+    # Lida ANTES da comparação: o que chegar ao remoto durante ela fica para o próximo incremental
+    maior_chegada_remota = fetch_maior_chegada(conn_remoto, tabela)
+    if SYNC_USAR_MERKLE:
+        prefixos, trafego = buckets_divergentes(conn_local, conn_remoto, tabela)
+        print(f"{_rotulo(conn_local, conn_remoto)} 🌳 Árvore de hash: {len(prefixos)} buckets divergentes (~{trafego / 1024:.1f} KB de digests).")
+        dados_locais = fetch_data_dos_buckets(conn_local, tabela, prefixos)
+        dados_remotos = fetch_data_dos_buckets(conn_remoto, tabela, prefixos)
+    else:
+        dados_locais = fetch_all_data_from_server(conn_local, tabela)
+        dados_remotos = fetch_all_data_from_server(conn_remoto, tabela)
+
     ids_para_sincronizar = []
 
     # 1. Encontrar dados que o Remoto tem e o Local não, ou que são mais novos no Remoto
     for uuid, dados_remotos_ts_tuple in dados_remotos.items():
-        
-        # LÓGICA ANTI-RESSURREIÇÃO (Ignora se o item foi deletado localmente)
-        if uuid in deleted_ids_local:
-            continue 
-
         dados_locais_ts_tuple = dados_locais.get(uuid)
-        
+
         # Pega o timestamp (é o primeiro item da tupla)
         dados_remotos_ts = dados_remotos_ts_tuple[0]
         dados_locais_ts = dados_locais_ts_tuple[0] if dados_locais_ts_tuple else None
@@ -69,84 +240,174 @@ def merge_data(conn_local, conn_remoto, tabela, deleted_ids_local=set()):
         if (uuid not in dados_locais) or (dados_remotos_ts > dados_locais_ts):
             ids_para_sincronizar.append(uuid)
 
-    if not ids_para_sincronizar:
-        print(f"✅ Tabela '{tabela}' já está sincronizada.")
+    cursor_local = conn_local.cursor()
+    cursor_remoto = conn_remoto.cursor()
+    try:
+        aplicados = 0
+        if ids_para_sincronizar:
+            print(f"{_rotulo(conn_local, conn_remoto)} Merging {len(ids_para_sincronizar)} registros da tabela '{tabela}'...")
+            # 2. Buscar os dados completos dos IDs selecionados do Remoto
+            colunas = ', '.join(TABELAS_SYNC[tabela]['colunas'])
+            cursor_remoto.execute(f"SELECT {colunas} FROM {tabela} WHERE id = ANY(%s::uuid[])", (ids_para_sincronizar,))
+            registros_completos = cursor_remoto.fetchall()
+
+            # 3. Aplicar no banco Local usando "INSERT ... ON CONFLICT" (ignora ids com tombstone local)
+            aplicados = aplicar_registros_lww(cursor_local, tabela, registros_completos, horizontes)
+
+        if origem_id:
+            # Tabela remota vazia: grava o checkpoint sem timestamp (o próximo heal já é incremental)
+            gravar_checkpoint(cursor_local, origem_id, tabela, maior_chegada_remota, verificacao_completa=True)
+        conn_local.commit()
+        return aplicados
+    finally:
         cursor_local.close()
         cursor_remoto.close()
-        return
 
-    print(f"Merging {len(ids_para_sincronizar)} registros da tabela '{tabela}'...")
+def _merge_incremental(conn_local, conn_remoto, tabela, origem_id, desde, horizontes=None):
+    """
+    Puxa do remoto apenas o que chegou a ele desde o checkpoint, em lotes ordenados por (chegada_em, id).
+    A varredura segue a marca de chegada local do remoto, não o timestamp LWW de quem escreveu:
+    uma linha antiga que o remoto só recebeu agora (replicação atrasada, heal com outro par) também vem.
+    Cada lote é aplicado e o checkpoint avançado na mesma transação: um heal interrompido
+    recomeça do último lote salvo. A margem cobre transações que commitaram fora de ordem.
+    """
+    meta = TABELAS_SYNC[tabela]
+    colunas = ', '.join(meta['colunas'])
+    cursor_ts, cursor_id = desde - timedelta(seconds=SYNC_MARGEM_SEGUNDOS), UUID_MINIMO
+    total = 0
 
-    # 2. Buscar os dados completos dos IDs selecionados do Remoto
+    cursor_local = conn_local.cursor()
+    cursor_remoto = conn_remoto.cursor()
     try:
-        # Define as colunas e regras de update para cada tabela
-        if tabela == 'disciplinas':
-            cursor_remoto.execute(f"SELECT * FROM disciplinas WHERE id = ANY(%s::uuid[])", (ids_para_sincronizar,))
-            colunas_query = "(id, nome, vagas_totais, is_deleted, data_ultima_modificacao)" # 5 COLUNAS
-            update_set = """
-                nome = EXCLUDED.nome, 
-                vagas_totais = EXCLUDED.vagas_totais, 
-                is_deleted = EXCLUDED.is_deleted, 
-                data_ultima_modificacao = EXCLUDED.data_ultima_modificacao
-            """
-            update_where = "disciplinas.data_ultima_modificacao < EXCLUDED.data_ultima_modificacao"
-            
-        elif tabela == 'matriculas':
-            cursor_remoto.execute(f"SELECT * FROM matriculas WHERE id = ANY(%s::uuid[])", (ids_para_sincronizar,))
-            colunas_query = "(id, disciplina_id, nome_aluno, timestamp_matricula, status, data_ultima_modificacao)" # 6 COLUNAS
-            update_set = """
-                disciplina_id = EXCLUDED.disciplina_id, 
-                nome_aluno = EXCLUDED.nome_aluno, 
-                timestamp_matricula = EXCLUDED.timestamp_matricula, 
-                status = EXCLUDED.status, 
-                data_ultima_modificacao = EXCLUDED.data_ultima_modificacao
-            """
-            update_where = "matriculas.data_ultima_modificacao < EXCLUDED.data_ultima_modificacao"
-        
-        elif tabela == 'deleted_disciplinas' or tabela == 'deleted_matriculas':
-            cursor_remoto.execute(f"SELECT * FROM {tabela} WHERE id = ANY(%s::uuid[])", (ids_para_sincronizar,))
-            colunas_query = "(id, timestamp)"
-            update_set = "timestamp = EXCLUDED.timestamp"
-            update_where = f"{tabela}.timestamp < EXCLUDED.timestamp"
-
-        registros_completos = cursor_remoto.fetchall()
-
-        # 3. Aplicar no banco Local usando "INSERT ... ON CONFLICT"
-        if registros_completos:
-            
-            # Query unificada que usa o 'placeholder %s' para execute_values
-            query = f"""
-                INSERT INTO {tabela} {colunas_query}
-                VALUES %s 
-                ON CONFLICT (id) DO UPDATE SET {update_set}
-                WHERE {update_where};
-            """
-            
-            execute_values(cursor_local, query, registros_completos)
+        while True:
+            cursor_remoto.execute(f"""
+                SELECT {colunas}, chegada_em FROM {tabela}
+                WHERE (chegada_em, id) > (%s, %s::uuid)
+                ORDER BY chegada_em, id
+                LIMIT %s
+            """, (cursor_ts, cursor_id, SYNC_TAMANHO_LOTE))
+            lote = cursor_remoto.fetchall()
+            if not lote:
+                break
+            cursor_ts, cursor_id = lote[-1][-1], lote[-1][0]
+
+            aplicados = aplicar_registros_lww(cursor_local, tabela, [r[:-1] for r in lote], horizontes)
+            gravar_checkpoint(cursor_local, origem_id, tabela, cursor_ts)
             conn_local.commit()
-            print(f"✅ Merge da tabela '{tabela}' concluído.")
+            total += aplicados
 
-    except Exception as e:
-        conn_local.rollback()
-        print(f"❌ ERRO durante o merge da tabela '{tabela}': {e}")
+            if len(lote) < SYNC_TAMANHO_LOTE:
+                break
+        return total
     finally:
         cursor_local.close()
         cursor_remoto.close()
 
-def fetch_deleted_ids(conn, tabela_tombstone):
-    """Busca todos os IDs da tabela de deleção."""
-    cursor = conn.cursor()
+def _rotulos_merge(conn_local, conn_remoto, tabela, *args, **kwargs):
+    return {'no': conn_local.servidor_id, 'origem': conn_remoto.servidor_id, 'tabela': tabela}
+
+@cronometrado('merge_data', _rotulos_merge)
+def merge_data(conn_local, conn_remoto, tabela, origem_id=None, verificacao_completa=False, horizontes=None):
+    """
+    Executa o "merge" (LWW) dos dados do remoto para o local.
+    Com 'origem_id' (o nó remoto), usa o checkpoint salvo no banco local e puxa apenas o delta;
+    a comparação completa roda sem checkpoint, quando pedida ou quando a verificação periódica vence.
+    'horizontes': os de ler_horizontes_gc do banco local, lidos uma vez por heal.
+    Retorna o número de registros aplicados.
+    """
+    rotulo = _rotulo(conn_local, conn_remoto)
+    print(f"{rotulo} 🔄 Sincronizando tabela '{tabela}'...")
+
     try:
-        cursor.execute(f"SELECT id FROM {tabela_tombstone}")
-        return {row[0] for row in cursor.fetchall()}
-    except psycopg2.Error:
-        return set()
+        desde, vencida = ler_checkpoint(conn_local, origem_id, tabela) if origem_id else (None, True)
+        if vencida or verificacao_completa:
+            aplicados = _merge_completo(conn_local, conn_remoto, tabela, origem_id, horizontes)
+            modo = "completo"
+        else:
+            desde = desde or INICIO_DOS_TEMPOS
+            aplicados = _merge_incremental(conn_local, conn_remoto, tabela, origem_id, desde, horizontes)
+            modo = f"incremental desde {desde:%Y-%m-%d %H:%M:%S}"
+    except Exception as e:
+        # O remoto também pode ter ficado numa transação abortada (ex.: erro na leitura do lote)
+        for conn in (conn_local, conn_remoto):
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+        print(f"{rotulo} ❌ ERRO durante o merge da tabela '{tabela}': {e}")
+        return 0
+
+    if aplicados:
+        print(f"{rotulo} ✅ Merge da tabela '{tabela}' concluído: {aplicados} registros ({modo}).")
+    else:
+        print(f"{rotulo} ✅ Tabela '{tabela}' já está sincronizada ({modo}).")
+    return aplicados
+
+@dataclass
+class ResumoSincronizacao:
+    """Resultado do heal bidirecional com UM par."""
+    servidor_id: str
+    status: str = "✅ OK"
+    puxados: int = 0
+    empurrados: int = 0
+    duracao_puxar: float = 0.0
+    duracao_empurrar: float = 0.0
+
+# Ordem por direção: tombstones antes das entidades, disciplinas antes de matrículas (FK)
+ORDEM_SYNC = ['deleted_disciplinas', 'deleted_matriculas', 'disciplinas', 'matriculas']
+
+def _sincronizar_direcao(conn_destino, conn_origem, verificacao_completa):
+    inicio = time.perf_counter()
+    cursor = conn_destino.cursor()
+    try:
+        horizontes = ler_horizontes_gc(cursor)
+        conn_destino.commit()
     finally:
         cursor.close()
+    aplicados = sum(merge_data(conn_destino, conn_origem, tabela, origem_id=conn_origem.servidor_id,
+                               verificacao_completa=verificacao_completa, horizontes=horizontes)
+                    for tabela in ORDEM_SYNC)
+    return aplicados, time.perf_counter() - inicio
+
+def sincronizar_com_par(remoto_id, lider_local_id, verificacao_completa=False):
+    """
+    Heal bidirecional com UM par, com conexões próprias (roda em paralelo com os outros pares).
+    Retorna um ResumoSincronizacao.
+    """
+    resumo = ResumoSincronizacao(remoto_id)
+    # Um par que estava offline quando o app migrou os líderes recebe as migrações agora,
+    # antes de o heal gravar nele (o incremental depende da coluna chegada_em da migração 5)
+    migrar_servidor(remoto_id)
+    conn_remoto = connect_to_db(remoto_id)
+    if not conn_remoto:
+        resumo.status = "⚠️ OFFLINE"
+        return resumo
+    conn_local = connect_to_db(lider_local_id)
+    if not conn_local:
+        liberar_conexao(conn_remoto)
+        resumo.status = f"❌ Local {lider_local_id} offline"
+        return resumo
+
+    try:
+        garantir_tabela_checkpoint(conn_remoto)
+        # 1. Puxar dados do Remoto (ex: B) para o Local (ex: A)
+        resumo.puxados, resumo.duracao_puxar = _sincronizar_direcao(conn_local, conn_remoto, verificacao_completa)
+        # 2. Empurrar dados do Local (ex: A) para o Remoto (ex: B)
+        resumo.empurrados, resumo.duracao_empurrar = _sincronizar_direcao(conn_remoto, conn_local, verificacao_completa)
+    except Exception as e:
+        resumo.status = f"❌ Erro: {e}"
+    finally:
+        liberar_conexao(conn_remoto)
+        liberar_conexao(conn_local)
+    return resumo
+
+def sincronizar_ao_iniciar(verificacao_completa=False):
+    """
+    Função principal de "cura" (healing) para ser chamada pelo main.py.
+    Sincroniza com todos os pares ao mesmo tempo; em cada par, a ordem das tabelas é preservada.
+    Por padrão é incremental (checkpoints); 'verificacao_completa' força a comparação de todas as chaves.
+    """
 
-def sincronizar_ao_iniciar():
-    """Função principal de "cura" (healing) para ser chamada pelo main.py."""
-    
     print("\n" + "="*50)
     print("INICIANDO PROCESSO DE SINCRONIZAÇÃO (HEALING)")
     print("="*50)
@@ -158,54 +419,23 @@ def sincronizar_ao_iniciar():
     if not conn_local:
         print(f"❌ Falha crítica: Não foi possível conectar ao banco de dados local ({lider_local_id}). Sincronização abortada.")
         return
+    try:
+        garantir_tabela_checkpoint(conn_local)
+    finally:
+        liberar_conexao(conn_local)
+
+    inicio = time.perf_counter()
+    resumos = executar_em_paralelo(lideres_remotos_ids, sincronizar_com_par, lider_local_id, verificacao_completa)
+    duracao_total = time.perf_counter() - inicio
 
-    # Busca os IDs deletados localmente ANTES de sincronizar
-    deleted_disciplinas_local = fetch_deleted_ids(conn_local, 'deleted_disciplinas')
-    deleted_matriculas_local = fetch_deleted_ids(conn_local, 'deleted_matriculas')
-
-    for remoto_id in lideres_remotos_ids:
-        print(f"\n--- Tentando sincronizar com o Líder {remoto_id} ---")
-        conn_remoto = connect_to_db(remoto_id)
-        
-        if not conn_remoto:
-            print(f"⚠️ Líder {remoto_id} está OFFLINE. Pulando sincronização.")
-            continue
-
-        deleted_disciplinas_remoto = fetch_deleted_ids(conn_remoto, 'deleted_disciplinas')
-        deleted_matriculas_remoto = fetch_deleted_ids(conn_remoto, 'deleted_matriculas')
-            
-        try:
-            # Sincronização Bi-Direcional:
-            
-            # 1. Puxar dados do Remoto (ex: B) para o Local (ex: A)
-            print(f"\n[{lider_local_id} <- {remoto_id}] Puxando dados do {remoto_id} para {lider_local_id}...")
-            # Sincroniza deleções primeiro
-            merge_data(conn_local, conn_remoto, 'deleted_disciplinas') 
-            merge_data(conn_local, conn_remoto, 'deleted_matriculas')
-            
-            merge_data(conn_local, conn_remoto, 'disciplinas', deleted_ids_local=deleted_disciplinas_local)
-            merge_data(conn_local, conn_remoto, 'matriculas', deleted_ids_local=deleted_matriculas_local)
-            
-            # 2. Empurrar dados do Local (ex: A) para o Remoto (ex: B)
-            print(f"\n[{lider_local_id} -> {remoto_id}] Empurrando dados do {lider_local_id} para {remoto_id}...")
-            # Sincroniza deleções primeiro
-            merge_data(conn_remoto, conn_local, 'deleted_disciplinas') 
-            merge_data(conn_remoto, conn_local, 'deleted_matriculas')
-
-            merge_data(conn_remoto, conn_local, 'disciplinas', deleted_ids_local=deleted_disciplinas_remoto)
-            merge_data(conn_remoto, conn_local, 'matriculas', deleted_ids_local=deleted_matriculas_remoto)
-            
-            print(f"\n✅ Sincronização com {remoto_id} concluída.")
-
-        except Exception as e:
-            print(f"❌ Erro inesperado durante a sincronização com {remoto_id}: {e}")
-        finally:
-            if conn_remoto:
-                conn_remoto.close()
-
-    if conn_local:
-        conn_local.close()
-        
+    table = PrettyTable()
+    table.field_names = ["Par", "Status", f"Puxados ({lider_local_id} <- par)", f"Empurrados ({lider_local_id} -> par)", "Tempo Puxar", "Tempo Empurrar"]
+    table.align = "l"
+    for resumo in resumos.values():
+        table.add_row([resumo.servidor_id, resumo.status, resumo.puxados, resumo.empurrados,
+                       f"{resumo.duracao_puxar:.2f}s", f"{resumo.duracao_empurrar:.2f}s"])
+    print(table)
+
+    print("="*50)
+    print(f"SINCRONIZAÇÃO CONCLUÍDA em {duracao_total:.2f}s")
     print("="*50)
-    print("SINCRONIZAÇÃO CONCLUÍDA")
-    print("="*50)
\ No newline at end of file
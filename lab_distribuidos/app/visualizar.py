@@ -1,69 +1,180 @@
+import csv
+import json
+import os
+import time
 import psycopg2
-from app.config import SERVERS, LOCAL_SERVERS 
+from app.config import LOCAL_SERVERS
+from app.conexao import connect_to_db, liberar_conexao
 from prettytable import PrettyTable
-from collections import defaultdict
 from datetime import timezone
 
-def connect_to_db(servidor_id):
-    config = SERVERS.get(servidor_id)
-    if not config: return None
-    connect_args = {k: v for k, v in config.items() if k != 'tipo'}
-    connect_args['connect_timeout'] = 5
+# Matrículas por página na tela (cada página é uma consulta curta por keyset, sem transação aberta)
+TAMANHO_PAGINA = 50
+# Linhas por ida ao servidor do cursor nomeado usado na exportação
+LINHAS_POR_LOTE = 2000
+
+COLUNAS_EXPORTACAO = ["matricula_id", "disciplina_id", "disciplina", "vagas_totais", "aluno", "timestamp_matricula", "status"]
+
+
+def _consulta_matriculas(disciplina=None, aluno=None, apos=None, limite=None):
+    """
+    Monta a consulta de matrículas ativas, ordenada por (disciplina, id da disciplina, timestamp, id).
+    'disciplina' filtra pelo nome exato, 'aluno' por trecho do nome (sem diferenciar maiúsculas).
+    'apos' é a chave da última linha já lida (keyset): a consulta continua a partir dela.
+    """
+    filtros = ["m.status != 'REMOVIDA'", "(d.is_deleted IS NULL OR d.is_deleted = false)"]
+    params = []
+    if disciplina:
+        filtros.append("d.nome = %s")
+        params.append(disciplina)
+    if aluno:
+        filtros.append("m.nome_aluno ILIKE %s")
+        params.append(f"%{aluno}%")
+    if apos:
+        filtros.append("(d.nome, d.id, m.timestamp_matricula, m.id) > (%s, %s::uuid, %s, %s::uuid)")
+        params.extend(apos)
+    query = f"""
+        SELECT
+            m.id AS matricula_uuid, d.id AS disciplina_uuid, d.nome AS disciplina,
+            d.vagas_totais, m.nome_aluno,
+            m.timestamp_matricula, m.status
+        FROM matriculas m
+        JOIN disciplinas d ON m.disciplina_id = d.id
+        WHERE {' AND '.join(filtros)}
+        ORDER BY d.nome, d.id, m.timestamp_matricula, m.id
+    """
+    if limite:
+        query += " LIMIT %s"
+        params.append(limite)
+    return query, params
+
+
+def paginas_de_matriculas(conn, disciplina=None, aluno=None, tamanho_pagina=TAMANHO_PAGINA):
+    """Gera as matrículas página a página (keyset). Entre as páginas nenhuma transação fica aberta."""
+    apos = None
+    while True:
+        query, params = _consulta_matriculas(disciplina, aluno, apos, tamanho_pagina)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            pagina = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.rollback()
+        if not pagina:
+            return
+        yield pagina
+        ultima = pagina[-1]
+        apos = (ultima[2], ultima[1], ultima[5], ultima[0])
+        if len(pagina) < tamanho_pagina:
+            return
+
+
+def _formatar_timestamp(timestamp_db):
+    timestamp_utc = timestamp_db.replace(tzinfo=timezone.utc)
+    timestamp_local = timestamp_utc.astimezone(None)
+    return timestamp_local.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _imprimir_pagina(pagina, disciplina_anterior):
+    """Imprime a página agrupada por disciplina. Retorna a última disciplina impressa."""
+    table = None
+    for matricula_uuid, disciplina_uuid, disciplina_nome, vagas, aluno, timestamp_db, status in pagina:
+        if disciplina_uuid != disciplina_anterior:
+            if table:
+                print(table)
+            print(f"\nDisciplina: {disciplina_nome} (Vagas Totais: {vagas})")
+            disciplina_anterior = disciplina_uuid
+            table = None
+        if table is None:
+            table = PrettyTable()
+            table.field_names = ["ID Matrícula (UUID)", "Aluno", "Data/Hora Matrícula", "Status Real"]
+            table.align = "l"
+        table.add_row([matricula_uuid, aluno, _formatar_timestamp(timestamp_db), status])
+    if table:
+        print(table)
+    return disciplina_anterior
+
+
+def listar_matriculas(servidor_id, disciplina=None, aluno=None, interativo=True):
+    """Lista as matrículas do nó na tela, uma página por vez (Enter = próxima, 'q' = parar)."""
+    conn = connect_to_db(servidor_id)
+    if not conn:
+        print(f"\n=== Servidor: {servidor_id} ===")
+        print("❌ Servidor inacessível ou offline.")
+        return
+    print(f"\n=== Matrículas (Ativas e Espera) no Servidor: {servidor_id} ===")
     try:
-        conn = psycopg2.connect(**connect_args)
-        return conn
-    except psycopg2.OperationalError:
+        total = 0
+        disciplina_anterior = None
+        for numero, pagina in enumerate(paginas_de_matriculas(conn, disciplina, aluno), start=1):
+            if numero > 1 and interativo:
+                if input(f"-- {total} matrículas exibidas. Enter para a próxima página, 'q' para parar: ").strip().lower() == 'q':
+                    return
+            disciplina_anterior = _imprimir_pagina(pagina, disciplina_anterior)
+            total += len(pagina)
+        if total == 0:
+            print("Nenhuma matrícula encontrada nesta base de dados.")
+        else:
+            print(f"-- Fim da listagem: {total} matrículas.")
+    except psycopg2.Error as e:
+        print(f"❌ Erro SQL ao consultar matrículas em {servidor_id}: {e}")
+    finally:
+        liberar_conexao(conn)
+
+
+def exportar_matriculas(servidor_id, caminho, disciplina=None, aluno=None):
+    """
+    Exporta as matrículas do nó para CSV ou JSONL (pela extensão do arquivo), gravando cada
+    linha assim que ela chega do cursor nomeado: o conjunto nunca fica inteiro em memória.
+    Retorna o número de linhas exportadas (None em caso de falha).
+    """
+    conn = connect_to_db(servidor_id)
+    if not conn:
+        print(f"❌ Exportação falhou: Servidor {servidor_id} inacessível ou offline.")
         return None
+    inicio = time.perf_counter()
+    jsonl = caminho.endswith(('.jsonl', '.json'))
+    total = 0
+    cursor = conn.cursor(name='exportar_matriculas')
+    cursor.itersize = LINHAS_POR_LOTE
+    try:
+        with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+            escritor = None if jsonl else csv.writer(arquivo)
+            if escritor:
+                escritor.writerow(COLUNAS_EXPORTACAO)
+            query, params = _consulta_matriculas(disciplina, aluno)
+            cursor.execute(query, params)
+            for row in cursor:
+                valores = list(row)
+                valores[5] = valores[5].isoformat() if valores[5] else None
+                if jsonl:
+                    arquivo.write(json.dumps(dict(zip(COLUNAS_EXPORTACAO, valores)), ensure_ascii=False) + "\n")
+                else:
+                    escritor.writerow(valores)
+                total += 1
+        duracao = time.perf_counter() - inicio
+        print(f"✅ {total} matrículas de {servidor_id} exportadas para {caminho} em {duracao:.2f}s.")
+        return total
+    except (psycopg2.Error, OSError) as e:
+        print(f"❌ Erro na exportação de {servidor_id}: {e}")
+        return None
+    finally:
+        cursor.close()
+        liberar_conexao(conn)
+
 
 def visualizar_alunos():
     print("\n--- Opção 5: Visualização de Matrículas (Modo Diagnóstico) ---")
+    disciplina = input("Filtrar por disciplina (nome exato, Enter = todas): ").strip() or None
+    aluno = input("Filtrar por aluno (trecho do nome, Enter = todos): ").strip() or None
+    caminho = input("Exportar para arquivo .csv/.jsonl (Enter = exibir na tela): ").strip()
+
     for servidor_id in LOCAL_SERVERS:
-        conn = connect_to_db(servidor_id)
-        if conn:
-            cursor = conn.cursor()
-            try:
-                
-                cursor.execute("""
-                    SELECT 
-                        m.id AS matricula_uuid, d.nome AS disciplina,
-                        d.vagas_totais, m.nome_aluno, 
-                        m.timestamp_matricula, m.status
-                    FROM matriculas m
-                    JOIN disciplinas d ON m.disciplina_id = d.id
-                    WHERE m.status != 'REMOVIDA' 
-                      AND (d.is_deleted IS NULL OR d.is_deleted = false)
-                    ORDER BY d.nome, m.timestamp_matricula; 
-                """)
-                rows = cursor.fetchall()
-                print(f"\n=== Todas as Matrículas (Ativas e Espera) no Servidor: {servidor_id} ===")
-                if not rows:
-                    print("Nenhuma matrícula encontrada nesta base de dados.")
-                    continue
-
-                disciplinas_data = defaultdict(list)
-                disciplinas_vagas = {}
-                for matricula_uuid, disciplina_nome, vagas, aluno, timestamp_db, status in rows:
-                    disciplinas_data[disciplina_nome].append((matricula_uuid, aluno, timestamp_db, status))
-                    disciplinas_vagas[disciplina_nome] = vagas
-
-                for disciplina_nome in sorted(disciplinas_data.keys()):
-                    vagas = disciplinas_vagas[disciplina_nome]
-                    alunos_total = len(disciplinas_data[disciplina_nome])
-                    print(f"\nDisciplina: {disciplina_nome} (Vagas Totais: {vagas}, Total de Entradas: {alunos_total})")
-                    table = PrettyTable()
-                    table.field_names = ["ID Matrícula (UUID)", "Aluno", "Data/Hora Matrícula", "Status Real"]
-                    table.align = "l"
-                    for matricula_uuid, aluno, timestamp_db, status in disciplinas_data[disciplina_nome]:
-                        timestamp_utc = timestamp_db.replace(tzinfo=timezone.utc)
-                        timestamp_local = timestamp_utc.astimezone(None)
-                        ts_str = timestamp_local.strftime("%Y-%m-%d %H:%M:%S")
-                        table.add_row([matricula_uuid, aluno, ts_str, status])
-                    print(table)
-            except psycopg2.Error as e:
-                print(f"❌ Erro SQL ao consultar matrículas em {servidor_id}: {e}")
-            finally:
-                if cursor: cursor.close()
-                if conn: conn.close()
+        if caminho:
+            # Com mais de um nó local, cada um vai para o próprio arquivo
+            destino = caminho if len(LOCAL_SERVERS) == 1 else os.path.join(
+                os.path.dirname(caminho), f"{servidor_id}_{os.path.basename(caminho)}")
+            exportar_matriculas(servidor_id, destino, disciplina, aluno)
         else:
-            print(f"\n=== Servidor: {servidor_id} ===")
-            print("❌ Servidor inacessível ou offline.")
\ No newline at end of file
+            listar_matriculas(servidor_id, disciplina, aluno)
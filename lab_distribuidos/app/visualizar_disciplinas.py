@@ -1,35 +1,29 @@
 import psycopg2
-from app.config import SERVERS, ALL_SERVERS 
+from app.config import ALL_SERVERS
+from app.conexao import connect_to_any_db, liberar_conexao
 from prettytable import PrettyTable
 
-def connect_to_any_db(servidores_ids):
-    for servidor_id in servidores_ids:
-        config = SERVERS.get(servidor_id)
-        if not config: continue
-        connect_args = {k: v for k, v in config.items() if k != 'tipo'}
-        connect_args['connect_timeout'] = 3 
-        try:
-            conn = psycopg2.connect(**connect_args)
-            return conn, servidor_id
-        except psycopg2.OperationalError:
-            continue
-    return None, None
-
-def visualizar_disciplinas():
-    conn, servidor_id = connect_to_any_db(ALL_SERVERS)
-    if not conn:
-        print("\n❌ Não foi possível conectar a nenhum servidor para visualizar disciplinas.")
-        return
+def listar_disciplinas(conn):
+    """[(id, nome, vagas_totais)] das disciplinas ativas, em ordem de nome."""
     cursor = conn.cursor()
     try:
-        
         cursor.execute("""
             SELECT id, nome, vagas_totais 
             FROM disciplinas 
             WHERE (is_deleted IS NULL OR is_deleted = false) 
             ORDER BY nome;
         """)
-        rows = cursor.fetchall()
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def visualizar_disciplinas():
+    conn, servidor_id = connect_to_any_db(ALL_SERVERS)
+    if not conn:
+        print("\n❌ Não foi possível conectar a nenhum servidor para visualizar disciplinas.")
+        return
+    try:
+        rows = listar_disciplinas(conn)
         if not rows:
             print("Nenhuma disciplina encontrada no catálogo.")
             return
@@ -44,5 +38,4 @@ def visualizar_disciplinas():
     except psycopg2.Error as e:
         print(f"❌ Erro SQL ao buscar disciplinas: {e}")
     finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
\ No newline at end of file
+        liberar_conexao(conn)
\ No newline at end of file
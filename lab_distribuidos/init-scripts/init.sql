@@ -26,4 +26,44 @@ CREATE TABLE IF NOT EXISTS deleted_disciplinas (
 CREATE TABLE IF NOT EXISTS deleted_matriculas (
     id UUID PRIMARY KEY,
     timestamp TIMESTAMPTZ DEFAULT (NOW() AT TIME ZONE 'UTC')
-);
\ No newline at end of file
+);
+-- Checkpoints do heal incremental: até onde este nó já absorveu as mudanças de cada par
+CREATE TABLE IF NOT EXISTS sync_checkpoints (
+    origem VARCHAR(10) NOT NULL,
+    tabela VARCHAR(50) NOT NULL,
+    ultimo_timestamp TIMESTAMPTZ,  -- maior 'chegada_em' do par já absorvido (migração 5)
+    ultima_verificacao_completa TIMESTAMPTZ,
+    PRIMARY KEY (origem, tabela)
+);
+
+-- Outbox de replicação: operações ainda não confirmadas por cada líder de destino
+CREATE TABLE IF NOT EXISTS replicacao_pendente (
+    seq BIGSERIAL PRIMARY KEY,
+    destino VARCHAR(10) NOT NULL,
+    operacoes JSONB NOT NULL,
+    criado_em TIMESTAMPTZ DEFAULT NOW(),
+    tentativas INT DEFAULT 0,
+    ultimo_erro TEXT,
+    morta_em TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS idx_replicacao_pendente_destino ON replicacao_pendente (destino, seq);
+
+-- Versões do esquema aplicadas por app/migracoes.py (índices e demais mudanças pós-init)
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    versao INT PRIMARY KEY,
+    descricao TEXT NOT NULL,
+    aplicada_em TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Coleta de tombstones (app/coleta_tombstones.py): confirmações dos pares e horizonte de expurgo
+CREATE TABLE IF NOT EXISTS tombstones_confirmados (
+    par VARCHAR(10) NOT NULL,
+    tabela VARCHAR(50) NOT NULL,
+    ate TIMESTAMPTZ NOT NULL,
+    ate_id UUID NOT NULL,
+    PRIMARY KEY (par, tabela)
+);
+CREATE TABLE IF NOT EXISTS gc_expurgos (
+    tabela VARCHAR(50) PRIMARY KEY,
+    ate TIMESTAMPTZ NOT NULL
+);
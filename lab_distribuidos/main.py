@@ -1,14 +1,25 @@
 try:
-    from app.adicionar_disciplina import adicionar_disciplina 
+    from app.adicionar_disciplina import adicionar_disciplina, importar_catalogo_menu
     from app.remover_disciplina import remover_disciplina 
     from app.matricular import matricular_aluno_menu
     from app.visualizar_disciplinas import visualizar_disciplinas
-    from app.relatorio_consolidado import gerar_relatorio 
+    from app.relatorio_consolidado import gerar_relatorio, gerar_relatorio_cluster
     from app.consultar_estado import consultar_estado
     from app.remover import remover_matricula_menu 
     from app.visualizar import visualizar_alunos 
     from app.setup_database import verificar_conexao_menu 
     from app.sincronizacao import sincronizar_ao_iniciar ### NOVO ###
+    from app.conexao import fechar_pools
+    from app.replicacao import iniciar_drenador, parar_drenador, aguardar_entregas
+    from app.config import LOCAL_SERVERS, REPLICACAO_LOGICA_ATIVA, METRICAS_PORTA
+    from app.replicacao_logica import iniciar_daemon_replicacao, parar_daemon_replicacao
+    from app.anti_entropia import verificar_divergencias
+    from app.migracoes import aplicar_migracoes
+    from app.matricula_em_lote import matricular_em_lote_menu
+    from app.metricas import exibir_metricas, iniciar_servidor_metricas, parar_servidor_metricas
+    from app.relogio import semear_relogio
+    from app.coleta_tombstones import coletar_tombstones
+    from app.saude import iniciar_sonda, parar_sonda
 except ImportError as e:
     print(f"❌ ERRO GRAVE DE IMPORTAÇÃO: O módulo não foi encontrado ou a função não existe.")
     print(f"Detalhe: {e}. Verifique se a função principal existe em seu respectivo arquivo, e se app/config.py e app/__init__.py estão no lugar.")
@@ -29,14 +40,36 @@ def exibir_menu():
     print("8.  Consultar Estado Detalhado")
     print("9.  Verificar Conexões de DB")
     print("10. Forçar Sincronização Manual (Heal)") 
+    print("11. Sincronização com Verificação Completa")
+    print("12. Verificar Divergências (Anti-Entropia)")
+    print("13. Aplicar Migrações de Esquema")
+    print("14. Matrícula em Lote (CSV/JSONL)")
+    print("15. Importar Catálogo de Disciplinas (CSV/JSONL)")
+    print("16. Relatório de Ocupação do Cluster (Todos os Líderes)")
+    print("17. Métricas de Desempenho (Latências por Operação/Nó)")
+    print("18. Coletar Tombstones (GC)")
     print("-" * 50)
     print("0. Sair")
     print("="*50)
 
 def main():
     
+    # Endpoint /metrics no formato do Prometheus (opcional)
+    if METRICAS_PORTA:
+        iniciar_servidor_metricas(METRICAS_PORTA)
+    # Leva o esquema de todos os líderes online para a versão mais recente
+    aplicar_migracoes()
     # ### NOVO ###: Executa a sincronização uma vez ao iniciar o app
     sincronizar_ao_iniciar() 
+    # O relógio híbrido parte do maior timestamp já gravado no nó local
+    semear_relogio()
+    # Sonda em segundo plano os líderes com circuito aberto (fecha quando voltam)
+    iniciar_sonda()
+    # Entrega em segundo plano as replicações que ficaram na outbox (pares offline)
+    iniciar_drenador(LOCAL_SERVERS[0])
+    # Push contínuo das mudanças do WAL local para os pares (decodificação lógica)
+    if REPLICACAO_LOGICA_ATIVA:
+        iniciar_daemon_replicacao()
     
     while True:
         exibir_menu()
@@ -72,8 +105,38 @@ def main():
             elif opcao == '10':
                 print("\n-> FORÇAR SINCRONIZAÇÃO MANUAL (HEAL)")
                 sincronizar_ao_iniciar()
+            elif opcao == '11':
+                print("\n-> SINCRONIZAÇÃO COM VERIFICAÇÃO COMPLETA")
+                sincronizar_ao_iniciar(verificacao_completa=True)
+            elif opcao == '12':
+                print("\n-> VERIFICAR DIVERGÊNCIAS (ANTI-ENTROPIA)")
+                verificar_divergencias()
+            elif opcao == '13':
+                print("\n-> APLICAR MIGRAÇÕES DE ESQUEMA")
+                aplicar_migracoes()
+            elif opcao == '14':
+                print("\n-> MATRÍCULA EM LOTE")
+                matricular_em_lote_menu()
+            elif opcao == '15':
+                print("\n-> IMPORTAR CATÁLOGO DE DISCIPLINAS")
+                importar_catalogo_menu()
+            elif opcao == '16':
+                print("\n-> RELATÓRIO DE OCUPAÇÃO DO CLUSTER")
+                gerar_relatorio_cluster()
+            elif opcao == '17':
+                print("\n-> MÉTRICAS DE DESEMPENHO")
+                exibir_metricas()
+            elif opcao == '18':
+                print("\n-> COLETAR TOMBSTONES (GC)")
+                coletar_tombstones()
             elif opcao == '0':
                 print("Saindo do sistema. Até logo!")
+                parar_drenador()
+                parar_sonda()
+                parar_daemon_replicacao()
+                parar_servidor_metricas()
+                aguardar_entregas()
+                fechar_pools()
                 break
             else:
                 print("Opção inválida. Tente novamente.")
@@ -0,0 +1,23 @@
+from app.adicionar_disciplina import ler_catalogo
+
+
+def test_jsonl_com_linhas_invalidas_reporta_cada_linha(tmp_path, capsys):
+    arquivo = tmp_path / "catalogo.jsonl"
+    arquivo.write_text("\n".join([
+        '{"nome": "Redes", "vagas": 30}',
+        '"Redes"',                              # JSON válido, mas não é um objeto
+        '{"nome": ["Redes"], "vagas": 30}',     # nome que não é texto
+        '{"nome": "Bancos", "vagas": true}',
+        '{"nome": "Compiladores", "vagas": 2.5}',
+        '{quebrado',
+        '{"nome": " Grafos ", "vagas": "12"}',
+    ]), encoding='utf-8')
+    assert ler_catalogo(str(arquivo)) == [('Redes', 30), ('Grafos', 12)]
+    avisos = capsys.readouterr().out
+    assert all(f"Linha {linha} ignorada" in avisos for linha in (2, 3, 4, 5, 6))
+
+
+def test_csv_com_vagas_invalidas(tmp_path):
+    arquivo = tmp_path / "catalogo.csv"
+    arquivo.write_text("nome,vagas\nRedes,30\nBancos,zero\nGrafos,-1\n,5\n", encoding='utf-8')
+    assert ler_catalogo(str(arquivo)) == [('Redes', 30)]
@@ -0,0 +1,32 @@
+import threading
+import time
+
+import psycopg2
+import pytest
+
+from app.conexao import PoolNo, PoolEsgotado
+
+
+def test_pool_esgotado_desiste_no_prazo():
+    pool = PoolNo('A', max_conexoes=0, espera_max=0.05)
+    inicio = time.monotonic()
+    with pytest.raises(psycopg2.OperationalError) as erro:
+        pool.obter()
+    assert isinstance(erro.value, PoolEsgotado)
+    assert time.monotonic() - inicio < 1
+    assert pool.estatisticas()['esgotamentos'] == 1
+
+
+def test_conexao_devolvida_durante_a_espera_e_entregue():
+    pool = PoolNo('A', max_conexoes=1, espera_max=5)
+
+    class Falsa:
+        closed = False
+        ultimo_uso = 0.0
+        def get_transaction_status(self):
+            return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    conn = Falsa()
+    pool._em_uso = 1
+    threading.Timer(0.05, pool.devolver, (conn,)).start()
+    assert pool.obter() is conn
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+from app.fila import FilaEspera, STATUS_ACEITA, STATUS_REJEITADA
+
+T0 = datetime(2025, 1, 1, 12, 0, 0)
+
+
+def ts(segundos):
+    return T0 + timedelta(seconds=segundos)
+
+
+def registro(matricula_id, segundos, status):
+    return (matricula_id, f"aluno_{matricula_id}", ts(segundos), status)
+
+
+def status_em_ordem(fila):
+    return [(matricula_id, status) for matricula_id, _, _, status in fila.registros()]
+
+
+def test_carga_ordena_por_timestamp_e_id_e_corrige_status():
+    fila = FilaEspera(2, [
+        registro('c', 3, STATUS_ACEITA),      # fora da regra: 3º da fila
+        registro('a', 1, STATUS_REJEITADA),   # fora da regra: 1º da fila
+        registro('b', 1, STATUS_ACEITA),      # mesmo timestamp de 'a': desempata pelo id
+    ])
+    assert status_em_ordem(fila) == [('a', STATUS_ACEITA), ('b', STATUS_ACEITA), ('c', STATUS_REJEITADA)]
+    assert [(a[0], a[2]) for a in fila.alteracoes()] == [('a', STATUS_ACEITA), ('c', STATUS_REJEITADA)]
+
+
+def test_carga_ignora_ids_repetidos():
+    fila = FilaEspera(1, [registro('a', 1, STATUS_ACEITA), registro('a', 1, STATUS_ACEITA)])
+    assert len(fila) == 1
+    assert fila.alteracoes() == []
+
+
+def test_inserir_dentro_das_vagas_rebaixa_o_ultimo_aceito():
+    fila = FilaEspera(2, [registro('a', 1, STATUS_ACEITA), registro('c', 3, STATUS_ACEITA)])
+    assert fila.inserir('b', 'aluno_b', ts(2)) == (STATUS_ACEITA, 2)
+    assert status_em_ordem(fila) == [('a', STATUS_ACEITA), ('b', STATUS_ACEITA), ('c', STATUS_REJEITADA)]
+    # Só as matrículas já existentes entram nas alterações (a nova é gravada à parte)
+    assert [(a[0], a[2]) for a in fila.alteracoes()] == [('c', STATUS_REJEITADA)]
+
+
+def test_inserir_depois_das_vagas_fica_na_espera():
+    fila = FilaEspera(1, [registro('a', 1, STATUS_ACEITA)])
+    assert fila.inserir('b', 'aluno_b', ts(2)) == (STATUS_REJEITADA, 2)
+    assert fila.alteracoes() == []
+
+
+def test_remover_aceito_promove_o_primeiro_da_espera():
+    fila = FilaEspera(1, [registro('a', 1, STATUS_ACEITA), registro('b', 2, STATUS_REJEITADA),
+                          registro('c', 3, STATUS_REJEITADA)])
+    assert fila.remover('a') is True
+    assert status_em_ordem(fila) == [('b', STATUS_ACEITA), ('c', STATUS_REJEITADA)]
+    assert [(a[0], a[2]) for a in fila.alteracoes()] == [('b', STATUS_ACEITA)]
+    assert fila.status_anterior('b') == STATUS_REJEITADA
+
+
+def test_remover_da_espera_nao_muda_ninguem():
+    fila = FilaEspera(1, [registro('a', 1, STATUS_ACEITA), registro('b', 2, STATUS_REJEITADA)])
+    assert fila.remover('b') is True
+    assert fila.remover('inexistente') is False
+    assert fila.alteracoes() == []
+
+
+def test_remover_e_inserir_na_mesma_operacao_sem_alteracao_liquida():
+    fila = FilaEspera(1, [registro('a', 1, STATUS_ACEITA), registro('b', 3, STATUS_REJEITADA)])
+    fila.remover('a')
+    # 'b' foi promovido, mas a nova tentativa chega antes e o rebaixa de novo
+    assert fila.inserir('n', 'aluno_n', ts(2)) == (STATUS_ACEITA, 1)
+    assert fila.alteracoes() == []
+    assert fila.posicao('b') == 2
+
+
+def test_confirmar_mantem_a_fila_para_a_proxima_operacao():
+    fila = FilaEspera(1, [registro('a', 1, STATUS_ACEITA), registro('b', 2, STATUS_REJEITADA)])
+    fila.remover('a')
+    fila.inserir('c', 'aluno_c', ts(3))
+    fila.confirmar()
+    assert fila.alteracoes() == []
+    assert fila.status_anterior('c') == STATUS_REJEITADA
+    # Na operação seguinte, a nova tentativa já confirmada também pode ser promovida
+    fila.remover('b')
+    assert [(a[0], a[2]) for a in fila.alteracoes()] == [('c', STATUS_ACEITA)]
+    assert fila.status_anterior('c') == STATUS_REJEITADA
+
+
+def test_tem_aluno_acompanha_insercoes_e_remocoes():
+    fila = FilaEspera(1, [registro('a', 1, STATUS_ACEITA)])
+    assert fila.tem_aluno('aluno_a')
+    fila.inserir('b', 'aluno_b', ts(2))
+    assert fila.tem_aluno('aluno_b')
+    fila.remover('a')
+    assert not fila.tem_aluno('aluno_a')
+    assert not fila.tem_aluno('inexistente')
@@ -0,0 +1,23 @@
+from app.matricula_em_lote import ler_pedidos
+
+
+def test_jsonl_com_linhas_invalidas_nao_aborta_o_lote(tmp_path, capsys):
+    arquivo = tmp_path / "pedidos.jsonl"
+    arquivo.write_text("\n".join([
+        '{"aluno": "a1", "disciplina": "Redes"}',
+        '[1, 2]',                                   # JSON válido, mas não é um objeto
+        '{"aluno": 5, "disciplina": "Redes"}',      # campo que não é texto
+        '{"aluno": "a2", "disciplina": ["Redes"]}',
+        '{quebrado',
+        '',
+        '{"aluno": " a3 ", "disciplina": " Redes "}',
+    ]), encoding='utf-8')
+    assert ler_pedidos(str(arquivo)) == [(1, 'a1', 'Redes'), (7, 'a3', 'Redes')]
+    avisos = capsys.readouterr().out
+    assert all(f"Linha {linha} ignorada" in avisos for linha in (2, 3, 4, 5))
+
+
+def test_csv_com_colunas_faltando(tmp_path):
+    arquivo = tmp_path / "pedidos.csv"
+    arquivo.write_text("aluno,disciplina\na1,Redes\na2\n,Redes\n", encoding='utf-8')
+    assert ler_pedidos(str(arquivo)) == [(2, 'a1', 'Redes')]
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+
+from app.matricular import _mesclar_filas
+
+T0 = datetime(2025, 1, 1, 12, 0, 0)
+
+
+def registro(matricula_id, segundos, status='ACEITA'):
+    return (matricula_id, f"aluno_{matricula_id}", T0 + timedelta(seconds=segundos), status)
+
+
+def test_mescla_filas_ordenadas_por_timestamp_e_id():
+    no_a = [registro('a', 1), registro('d', 4)]
+    no_b = [registro('c', 2), registro('b', 2)][::-1]   # cada nó já entrega a sua fila ordenada
+    no_c = [registro('e', 5)]
+    assert [r[0] for r in _mesclar_filas([no_a, no_b, no_c])] == ['a', 'b', 'c', 'd', 'e']
+
+
+def test_mescla_remove_duplicatas_entre_nos():
+    comum = registro('x', 1)
+    resultado = list(_mesclar_filas([[comum, registro('y', 2)], [comum], [comum, registro('z', 3)]]))
+    assert [r[0] for r in resultado] == ['x', 'y', 'z']
+
+
+def test_mescla_e_preguicosa_e_aceita_filas_vazias():
+    mescla = _mesclar_filas([[], iter([registro('a', 1)]), []])
+    assert next(mescla)[0] == 'a'
+    assert list(mescla) == []
+    assert list(_mesclar_filas([])) == []
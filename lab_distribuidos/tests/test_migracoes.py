@@ -0,0 +1,69 @@
+import uuid
+
+import psycopg2
+import pytest
+
+from app.config import SERVERS
+from app.migracoes import MIGRACOES, aplicar_pendentes
+
+# Esquema de um banco criado antes das migrações: só as tabelas das entidades e dos tombstones
+# (sem sync_checkpoints, que o heal cria com garantir_tabela_checkpoint)
+ESQUEMA_ANTIGO = """
+    CREATE TABLE disciplinas (
+        id UUID PRIMARY KEY, nome VARCHAR(100) NOT NULL, vagas_totais INT NOT NULL,
+        is_deleted BOOLEAN DEFAULT false, data_ultima_modificacao TIMESTAMPTZ DEFAULT NOW());
+    CREATE TABLE matriculas (
+        id UUID PRIMARY KEY, disciplina_id UUID REFERENCES disciplinas(id) ON DELETE CASCADE,
+        nome_aluno VARCHAR(100) NOT NULL, timestamp_matricula TIMESTAMPTZ DEFAULT NOW(),
+        status VARCHAR(20) DEFAULT 'ACEITA', data_ultima_modificacao TIMESTAMPTZ DEFAULT NOW());
+    CREATE TABLE deleted_disciplinas (id UUID PRIMARY KEY, timestamp TIMESTAMPTZ DEFAULT NOW());
+    CREATE TABLE deleted_matriculas (id UUID PRIMARY KEY, timestamp TIMESTAMPTZ DEFAULT NOW());
+"""
+
+
+@pytest.fixture
+def conn_esquema_vazio():
+    """Conexão ao líder A (config.py) com search_path num esquema temporário; pula sem banco."""
+    config = SERVERS['A']
+    esquema = f"teste_migracoes_{uuid.uuid4().hex[:8]}"
+    try:
+        admin = psycopg2.connect(host=config['host'], port=config['port'], dbname=config['dbname'],
+                                 user=config['user'], password=config['password'], connect_timeout=2)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Líder A indisponível: {e}")
+    admin.autocommit = True
+    admin.cursor().execute(f"CREATE SCHEMA {esquema}")
+    conn = psycopg2.connect(host=config['host'], port=config['port'], dbname=config['dbname'],
+                            user=config['user'], password=config['password'],
+                            options=f"-c search_path={esquema}")
+    try:
+        cursor = conn.cursor()
+        cursor.execute(ESQUEMA_ANTIGO)
+        conn.commit()
+        cursor.close()
+        yield conn
+    finally:
+        conn.close()
+        admin.cursor().execute(f"DROP SCHEMA {esquema} CASCADE")
+        admin.close()
+
+
+def test_migracoes_em_banco_sem_sync_checkpoints(conn_esquema_vazio):
+    aplicadas = []
+    aplicar_pendentes(conn_esquema_vazio, aplicadas)
+    assert aplicadas == [versao for versao, _, _ in MIGRACOES]
+
+    cursor = conn_esquema_vazio.cursor()
+    cursor.execute("""
+        SELECT table_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND column_name = 'chegada_em' ORDER BY 1
+    """)
+    assert [row[0] for row in cursor.fetchall()] == [
+        'deleted_disciplinas', 'deleted_matriculas', 'disciplinas', 'matriculas']
+    cursor.execute("SELECT to_regclass('sync_checkpoints') IS NOT NULL")
+    assert cursor.fetchone()[0]
+
+    # Reaplicar não faz nada
+    novamente = []
+    aplicar_pendentes(conn_esquema_vazio, novamente)
+    assert novamente == []
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import relogio
+
+
+@pytest.fixture(autouse=True)
+def relogio_zerado(monkeypatch):
+    monkeypatch.setattr(relogio, '_ultimo', relogio.INICIO)
+
+
+def test_agora_e_estritamente_crescente():
+    valores = [relogio.agora() for _ in range(1000)]
+    assert all(b > a for a, b in zip(valores, valores[1:]))
+    assert valores[0].tzinfo is not None
+
+
+def test_agora_nao_volta_com_o_relogio_fisico_atrasado(monkeypatch):
+    futuro = datetime.now(timezone.utc) + timedelta(hours=1)
+    monkeypatch.setattr(relogio, '_ultimo', futuro)
+    assert relogio.agora() == futuro + relogio.TIQUE
+    assert relogio.agora() == futuro + 2 * relogio.TIQUE
+
+
+def test_reservar_devolve_bloco_consecutivo():
+    primeiro = relogio.reservar(5)
+    assert relogio.agora() >= primeiro + 5 * relogio.TIQUE
+
+
+def test_observar_avanca_para_depois_do_timestamp_remoto():
+    remoto = datetime.now(timezone.utc) + timedelta(seconds=10)
+    relogio.observar(None, remoto - timedelta(seconds=5), remoto)
+    assert relogio.agora() == remoto + relogio.TIQUE
+
+
+def test_observar_trata_valores_sem_fuso_como_utc():
+    remoto = datetime.now(timezone.utc) + timedelta(seconds=10)
+    relogio.observar(remoto.replace(tzinfo=None))
+    assert relogio.agora() == remoto + relogio.TIQUE
+
+
+def test_observar_nao_faz_o_relogio_voltar():
+    atual = relogio.agora()
+    relogio.observar(atual - timedelta(days=1))
+    relogio.observar()
+    assert relogio.agora() > atual
+
+
+def test_observar_avisa_sobre_relogio_remoto_adiantado(capsys):
+    relogio.observar(datetime.now(timezone.utc) + timedelta(seconds=relogio.RELOGIO_DESVIO_MAX_SEGUNDOS + 60))
+    assert "à frente do relógio local" in capsys.readouterr().out
@@ -0,0 +1,71 @@
+import struct
+
+from app.replicacao_logica import decodificar_mensagem
+
+RELID = 16384
+ID = '4b7f6c1e-8a8b-4f47-9a35-2f7d0e3c9a10'
+
+
+def texto(valor):
+    return valor.encode() + b'\0'
+
+
+def relacao(relid, tabela, colunas):
+    """Mensagem 'R' do pgoutput: namespace, tabela, replica identity e as colunas."""
+    dados = b'R' + struct.pack('!I', relid) + texto('public') + texto(tabela) + b'd' + struct.pack('!h', len(colunas))
+    for coluna in colunas:
+        dados += b'\x01' + texto(coluna) + struct.pack('!Ii', 25, -1)
+    return dados
+
+
+def tupla(*valores):
+    """TupleData: None vira 'n' (nulo); o resto, 't' + tamanho + texto."""
+    dados = struct.pack('!h', len(valores))
+    for valor in valores:
+        if valor is None:
+            dados += b'n'
+        else:
+            dados += b't' + struct.pack('!i', len(valor.encode())) + valor.encode()
+    return dados
+
+
+def com_relacao(colunas=('nome', 'id', 'vagas_totais')):
+    relacoes = {}
+    assert decodificar_mensagem(relacao(RELID, 'disciplinas', list(colunas)), relacoes) is None
+    return relacoes
+
+
+def test_relacao_registra_tabela_e_posicao_do_id():
+    assert com_relacao() == {RELID: ('disciplinas', 1)}
+
+
+def test_insert():
+    mensagem = b'I' + struct.pack('!I', RELID) + b'N' + tupla('Redes', ID, '30')
+    assert decodificar_mensagem(mensagem, com_relacao()) == ('disciplinas', ID)
+
+
+def test_update_com_e_sem_tupla_antiga():
+    nova = b'N' + tupla('Redes II', ID, None)
+    simples = b'U' + struct.pack('!I', RELID) + nova
+    com_antiga = b'U' + struct.pack('!I', RELID) + b'O' + tupla('Redes', ID, '30') + nova
+    relacoes = com_relacao()
+    assert decodificar_mensagem(simples, relacoes) == ('disciplinas', ID)
+    assert decodificar_mensagem(com_antiga, relacoes) == ('disciplinas', ID)
+
+
+def test_delete_pela_chave():
+    mensagem = b'D' + struct.pack('!I', RELID) + b'K' + tupla(None, ID, None)
+    assert decodificar_mensagem(mensagem, com_relacao()) == ('disciplinas', ID)
+
+
+def test_relacao_desconhecida_ou_sem_id_e_ignorada():
+    mensagem = b'I' + struct.pack('!I', RELID) + b'N' + tupla('Redes', ID)
+    assert decodificar_mensagem(mensagem, {}) is None
+    assert decodificar_mensagem(mensagem, com_relacao(('nome', 'outra'))) is None
+
+
+def test_mensagens_de_controle_sao_ignoradas():
+    relacoes = {}
+    for tipo in (b'B', b'C', b'O', b'Y', b'T'):
+        assert decodificar_mensagem(tipo + b'\0' * 20, relacoes) is None
+    assert relacoes == {}